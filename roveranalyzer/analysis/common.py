@@ -196,6 +196,12 @@ class RunMap(dict):
         """Return path relative to RunMap ouput_dir"""
         return os.path.join(self.output_dir, *args)
 
+    def shard_path(self, key: str, group_name: str, tag: str | None = None) -> str:
+        """Return path of result shard for given key and SimulationGroup relative to RunMap output_dir.
+        Shards of calls with different arguments are separated by tag."""
+        _key = key if tag is None else os.path.join(key, tag)
+        return self.path("shards", _key, f"{group_name.replace(os.sep, '_')}.h5")
+
     def path_exists(self, *args) -> bool:
         """Check if path relative to RunMap output_dir exists."""
         return os.path.exists(self.path(*args))
@@ -650,6 +656,17 @@ class Simulation:
         self.data_root = data_root
         self.run_context: RunContext = run_context
         self._id_offset = id_offset
+        self._dcd_map: DcdMap2D | None = None
+
+    def __getstate__(self):
+        # do not pickle loaded density map. Each process builds its own.
+        _state = self.__dict__.copy()
+        _state["_dcd_map"] = None
+        return _state
+
+    def __setstate__(self, state):
+        state.setdefault("_dcd_map", None)
+        self.__dict__.update(state)
 
     def __repr__(self) -> str:
         return f"<{self.__class__.__name__} object at {hex(id(self))} {self.label} ({self.study_id()}[{self.global_id()}])>"
@@ -696,11 +713,24 @@ class Simulation:
             join(self.data_root, "trajectories.h5"), group="trajectories"
         )
 
-    def get_dcdMap(self) -> DcdMap2D:
-        sel = self.builder.map_p.get_attribute("used_selection")
-        if sel is None:
-            raise ValueError("selection not set!")
-        return self.builder.build_dcdMap(selection=list(sel)[0])
+    def get_dcdMap(self, reload: bool = False) -> DcdMap2D:
+        """Density map of this simulation. The map (including the loaded ground
+        truth and position frames) is built once and shared between calls. Use
+        release() to free the memory.
+        """
+        if self._dcd_map is None or reload:
+            sel = self.builder.map_p.get_attribute("used_selection")
+            if sel is None:
+                raise ValueError("selection not set!")
+            self._dcd_map = self.builder.build_dcdMap(selection=list(sel)[0])
+        return self._dcd_map
+
+    def release(self):
+        """Free cached density map. The next call of get_dcdMap() builds a new map."""
+        self._dcd_map = None
+        if self._builder is not None:
+            self._builder.global_df = None
+            self._builder.position_df = None
 
     def get_run_description_0001(self):
         cfg = self.run_context.oppini
@@ -0,0 +1,146 @@
+""" Running packet statistics for each link (hostId, srcHostId).
+
+The received packets are consumed window by window (see
+CrownetSql.vec_data_pivot_windows) and only the last state of each link is kept.
+Memory is bounded by the number of links and not by the number of packets.
+"""
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+LINK_INDEX = ["hostId", "srcHostId"]
+
+
+class LinkStatistics:
+    """Running packet loss, delay and jitter statistics for each link.
+
+    Packet loss is based on gaps in the sequence numbers of each link. Late packets
+    (seqNo lower than the highest seqNo received so far) are counted as received
+    but do not reduce the loss. The jitter is the interarrival jitter estimator of
+    RFC 3550 J = J + (|D| - J)/16 where D is the delay difference of two consecutive
+    packets of the same link.
+    """
+
+    state_columns = ["seqNo", "delay", "jitter", "pkt_loss_sum", "total_pkt_received"]
+    columns = [
+        "pkt_received",
+        "pkt_lost",
+        "delay_mean",
+        "delay_max",
+        "jitter",
+        "pkt_loss_sum",
+        "total_pkt_received",
+        "total_pkt_send",
+        "PRR",
+    ]
+
+    def __init__(self) -> None:
+        self.state = pd.DataFrame(
+            columns=self.state_columns,
+            index=pd.MultiIndex.from_arrays([[], []], names=LINK_INDEX),
+            dtype=float,
+        )
+
+    def __len__(self) -> int:
+        return self.state.shape[0]
+
+    def _empty(self) -> pd.DataFrame:
+        return pd.DataFrame(
+            columns=self.columns,
+            index=pd.MultiIndex.from_arrays([[], [], []], names=[*LINK_INDEX, "time"]),
+            dtype=float,
+        )
+
+    def update(self, data: pd.DataFrame, time: float) -> pd.DataFrame:
+        """Add the received packets of one window and return the window aggregates.
+
+        Args:
+            data (pd.DataFrame): received packets with hostId, srcHostId, time (and
+                eventNumber) as columns or index levels and the columns seqNo and delay.
+                Self messages (hostId == srcHostId) are ignored.
+            time (float): label (start time) of the window
+
+        Returns:
+            pd.DataFrame: [hostId, srcHostId, time](pkt_received, pkt_lost, delay_mean,
+                delay_max, jitter, pkt_loss_sum, total_pkt_received, total_pkt_send, PRR)
+                with one row for each link with packets in the window. The
+                columns pkt_received, pkt_lost, delay_mean and delay_max cover the
+                window only, all others the complete time up to the end of the window.
+        """
+        df = data.reset_index()
+        df = df[df["hostId"] != df["srcHostId"]]
+        if df.empty:
+            return self._empty()
+        order = [*LINK_INDEX, "time"]
+        if "eventNumber" in df.columns:
+            order.append("eventNumber")
+        df = df.sort_values(order, kind="stable")
+
+        keys = df[LINK_INDEX].to_numpy()
+        is_start = np.r_[True, (keys[1:] != keys[:-1]).any(axis=1)]
+        starts = np.flatnonzero(is_start)
+        ends = np.r_[starts[1:], len(df)] - 1
+        counts = ends - starts + 1
+        group = np.cumsum(is_start) - 1
+        links = pd.MultiIndex.from_arrays(
+            [keys[starts, 0], keys[starts, 1]], names=LINK_INDEX
+        )
+        prev = self.state.reindex(links)
+
+        # packet loss: gap to the highest seqNo received so far on the link
+        seq = df["seqNo"].to_numpy(dtype=float)
+        seq_max = pd.Series(seq).groupby(group).cummax().to_numpy()
+        seq_max = np.fmax(seq_max, prev["seqNo"].to_numpy()[group])
+        prev_max = np.r_[np.nan, seq_max[:-1]]
+        prev_max[starts] = prev["seqNo"].to_numpy()
+        with np.errstate(invalid="ignore"):
+            gap = seq - prev_max - 1
+        gap = np.where(gap > 0, gap, 0.0)
+        lost = np.bincount(group, weights=gap, minlength=len(starts))
+
+        # delay and jitter
+        delay = df["delay"].to_numpy(dtype=float)
+        prev_delay = np.r_[np.nan, delay[:-1]]
+        prev_delay[starts] = prev["delay"].to_numpy()
+        d = np.abs(delay - prev_delay)
+        jitter = prev["jitter"].fillna(0.0).to_numpy()
+        for pos in range(counts.max()):
+            # one step of the estimator for all links at once
+            _g = np.flatnonzero(counts > pos)
+            _d = d[starts[_g] + pos]
+            _ok = ~np.isnan(_d)
+            _g = _g[_ok]
+            jitter[_g] += (_d[_ok] - jitter[_g]) / 16
+
+        loss_sum = prev["pkt_loss_sum"].fillna(0.0).to_numpy() + lost
+        received_sum = prev["total_pkt_received"].fillna(0.0).to_numpy() + counts
+        self.state = pd.DataFrame(
+            {
+                "seqNo": seq_max[ends],
+                "delay": delay[ends],
+                "jitter": jitter,
+                "pkt_loss_sum": loss_sum,
+                "total_pkt_received": received_sum,
+            },
+            index=links,
+        ).combine_first(self.state)[self.state_columns]
+
+        ret = pd.DataFrame(
+            {
+                "pkt_received": counts,
+                "pkt_lost": lost,
+                "delay_mean": np.bincount(group, weights=delay) / counts,
+                "delay_max": np.maximum.reduceat(delay, starts),
+                "jitter": jitter,
+                "pkt_loss_sum": loss_sum,
+                "total_pkt_received": received_sum,
+                "total_pkt_send": loss_sum + received_sum,
+            },
+            index=pd.MultiIndex.from_arrays(
+                [keys[starts, 0], keys[starts, 1], np.full(len(starts), time)],
+                names=[*LINK_INDEX, "time"],
+            ),
+        )
+        ret["PRR"] = ret["total_pkt_received"] / ret["total_pkt_send"]
+        return ret
@@ -2,7 +2,8 @@ from __future__ import annotations
 
 import itertools
 import os
-from typing import List, Tuple
+import uuid
+from typing import Iterator, List, Tuple
 
 import matplotlib as mpl
 import matplotlib.pyplot as plt
@@ -21,9 +22,16 @@ from roveranalyzer.analysis.common import (
     Simulation,
     SimulationGroup,
 )
+from roveranalyzer.analysis.link_stats import LinkStatistics
+from roveranalyzer.analysis.result_cache import (
+    UncacheableArgument,
+    cache_key,
+    cached_result,
+)
 from roveranalyzer.simulators.crownet.dcd.dcd_map import percentile
 from roveranalyzer.simulators.opp.provider.hdf.IHdfProvider import BaseHdfProvider
 from roveranalyzer.simulators.opp.scave import CrownetSql, SqlEmptyResult, SqlOp
+from roveranalyzer.utils.binning import TimeBins, bin_aggregate
 from roveranalyzer.utils.dataframe import (
     FrameConsumer,
     append_index,
@@ -32,7 +40,13 @@ from roveranalyzer.utils.dataframe import (
 )
 from roveranalyzer.utils.general import DataSource
 from roveranalyzer.utils.logging import logger, timing
-from roveranalyzer.utils.parallel import run_kwargs_map
+from roveranalyzer.utils.parallel import (
+    ShardedFrame,
+    ShardWriter,
+    SharedInputs,
+    resolve_shared,
+    run_kwargs_map,
+)
 from roveranalyzer.utils.plot import PlotUtil, with_axis
 
 
@@ -62,8 +76,9 @@ class _hdf_Extractor(AnalysisBase):
     @classmethod
     def extract_rvcd_statistics(cls, hdf_file: str, sql: Scave.CrownetSql):
         _hdf = BaseHdfProvider(hdf_file, "rcvd_stats")
-        if _hdf.hdf_file_exists:
-            logger.info("hdf file exists nothing to do.")
+        # the hdf file is shared with extract_rvcd_window_statistics
+        if _hdf.hdf_file_exists and _hdf.contains_group("rcvd_stats"):
+            logger.info("hdf group 'rcvd_stats' exists nothing to do.")
             return
         df = []
         for module_name, m_str in [(sql.m_beacon(), "b"), (sql.m_map(), "m")]:
@@ -115,6 +130,32 @@ class _hdf_Extractor(AnalysisBase):
         df = pd.concat(df, axis=0, verify_integrity=False)
         _hdf.write_frame(group="rcvd_stats", frame=df)
 
+    @classmethod
+    def extract_rvcd_window_statistics(
+        cls, hdf_file: str, sql: Scave.CrownetSql, window: float = 1.0
+    ):
+        """Streaming variant of extract_rvcd_statistics. Each window is appended to the
+        hdf group as soon as it is computed. An incomplete group is removed on error."""
+        group = "rcvd_window_stats"
+        _hdf = BaseHdfProvider(hdf_file, group)
+        if _hdf.hdf_file_exists and _hdf.contains_group(group):
+            logger.info(f"hdf group '{group}' exists nothing to do.")
+            return
+        try:
+            for module_name, m_str in [(sql.m_beacon(), "b"), (sql.m_map(), "m")]:
+                logger.info(f"read vector data for {module_name} in {window}s windows")
+                for df in OppAnalysis.iter_received_packet_stats(
+                    sql, module_name, window=window
+                ):
+                    df["app"] = m_str
+                    df = df.set_index(["app"], append=True)
+                    _hdf.write_frame(group=group, frame=df)
+        except BaseException:
+            if _hdf.hdf_file_exists and _hdf.contains_group(group):
+                with _hdf.ctx() as store:
+                    store.remove(group)
+            raise
+
     @classmethod
     def extract_packet_loss(
         cls, hdf_file: str, group_suffix: str, sql: CrownetSql, app: SqlOp
@@ -697,11 +738,24 @@ class _OppAnalysis(AnalysisBase):
         enbs = enbs.set_index(["hostId", "time"]).sort_index()
 
         df = pd.merge(sinr, enbs, on=["hostId", "time"], how="outer").sort_index()
-        for _, _df in df.groupby(level=["hostId"]):
-            df.loc[_df.index, "eNB"] = _df["eNB"].ffill()
+        df = self.ffill_serving_enb(df)
         df = df.dropna()
         return df
 
+    @staticmethod
+    def ffill_serving_enb(df: pd.DataFrame) -> pd.DataFrame:
+        """Forward fill serving eNB for each host in one grouped pass.
+
+        Args:
+            df (pd.DataFrame): [hostId, time](..., eNB) sorted by hostId and time
+
+        Returns:
+            pd.DataFrame: same frame with filled eNB column. Missing values before the
+                          first eNB value of a host stay NaN.
+        """
+        df["eNB"] = df["eNB"].groupby(level="hostId", sort=False).ffill()
+        return df
+
     def build_received_packet_loss_cache(
         self, sql: Scave.CrownetSql, hdf_path: str, return_group: str = "Map"
     ) -> pd.DataFrame:
@@ -786,6 +840,54 @@ class _OppAnalysis(AnalysisBase):
 
         return vec_data
 
+    def iter_received_packet_stats(
+        self,
+        sql: Scave.CrownetSql,
+        module_name: Scave.SqlOp | str,
+        window: float = 1.0,
+        chunksize: int = 500_000,
+    ) -> Iterator[pd.DataFrame]:
+        """Streaming version of get_received_packet_loss2 and get_received_packet_jitter/delay.
+
+        The receive side vectors are read in simtime windows and only the running state of each
+        link (hostId, srcHostId) is kept (see LinkStatistics). Memory is bounded by the number of
+        links and not by the number of packets.
+
+        Yields:
+            pd.DataFrame: aggregates of one window. See LinkStatistics.update
+        """
+        seqNo_vec = ["rcvdPkSeqNo:vector", "rcvdPktPerSrcSeqNo:vector"]
+        seqNo_vec = sql.find_vector_name(module_name, seqNo_vec)
+        vec_names = {
+            seqNo_vec: dict(name="seqNo", dtype=np.int32),
+            "rcvdPkHostId:vector": dict(name="srcHostId", dtype=np.int32),
+            "rcvdPkLifetime:vector": dict(name="delay", dtype=np.float32),
+        }
+        stats = LinkStatistics()
+        for time, vec_data in sql.vec_data_pivot_windows(
+            module_name,
+            vec_names,
+            window=window,
+            append_index=["srcHostId"],
+            chunksize=chunksize,
+        ):
+            yield stats.update(vec_data, time)
+        logger.info(f"received packet statistics for {len(stats)} links")
+
+    @timing
+    def get_received_packet_stats(
+        self,
+        sql: Scave.CrownetSql,
+        module_name: Scave.SqlOp | str,
+        window: float = 1.0,
+        chunksize: int = 500_000,
+    ) -> pd.DataFrame:
+        """Windowed packet loss, delay and jitter for each link. See iter_received_packet_stats"""
+        return pd.concat(
+            self.iter_received_packet_stats(sql, module_name, window, chunksize),
+            axis=0,
+        )
+
     def get_received_packet_bytes(
         self,
         sql: Scave.CrownetSql,
@@ -826,23 +928,16 @@ class _OppAnalysis(AnalysisBase):
             data = cache
 
         tx_rate = data.reset_index(["app"])
-        bins = pd.interval_range(
-            start=0.0,
-            end=tx_rate.index.get_level_values(0).max(),
-            freq=freq,
-            closed="left",
-        )
+        time = tx_rate.index.get_level_values(0)
+        bins = TimeBins.from_range(0.0, time.max(), freq)
         tx_rate = (
-            (
-                tx_rate.groupby([pd.cut(tx_rate.index, bins=bins), "app"]).sum()
-                / freq
-                / 1000
+            bin_aggregate(
+                tx_rate.drop(columns=["app"]), time, bins, by=[tx_rate["app"]]
             )
-            .unstack("app")
-            .droplevel(0, axis=1)
+            / freq
+            / 1000
         )
-        tx_rate.index = bins.left
-        tx_rate.index.name = "time"
+        tx_rate = tx_rate.unstack("app").droplevel(0, axis=1)
         return tx_rate
 
     @timing
@@ -864,34 +959,17 @@ class _OppAnalysis(AnalysisBase):
         self,
         sim: Simulation,
     ):
+        # measures are materialized in the hdf file on first computation
         map = sim.get_dcdMap()
         if sim.sql.is_count_map():
-            group = "map_measure"
-            _hdf = sim.get_base_provider(group, path=sim.builder.count_p.hdf_path)
-            if _hdf.contains_group(group):
-                print(f"group 'map_measure' found. Nothing to do for {_hdf._hdf_path}")
-            else:
-                map_measure = map.map_count_measure(load_cached_version=False)
-                _hdf.write_frame(group=group, frame=map_measure)
+            map.map_count_measure()
 
         if sim.sql.is_entropy_map():
             # use cell_value_measure method
-            group = "cell_measures"
-            _hdf = sim.get_base_provider(group, path=sim.builder.count_p.hdf_path)
-            if _hdf.contains_group(group):
-                print(f"group '{group}' found. Nothing to do for {_hdf._hdf_path}")
-            else:
-                cell_measure = map.cell_value_measure(load_cached_version=False)
-                _hdf.write_frame(group=group, frame=cell_measure)
+            map.cell_value_measure()
         else:
             # use cell_count_measure method
-            group = "cell_measures"
-            _hdf = sim.get_base_provider(group, path=sim.builder.count_p.hdf_path)
-            if _hdf.contains_group(group):
-                print(f"group '{group}' found. Nothing to do for {_hdf._hdf_path}")
-            else:
-                cell_measure = map.cell_count_measure(load_cached_version=False)
-                _hdf.write_frame(group=group, frame=cell_measure)
+            map.cell_count_measure()
 
     @timing
     def get_data_001(self, sim: Simulation):
@@ -972,6 +1050,7 @@ class _OppAnalysis(AnalysisBase):
                 [[scenario_lbl], [i], _df.columns], names=["sim", "run", "data"]
             )
             df.append(_df)
+            sim.release()
         df = pd.concat(df, axis=1, verify_integrity=True)
         if df.isna().any(axis=1).any():
             nan_index = list(df.index[df.isna().any(axis=1)])
@@ -984,6 +1063,68 @@ class _OppAnalysis(AnalysisBase):
             df = df.to_frame()
         return frame_consumer(df)
 
+    def run_sharded(
+        self,
+        run_map: RunMap,
+        func,
+        kwargs_iter: List[dict],
+        key: str,
+        hdf_path: str | None = None,
+        pool_size: int = 10,
+        **post,
+    ) -> ShardedFrame:
+        """Execute SimulationGroup based function `func` in parallel where each process writes its
+        result into a shard file below RunMap.output_dir. Only the shard paths are send back to the
+        parent process. If hdf_path is given all shards are merged (one shard at a time) into hdf_path.
+        Shards are saved per function and arguments, thus calls with different arguments do not
+        overwrite each other.
+
+        Args:
+            run_map (RunMap): RunMap used to create shard paths.
+            func (callable): SimulationGroup based function returning a DataFrame or Series
+            kwargs_iter (List[dict]): keyword arguments for func. Each must contain 'sim_group'.
+            key (str): hdf key used for the shards and the merged result.
+            hdf_path (str | None, optional): Merge all shards into this file (relative to RunMap). Defaults to None.
+            pool_size (int, optional): Number of processes. Defaults to 10.
+            post: Post-processing options of the ShardedFrame (verify_integrity, sort_index, as_frame)
+
+        Returns:
+            ShardedFrame: Lazy view on the shards or the merged result if hdf_path is given.
+        """
+        try:
+            tag = cache_key(
+                func.__qualname__,
+                {
+                    "kwargs": [
+                        {k: v for k, v in kw.items() if k != "sim_group"}
+                        for kw in kwargs_iter
+                    ]
+                },
+            )
+        except UncacheableArgument:
+            # no stable key, use unique shard directory
+            tag = f"u_{uuid.uuid4().hex}"
+        for kw in kwargs_iter:
+            kw["shard_path"] = run_map.shard_path(
+                key, kw["sim_group"].group_name, tag=tag
+            )
+        shards = ShardedFrame(
+            run_kwargs_map(
+                ShardWriter(func, key),
+                kwargs_iter,
+                pool_size=pool_size,
+                reuse_pool=True,
+            ),
+            key=key,
+            **post,
+        )
+        if hdf_path is not None:
+            merged = shards.to_hdf(run_map.path(hdf_path), key=key)
+            shards.remove()
+            shards = merged
+        return shards
+
+    @cached_result()
     def run_collect_maps(
         self,
         run_map: RunMap,
@@ -993,10 +1134,33 @@ class _OppAnalysis(AnalysisBase):
         hdf_path: str | None = None,
         hdf_key: str = "maps",
         pool_size=10,
-    ) -> pd.DataFrame:
-        """Collect all density maps in provided RunMap. No aggregation performed"""
+        sharded: bool = False,
+    ) -> pd.DataFrame | ShardedFrame:
+        """Collect all density maps in provided RunMap. No aggregation performed.
+        If sharded is set, return a lazy ShardedFrame instead (see run_sharded)."""
         if hdf_path is not None and os.path.exists(run_map.path(hdf_path)):
-            df = pd.read_hdf(run_map.path(hdf_path), key=hdf_key)
+            shards = ShardedFrame([run_map.path(hdf_path)], key=hdf_key, as_frame=True)
+            if sharded:
+                return shards
+            df = shards.concat()
+        elif sharded:
+            return self.run_sharded(
+                run_map,
+                self.sg_collect_maps,
+                [
+                    dict(
+                        sim_group=g,
+                        data=data,
+                        frame_consumer=frame_consumer,
+                        drop_nan=drop_nan,
+                    )
+                    for g in run_map.values()
+                ],
+                key=hdf_key,
+                hdf_path=hdf_path,
+                pool_size=pool_size,
+                as_frame=True,
+            )
         else:
             df = run_kwargs_map(
                 self.sg_collect_maps,
@@ -1010,6 +1174,7 @@ class _OppAnalysis(AnalysisBase):
                     for g in run_map.values()
                 ],
                 pool_size=pool_size,
+                reuse_pool=True,
             )
             df = pd.concat(df, axis=0)
 
@@ -1043,6 +1208,7 @@ class _OppAnalysis(AnalysisBase):
         df = frame_consumer(df)
         return df
 
+    @cached_result()
     def run_get_merge_maps(
         self,
         run_map: RunMap,
@@ -1052,15 +1218,37 @@ class _OppAnalysis(AnalysisBase):
         hdf_path: str | None = None,
         hdf_key: str = "maps",
         pool_size=10,
-    ) -> pd.DataFrame:
+        sharded: bool = False,
+    ) -> pd.DataFrame | ShardedFrame:
         """Merge all measurement maps for all simulation groups in given RunMap.
         See sg_merge_maps for simulation group function
 
         Returns:
-            pd.DataFrame: _description_
+            pd.DataFrame | ShardedFrame: Lazy ShardedFrame if sharded is set (see run_sharded)
         """
         if hdf_path is not None and os.path.exists(run_map.path(hdf_path)):
-            df = pd.read_hdf(run_map.path(hdf_path), key=hdf_key)
+            shards = ShardedFrame([run_map.path(hdf_path)], key=hdf_key, as_frame=True)
+            if sharded:
+                return shards
+            df = shards.concat()
+        elif sharded:
+            return self.run_sharded(
+                run_map,
+                self.sg_get_merge_maps,
+                [
+                    dict(
+                        sim_group=g,
+                        data=data,
+                        frame_consumer=frame_consumer,
+                        drop_nan=drop_nan,
+                    )
+                    for g in run_map.values()
+                ],
+                key=hdf_key,
+                hdf_path=hdf_path,
+                pool_size=pool_size,
+                as_frame=True,
+            )
         else:
             df = run_kwargs_map(
                 self.sg_get_merge_maps,
@@ -1074,6 +1262,7 @@ class _OppAnalysis(AnalysisBase):
                     for g in run_map.values()
                 ],
                 pool_size=pool_size,
+                reuse_pool=True,
             )
             df = pd.concat(df, axis=0)
 
@@ -1107,25 +1296,11 @@ class _OppAnalysis(AnalysisBase):
                 logger.warn("no hdf file found build new one")
                 # todo raise?
             raw: pd.DataFrame = hdf_store.get_dataframe(f"pkt_loss_raw_{app_name}")
-            # sort lost count by time only
-            raw = (
-                raw["lost"]
-                .fillna(0.0)
-                .reset_index("time")
-                .reset_index(drop=True)
-                .set_index("time")
-                .sort_index()
-            )
-            interval = pd.interval_range(
-                start=0.0, end=np.ceil(raw.index.max()), freq=1.0, closed="left"
-            )
-            raw = (
-                raw.groupby(pd.cut(raw.index, bins=interval))
-                .sum()
-                .reset_index(drop=True)
-            )
-            raw.index = interval.left
-            raw.index.name = "time"
+            # bin lost count by time only
+            lost = raw["lost"].fillna(0.0)
+            time = lost.index.get_level_values("time")
+            bins = TimeBins.from_range(0.0, np.ceil(time.max()), 1.0)
+            raw = bin_aggregate(lost, time, bins).to_frame()
             raw["lost_cumsum"] = raw["lost"].cumsum()
             raw["lost_relative"] = raw["lost_cumsum"] / raw["lost_cumsum"].max()
             raw.columns = pd.MultiIndex.from_tuples(
@@ -1135,21 +1310,36 @@ class _OppAnalysis(AnalysisBase):
         df = pd.concat(df, axis=1).stack(["rep"])
         return consumer(df)
 
+    @cached_result()
     def run_get_packet_loss(
         self,
         run_map: RunMap,
         app_name: str = "map",
         consumer: FrameConsumer = FrameConsumer.EMPTY,
         pool_size: int = 10,
-    ) -> pd.DataFrame:
-        """Get packet loss for RunMap"""
+        sharded: bool = False,
+    ) -> pd.DataFrame | ShardedFrame:
+        """Get packet loss for RunMap. If sharded is set, return a lazy ShardedFrame
+        instead (see run_sharded). ShardedFrame.concat() returns the same frame."""
+        kwargs_iter = [
+            dict(sim_group=v, app_name=app_name, consumer=consumer)
+            for v in run_map.get_simulation_group()
+        ]
+        if sharded:
+            return self.run_sharded(
+                run_map,
+                self.sg_get_packet_loss,
+                kwargs_iter,
+                key=f"pkt_loss_{app_name}",
+                pool_size=pool_size,
+                verify_integrity=True,
+                sort_index=True,
+            )
         data: List[(pd.DataFrame, dict)] = run_kwargs_map(
             self.sg_get_packet_loss,
-            [
-                dict(sim_group=v, app_name=app_name, consumer=consumer)
-                for v in run_map.get_simulation_group()
-            ],
+            kwargs_iter,
             pool_size=pool_size,
+            reuse_pool=True,
         )
         data: pd.DataFrame = pd.concat(data, axis=0, verify_integrity=True)
         data = data.sort_index()
@@ -1171,6 +1361,7 @@ class _OppAnalysis(AnalysisBase):
             run_dict (Parameter_Variation): _description_
             cell_count (int): Number of cells used for normalization. Might differ from map shape if not reachable cells are
                             removed from the analysis. Removed cells must not have any error value.
+            cell_slice (Tuple(slice) | pd.MultiIndex): Cells used. A MultiIndex may also be given as SharedInput.
             consumer (FrameConsumer, optional): Post changes to the collected DataFrame. Defaults to FrameConsumer.EMPTY.
 
         Returns:
@@ -1178,6 +1369,7 @@ class _OppAnalysis(AnalysisBase):
         """
         df = []
         print(f"execut group: {sim_group.group_name}")
+        cell_slice = resolve_shared(cell_slice)
         if isinstance(cell_slice, pd.MultiIndex):
             if cell_count > 0 and cell_count != cell_slice.shape[0]:
                 raise ValueError(
@@ -1208,6 +1400,7 @@ class _OppAnalysis(AnalysisBase):
             _df.columns.name = "run_id"
             print(f"add: {sim_group.group_name}_{sim.run_context.opp_seed}")
             df.append(_df)
+            sim.release()
         df = pd.concat(df, axis=1, verify_integrity=True)
         df = consumer(df)
         df = df.stack()  # series
@@ -1215,6 +1408,7 @@ class _OppAnalysis(AnalysisBase):
         print(f"done group: {sim_group.group_name}")
         return df
 
+    @cached_result()
     def run_get_msce_data(
         self,
         run_map: RunMap,
@@ -1223,7 +1417,8 @@ class _OppAnalysis(AnalysisBase):
         cell_slice: Tuple(slice) | pd.MultiIndex = (slice(None), slice(None)),
         cell_slice_fc: FrameConsumer = FrameConsumer.EMPTY,
         pool_size: int = 20,
-    ) -> pd.DataFrame:
+        sharded: bool = False,
+    ) -> pd.DataFrame | ShardedFrame:
         """Mean squared (cell) error for *all* ParameterVariations present in given RunMap.
         See sg_get_msce_data for simulation group based function
 
@@ -1234,17 +1429,30 @@ class _OppAnalysis(AnalysisBase):
             cell_count (int): Number of cells used for normalization. Might differ from map shape if not reachable cells are
                             removed from the analysis. Removed cells must not have any error value.
             pool_size (int): Number of parallel processes used. Default 20.
+            sharded (bool): Each process writes its result to a shard which are merged into hdf_path
+                            without loading all results at once. Returns a lazy ShardedFrame. Default False.
 
         Returns:
             pd.DataFrame: cell mean squared error over time, run_id and parameter variation.
                         Index [simtime, run_id]. 'run_id' encodes parameter variations and different seeds.
         """
         if os.path.exists(run_map.path(hdf_path)):
-            data = pd.read_hdf(run_map.path(hdf_path), key="cell_mse")
+            # merged shards are not sorted
+            shards = ShardedFrame(
+                [run_map.path(hdf_path)],
+                key="cell_mse",
+                verify_integrity=True,
+                sort_index=True,
+            )
+            if sharded:
+                return shards
+            data = shards.concat()
         else:
-            data: List[(pd.DataFrame, dict)] = run_kwargs_map(
-                self.sg_get_msce_data,
-                [
+            with SharedInputs() as shared:
+                # publish cell index once instead of pickling it for each group
+                if isinstance(cell_slice, pd.MultiIndex):
+                    cell_slice = shared.publish(cell_slice)
+                kwargs_iter = [
                     dict(
                         sim_group=v,
                         cell_count=cell_count,
@@ -1252,9 +1460,24 @@ class _OppAnalysis(AnalysisBase):
                         cell_slice_fc=cell_slice_fc,
                     )
                     for v in run_map.get_simulation_group()
-                ],
-                pool_size=pool_size,
-            )
+                ]
+                if sharded:
+                    return self.run_sharded(
+                        run_map,
+                        self.sg_get_msce_data,
+                        kwargs_iter,
+                        key="cell_mse",
+                        hdf_path=hdf_path,
+                        pool_size=pool_size,
+                        verify_integrity=True,
+                        sort_index=True,
+                    )
+                data: List[(pd.DataFrame, dict)] = run_kwargs_map(
+                    self.sg_get_msce_data,
+                    kwargs_iter,
+                    pool_size=pool_size,
+                    reuse_pool=True,
+                )
             data: pd.DataFrame = pd.concat(data, axis=0, verify_integrity=True)
             data = data.sort_index()
             data.to_hdf(run_map.path(hdf_path), key="cell_mse", format="table")
@@ -1414,6 +1637,7 @@ class _CellOccupancy:
         return df
 
     @timing
+    @cached_result()
     def run_create_cell_knowledge_ratio(
         self,
         run_map: RunMap,
@@ -1435,6 +1659,7 @@ class _CellOccupancy:
                 self.sg_create_cell_knwoledge_ratio,
                 [dict(sim_group=g, frame_c=frame_c) for g in sim_groups],
                 pool_size=pool_size,
+                reuse_pool=True,
             )
             df = pd.concat(df, axis=0)
 
@@ -1443,6 +1668,90 @@ class _CellOccupancy:
                 df.to_hdf(run_map.path(hdf_path), mode="a", key=hdf_key, format="table")
         return df.to_frame() if isinstance(df, pd.Series) else df
 
+    @staticmethod
+    def cell_occupation(
+        position_df: pd.DataFrame, time_index: pd.Index
+    ) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """Occupation of each cell at each time and the resulting occupied/empty
+        intervals. The occupation is built as dense (cells x times) matrix and
+        the intervals are extracted by run-length encoding of each cell.
+
+        The time steps of a cell are all steps of time_index and additionally the
+        position times (not part of time_index) at which the cell is occupied.
+
+        Args:
+            position_df (pd.DataFrame): node positions (simtime, node_id)[x, y]
+            time_index (pd.Index): all time steps of the simulation
+
+        Returns:
+            Tuple[pd.DataFrame, pd.DataFrame]: (x, y, simtime)[cell_occupied, occupation_time_delta]
+            and (x, y, cell_occupied)[start, end, delta]. The first interval of
+            each cell is always occupied and the last (open) interval is not reported.
+        """
+        pos_times = position_df.index.get_level_values("simtime").to_numpy(dtype=float)
+        base_times = np.unique(np.asarray(time_index, dtype=float))
+        times = np.union1d(base_times, pos_times)
+        cells = pd.MultiIndex.from_arrays(
+            [position_df["x"].to_numpy(), position_df["y"].to_numpy()],
+            names=["x", "y"],
+        )
+        cell_codes, cells = cells.factorize(sort=True)
+        cells = cells.set_names(["x", "y"])
+        num_cells, num_times = len(cells), len(times)
+
+        # occupation matrix (cells x times)
+        occupied = np.zeros((num_cells, num_times), dtype=bool)
+        occupied[cell_codes, np.searchsorted(times, pos_times)] = True
+        # time steps of each cell in (cell, simtime) order
+        present = occupied | np.isin(times, base_times)[np.newaxis, :]
+        p_cell, p_time = np.nonzero(present)
+        p_occupied = occupied[p_cell, p_time]
+        p_simtime = times[p_time]
+        first = np.ones(len(p_cell), dtype=bool)
+        first[1:] = p_cell[1:] != p_cell[:-1]
+        # assume something for the first value. Will be removed anyway..
+        time_delta = np.where(first, 1.0, p_simtime - np.append(0.0, p_simtime[:-1]))
+
+        x_level, x_codes = np.unique(cells.get_level_values("x"), return_inverse=True)
+        y_level, y_codes = np.unique(cells.get_level_values("y"), return_inverse=True)
+        idx = pd.MultiIndex(
+            levels=[x_level, y_level, times],
+            codes=[x_codes[p_cell], y_codes[p_cell], p_time],
+            names=["x", "y", "simtime"],
+        )
+        _df = pd.DataFrame(
+            {"cell_occupied": p_occupied, "occupation_time_delta": time_delta},
+            index=idx,
+        )
+
+        # run-length encoding: position of value changes (first time always included)
+        change = first.copy()
+        change[1:] |= p_occupied[1:] != p_occupied[:-1]
+        change = np.flatnonzero(change)
+        c_cell = p_cell[change]
+        # each change starts an interval ending at the next change of the same cell
+        valid = np.append(c_cell[1:] == c_cell[:-1], False)
+        interval_type = p_occupied[change]
+        # first tracked interval must be occupied because the cell only gets occupied
+        # at the end of the interval for the first time.
+        valid &= ~(first[change] & ~interval_type)
+        start = p_simtime[change[valid]]
+        end = p_simtime[change[np.flatnonzero(valid) + 1]]
+        _df_intervals = pd.DataFrame(
+            {
+                "x": cells.get_level_values("x")[c_cell[valid]],
+                "y": cells.get_level_values("y")[c_cell[valid]],
+                "cell_occupied": interval_type[valid],
+                "start": start,
+                "end": end,
+                "delta": end - start,
+            }
+        )
+        _df_intervals = _df_intervals.set_index(
+            ["x", "y", "cell_occupied"]
+        ).sort_index()
+        return _df, _df_intervals
+
     def sim_create_cell_occupation_info(
         self,
         sim: Simulation,
@@ -1459,92 +1768,11 @@ class _CellOccupancy:
         Returns:
             CellOccupancyInfo:
         """
-        time_index = sim.get_dcdMap().count_p[_i[:, :, :, 0], ["count"]]
-        time_index = pd.Index(
-            time_index.index.get_level_values("simtime").unique().sort_values(),
-            name="simtime",
-        )
-        other = time_index.to_frame().reset_index(drop=True)
-        d = sim.get_dcdMap().position_df.reset_index().set_index(["simtime", "x", "y"])
-        d = d.groupby(d.index.names).count().reset_index(["simtime"])
-        _df = []
-        _df_intervals = []
-        for g, df in d.groupby(["x", "y"]):
-            # index (x, y, simtime). With number of nodes in the cell (x, y) at t.
-            # note that simtime will not contain all time steps if ther is no agent in
-            # that cell at this time
-            _d = df.reset_index().set_index(["x", "y", "simtime"]).copy()
-            _d.columns = ["cell_occupied"]
-            # prepair index of missing cell/time idenices which are not part of _d
-            other["x"] = g[0]
-            other["y"] = g[1]
-            other = other[["x", "y", "simtime"]]
-            idx = pd.MultiIndex.from_frame(other, names=["x", "y", "simtime"])
-            idx = idx.difference(_d.index)
-            # append missing cell/time indecies with cell_occupied value of 0.0
-            _d = pd.concat(
-                [_d, pd.DataFrame(0, columns=["cell_occupied"], index=idx)],
-                axis=0,
-                verify_integrity=False,
-            ).sort_index()
-            # make cell_occupied value to boolean column
-            _d["cell_occupied"] = _d["cell_occupied"] >= 1
-            # append time diff column to get the 'interval' length of the cell_occupied flag
-            # assume something for the first value. Will be removed anyway..
-            _time_diff = (
-                _d.index.get_level_values("simtime")
-                .to_frame()
-                .diff()
-                .fillna(1.0)
-                .values
-            )
-            _d["occupation_time_delta"] = _time_diff
-            # create occupied/empty intervals for current cell
-            intervals = []
-            _start = None
-            _interval_type = None
-            changes = _d.index[_d["cell_occupied"].diff().fillna(True).values]
-            for c in changes:
-                if _start is None:
-                    # handle first loop
-                    _start = c
-                    _interval_type = _d.loc[c, "cell_occupied"]
-                    _start = c[-1]
-                    continue
-                _delta_t = c[-1] - _start
-                if len(intervals) == 0 and _interval_type == False:
-                    # first tracked intervall must be ouccupied
-                    # because the cell only get's occupied at the end of the interval
-                    # for the first time. Thus during the current interval we do not have any knowledge.
-                    pass
-                else:
-                    # save interval
-                    intervals.append((_interval_type, _start, c[-1], _delta_t))
-                _interval_type = _d.loc[c, "cell_occupied"]
-                _start = c[-1]
-            _idx = pd.MultiIndex.from_tuples(
-                [g for _ in range(len(intervals))], names=["x", "y"]
-            )
-            _df_intervals.append(
-                pd.DataFrame(
-                    intervals,
-                    columns=["cell_occupied", "start", "end", "delta"],
-                    index=_idx,
-                )
-            )
-            intervals.clear()
-            _df.append(_d)
-
-        # concat data and apply consumer
-        _df = pd.concat(_df, axis=0, verify_integrity=True).sort_index()
+        dmap = sim.get_dcdMap()
+        time_index = dmap.count_p[_i[:, :, :, 0], ["count"]]
+        time_index = time_index.index.get_level_values("simtime").unique()
+        _df, _df_intervals = self.cell_occupation(dmap.position_df, time_index)
         _df = frame_c(_df)
-
-        _df_intervals = (
-            pd.concat(_df_intervals, axis=0, verify_integrity=False)
-            .reset_index()
-            .set_index(["x", "y", "cell_occupied"])
-            .sort_index()
-        )
         _df_intervals = frame_c(_df_intervals)
 
         occup = _df[_df["cell_occupied"]].drop(columns=["cell_occupied"])
@@ -1554,19 +1782,24 @@ class _CellOccupancy:
         )
 
         _t = _df.index.get_level_values("simtime").unique()
-        time_interval = pd.interval_range(
-            0.0, _t.max(), freq=interval_bin_size, closed="left"
-        )
-        occup["bins"] = pd.cut(occup.index.get_level_values(-1), time_interval)
+        time_interval = TimeBins.from_range(0.0, _t.max(), interval_bin_size)
         occup_interval_by_cell = (
-            occup.reset_index()
-            .groupby(["x", "y", "bins"])["occupation_time_delta"]
-            .sum()
+            bin_aggregate(
+                occup["occupation_time_delta"],
+                occup.index.get_level_values(-1),
+                time_interval,
+                by=[
+                    occup.index.get_level_values("x"),
+                    occup.index.get_level_values("y"),
+                ],
+                label="interval",
+                name="bins",
+            )
             / interval_bin_size
         )
         occup_interval_by_cell = occup_interval_by_cell.to_frame()
 
-        idx = sim.get_dcdMap().metadata.create_min_grid_index(
+        idx = dmap.metadata.create_min_grid_index(
             occup_sim_by_cell.index, difference_only=True
         )
         occup_grid = pd.concat(
@@ -1686,6 +1919,7 @@ class _CellOccupancy:
                     for sim_id in seed_set.values()
                 ],
                 pool_size=pool_size,
+                reuse_pool=True,
             )
             info = CellOccupancyInfo.concat(infos)
             info.to_hdf(run_map.path(hdf_path))
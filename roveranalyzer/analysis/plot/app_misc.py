@@ -15,6 +15,7 @@ from roveranalyzer.analysis.common import Simulation
 from roveranalyzer.analysis.flaskapp.application.layout import IdProvider
 from roveranalyzer.analysis.omnetpp import OppAnalysis
 from roveranalyzer.simulators.opp.provider.hdf.IHdfProvider import BaseHdfProvider
+from roveranalyzer.utils.binning import TimeBins, bin_aggregate
 from roveranalyzer.utils.logging import logger, timing
 from roveranalyzer.utils.plot import (
     FigureSaver,
@@ -129,11 +130,16 @@ class PlotAppMisc_(PlotUtil_):
     def ts_mean(data: pd.DataFrame, time_bin=1.0, index="time", col="value"):
         if index in data.columns:
             data = data.reset_index().set_index(index)
-        time_int = pd.interval_range(
-            0.0, data.index.max(), freq=time_bin, closed="left"
+        time_int = TimeBins.from_range(0.0, data.index.max(), time_bin)
+        data = bin_aggregate(
+            data.loc[:, col],
+            data.index,
+            time_int,
+            how=["count", "mean", "std", "min", 0.25, 0.5, 0.75, "max"],
+            label="interval",
+            name=None,
         )
-        data = data.loc[:, col].groupby(pd.cut(data.index, bins=time_int)).describe()
-        data.reset_index().rename(columns={"index": "interval"})
+        data["count"] = data["count"].astype(float)
         data["time"] = time_int.left
         return data
 
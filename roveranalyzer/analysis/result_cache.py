@@ -0,0 +1,114 @@
+""" Result cache for RunMap based analysis results.
+
+The cache key of a result is derived from the function name, the normalized function
+arguments, the simulation paths of the RunMap (or SimulationGroup/Simulation) and the
+size and modification time of the simulation output and hdf files. Results are saved in
+one hdf file per RunMap output directory (see roveranalyzer.utils.result_cache).
+"""
+from __future__ import annotations
+
+import inspect
+import os
+from functools import wraps
+from typing import Callable, Iterable
+
+import pandas as pd
+
+from roveranalyzer.analysis.common import RunMap, Simulation, SimulationGroup
+from roveranalyzer.utils.logging import logger
+from roveranalyzer.utils.result_cache import (
+    ResultCache,
+    UncacheableArgument,
+    cache_key,
+    file_fingerprint,
+    normalize_arg,
+    register_normalizer,
+)
+
+
+def _normalize_run_map(val: RunMap, _n) -> tuple:
+    return ("RunMap", [_n(g) for g in val.get_simulation_group()])
+
+
+def _normalize_sim_group(val: SimulationGroup, _n) -> tuple:
+    return ("SimulationGroup", val.group_name, _n(val.attr), [_n(s) for s in val])
+
+
+def _normalize_simulation(val: Simulation, _n) -> tuple:
+    return (
+        "Simulation",
+        os.path.abspath(val.data_root),
+        val.label,
+        val._id_offset,
+        file_fingerprint(val.data_root, ResultCache.INPUT_PATTERNS),
+    )
+
+
+register_normalizer(RunMap, _normalize_run_map)
+register_normalizer(SimulationGroup, _normalize_sim_group)
+register_normalizer(Simulation, _normalize_simulation)
+
+
+def run_map_cache(run_map: RunMap, max_size: int | None = None) -> ResultCache:
+    """ResultCache in the output directory of the RunMap"""
+    return ResultCache(run_map.path("result_cache.h5"), max_size=max_size)
+
+
+def cached_result(ignore: Iterable[str] = ("pool_size",)):
+    """Cache DataFrame/Series results of RunMap based analysis functions in the
+    ResultCache of the RunMap. Functions without a RunMap argument are not cached.
+
+    The cache is opt-in: results are only cached if ResultCache.enabled is set or the
+    wrapped function is called with the additional keyword argument 'use_cache=True'
+    ('use_cache=False' bypasses the cache for a single call).
+
+    The simulation files are fingerprinted again after the call and the result is saved
+    under this key. Hdf files written by the function itself (e.g. materialized
+    measures) thus do not invalidate the saved result.
+
+    Args:
+        ignore (Iterable[str], optional): Arguments not used for the cache key. Defaults to ("pool_size",).
+    """
+    ignore = set(ignore) | {"self", "cls"}
+
+    def _decorator(func: Callable):
+        sig = inspect.signature(func)
+
+        @wraps(func)
+        def _cached(*args, use_cache: bool | None = None, **kwargs):
+            if use_cache is None:
+                use_cache = ResultCache.enabled
+            bound = sig.bind(*args, **kwargs)
+            bound.apply_defaults()
+            run_map = next(
+                (v for v in bound.arguments.values() if isinstance(v, RunMap)), None
+            )
+            if not use_cache or run_map is None:
+                return func(*args, **kwargs)
+
+            cache = run_map_cache(run_map)
+
+            def _key():
+                return cache_key(
+                    func.__qualname__,
+                    {k: v for k, v in bound.arguments.items() if k not in ignore},
+                )
+
+            try:
+                key = _key()
+            except UncacheableArgument as e:
+                logger.info(f"{func.__name__}: result not cached. {e}")
+                return func(*args, **kwargs)
+            ret = cache.get(key)
+            if ret is not None:
+                logger.info(f"{func.__name__}: use cached result {key}")
+                return ret
+            ret = func(*args, **kwargs)
+            if isinstance(ret, (pd.DataFrame, pd.Series)):
+                # fingerprint of the files after the call (see above)
+                cache.put(_key(), func.__qualname__, ret)
+            return ret
+
+        return _cached
+
+    return _decorator
@@ -0,0 +1,137 @@
+import os
+import sqlite3
+import unittest
+
+import numpy as np
+import pandas as pd
+from fs.tempfs import TempFS
+
+from roveranalyzer.analysis.link_stats import LinkStatistics
+from roveranalyzer.simulators.opp.provider.hdf.tests.utils import (
+    create_tmp_fs,
+    make_dirs,
+)
+from roveranalyzer.simulators.opp.scave import OppSql
+
+
+def create_packets(links=6, packets=300, seed=3) -> pd.DataFrame:
+    """Received packets of some links with randomly dropped sequence numbers."""
+    rnd = np.random.default_rng(seed)
+    df = []
+    for link in range(links):
+        seq = np.arange(packets)
+        seq = seq[rnd.random(packets) > 0.2]
+        df.append(
+            pd.DataFrame(
+                {
+                    "hostId": link % 3,
+                    "srcHostId": 10 + link,
+                    "time": seq * 0.05 + rnd.uniform(0.0, 0.01, len(seq)),
+                    "seqNo": seq,
+                    "delay": rnd.uniform(0.001, 0.02, len(seq)),
+                }
+            )
+        )
+    return pd.concat(df, ignore_index=True).sort_values("time", ignore_index=True)
+
+
+def jitter_loop(delay: np.ndarray) -> float:
+    """RFC 3550 jitter estimator"""
+    j = 0.0
+    for i in range(1, len(delay)):
+        j += (abs(delay[i] - delay[i - 1]) - j) / 16
+    return j
+
+
+class LinkStatisticsTest(unittest.TestCase):
+    def test_windows_equal_full_data(self):
+        df = create_packets()
+        full = LinkStatistics().update(df, time=0.0).droplevel("time")
+
+        stats = LinkStatistics()
+        windows = [
+            stats.update(_df, time=t)
+            for t, _df in df.groupby(np.floor(df["time"] / 1.0))
+        ]
+        ret = pd.concat(windows)
+        self.assertEqual(len(stats), 6)
+        last = ret.groupby(level=["hostId", "srcHostId"]).last()
+        cumulative = ["jitter", "pkt_loss_sum", "total_pkt_received", "PRR"]
+        pd.testing.assert_frame_equal(last[cumulative], full[cumulative])
+        np.testing.assert_array_equal(
+            ret.groupby(level=["hostId", "srcHostId"])["pkt_lost"].sum(),
+            full["pkt_lost"],
+        )
+
+        for (host, src), _df in df.groupby(["hostId", "srcHostId"]):
+            seq = _df["seqNo"]
+            self.assertEqual(
+                full.loc[(host, src), "pkt_loss_sum"],
+                seq.max() - seq.min() + 1 - len(seq),
+            )
+            self.assertAlmostEqual(
+                full.loc[(host, src), "jitter"], jitter_loop(_df["delay"].to_numpy())
+            )
+            self.assertAlmostEqual(
+                full.loc[(host, src), "delay_max"], _df["delay"].max()
+            )
+
+    def test_late_packets_and_self_messages(self):
+        df = pd.DataFrame(
+            {
+                "hostId": [1, 1, 1, 1, 2],
+                "srcHostId": [2, 2, 2, 2, 2],
+                "time": [0.1, 0.2, 0.3, 0.4, 0.5],
+                "seqNo": [0, 3, 2, 4, 0],
+                "delay": [0.1, 0.1, 0.1, 0.1, 0.1],
+            }
+        )
+        ret = LinkStatistics().update(df, time=0.0)
+        self.assertEqual(ret.shape[0], 1)
+        self.assertEqual(ret["pkt_lost"].iloc[0], 2)
+        self.assertEqual(ret["total_pkt_received"].iloc[0], 4)
+
+
+class VecDataWindowsTest(unittest.TestCase):
+    fs: TempFS = create_tmp_fs("VecDataWindowsTest")
+    test_out_dir: str = os.path.join(fs.root_path, "unittest")
+
+    @classmethod
+    def setUpClass(cls):
+        make_dirs(cls.test_out_dir)
+        cls.vec_path = os.path.join(cls.test_out_dir, "vars_rep_0.vec")
+        rnd = np.random.default_rng(5)
+        time = np.sort(rnd.integers(0, 10 * 10**12, 1000))
+        cls.data = pd.DataFrame(
+            {
+                "vectorId": rnd.integers(1, 4, len(time)),
+                "eventNumber": np.arange(len(time)),
+                "simtimeRaw": time,
+                "value": rnd.normal(size=len(time)),
+            }
+        )
+        with sqlite3.connect(cls.vec_path) as con:
+            # unordered table: rows are ordered by the query
+            cls.data.sample(frac=1.0, random_state=1).to_sql(
+                "vectorData", con, index=False
+            )
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.fs.close()
+
+    def test_windows(self):
+        sql = OppSql(vec_path=self.vec_path)
+        ret = list(sql.vec_data_windows(ids=[1, 2], window=0.5, chunksize=64))
+        expected = self.data[self.data["vectorId"] <= 2]
+        w = expected["simtimeRaw"] // (5 * 10**11)
+        self.assertListEqual([t for t, _ in ret], list(np.unique(w) * 0.5))
+        for t, df in ret:
+            self.assertTrue(((df["time"] >= t) & (df["time"] < t + 0.5)).all())
+        df = pd.concat([df for _, df in ret], ignore_index=True)
+        np.testing.assert_array_equal(df["eventNumber"], expected["eventNumber"])
+        np.testing.assert_allclose(df["time"], expected["simtimeRaw"] / 1e12)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,205 @@
+import os
+import timeit
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+from fs.tempfs import TempFS
+
+from roveranalyzer.analysis.omnetpp import CellOccupancy, HdfExtractor, OppAnalysis
+from roveranalyzer.simulators.opp.provider.hdf.IHdfProvider import BaseHdfProvider
+from roveranalyzer.simulators.opp.provider.hdf.tests.utils import (
+    create_tmp_fs,
+    make_dirs,
+)
+
+
+def create_sinr_enb(hosts=5, times=40, seed=42) -> pd.DataFrame:
+    """Merged SINR and servingCell data. The eNB is only known at some time steps."""
+    rnd = np.random.default_rng(seed)
+    idx = pd.MultiIndex.from_product(
+        [np.arange(hosts), np.arange(times, dtype=float) * 0.1],
+        names=["hostId", "time"],
+    )
+    df = pd.DataFrame(index=idx)
+    df["mSinrUl"] = rnd.normal(size=len(idx))
+    df["mSinrDl"] = rnd.normal(size=len(idx))
+    df["eNB"] = np.where(
+        rnd.random(len(idx)) < 0.1, rnd.integers(1, 4, len(idx)), np.nan
+    )
+    return df
+
+
+def ffill_loop(df: pd.DataFrame) -> pd.DataFrame:
+    """old implementation (one .loc write per host)"""
+    for _, _df in df.groupby(level=["hostId"]):
+        df.loc[_df.index, "eNB"] = _df["eNB"].ffill()
+    return df
+
+
+def create_positions(nodes=4, times=12, cells=3, seed=5) -> pd.DataFrame:
+    """Node positions on a small grid. Some time steps are missing for all nodes."""
+    rnd = np.random.default_rng(seed)
+    simtime = np.arange(times, dtype=float)
+    simtime = simtime[rnd.random(times) < 0.8]
+    idx = pd.MultiIndex.from_product(
+        [simtime, np.arange(nodes)], names=["simtime", "node_id"]
+    )
+    df = pd.DataFrame(index=idx)
+    df["x"] = rnd.integers(0, cells, len(idx)).astype(float) * 3.0
+    df["y"] = rnd.integers(0, cells, len(idx)).astype(float) * 3.0
+    return df
+
+
+def cell_occupation_loop(position_df: pd.DataFrame, time_index: pd.Index):
+    """old implementation (one iteration per cell)"""
+    time_index = pd.Index(time_index.unique().sort_values(), name="simtime")
+    other = time_index.to_frame().reset_index(drop=True)
+    d = position_df.reset_index().set_index(["simtime", "x", "y"])
+    d = d.groupby(d.index.names).count().reset_index(["simtime"])
+    _df = []
+    _df_intervals = []
+    for g, df in d.groupby(["x", "y"]):
+        _d = df.reset_index().set_index(["x", "y", "simtime"]).copy()
+        _d.columns = ["cell_occupied"]
+        other["x"] = g[0]
+        other["y"] = g[1]
+        other = other[["x", "y", "simtime"]]
+        idx = pd.MultiIndex.from_frame(other, names=["x", "y", "simtime"])
+        idx = idx.difference(_d.index)
+        _d = pd.concat(
+            [_d, pd.DataFrame(0, columns=["cell_occupied"], index=idx)],
+            axis=0,
+            verify_integrity=False,
+        ).sort_index()
+        _d["cell_occupied"] = _d["cell_occupied"] >= 1
+        _time_diff = (
+            _d.index.get_level_values("simtime").to_frame().diff().fillna(1.0).values
+        )
+        _d["occupation_time_delta"] = _time_diff
+        intervals = []
+        _start = None
+        _interval_type = None
+        changes = _d.index[_d["cell_occupied"].diff().fillna(True).values]
+        for c in changes:
+            if _start is None:
+                _interval_type = _d.loc[c, "cell_occupied"]
+                _start = c[-1]
+                continue
+            if not (len(intervals) == 0 and _interval_type == False):
+                intervals.append((_interval_type, _start, c[-1], c[-1] - _start))
+            _interval_type = _d.loc[c, "cell_occupied"]
+            _start = c[-1]
+        _df_intervals.append(
+            pd.DataFrame(
+                intervals,
+                columns=["cell_occupied", "start", "end", "delta"],
+                index=pd.MultiIndex.from_tuples(
+                    [g for _ in range(len(intervals))], names=["x", "y"]
+                ),
+            )
+        )
+        _df.append(_d)
+    _df = pd.concat(_df, axis=0, verify_integrity=True).sort_index()
+    _df_intervals = (
+        pd.concat(_df_intervals, axis=0, verify_integrity=False)
+        .reset_index()
+        .set_index(["x", "y", "cell_occupied"])
+        .sort_index()
+    )
+    return _df, _df_intervals
+
+
+class CellOccupancyTest(unittest.TestCase):
+    def test_cell_occupation(self):
+        position_df = create_positions()
+        pos_times = position_df.index.get_level_values("simtime").unique()
+        for time_index in [
+            pos_times,
+            pd.Index(np.arange(12, dtype=float)),
+            # position times which are not part of the time index
+            pos_times[::2],
+        ]:
+            expected = cell_occupation_loop(position_df, time_index)
+            ret = CellOccupancy.cell_occupation(position_df, time_index)
+            pd.testing.assert_frame_equal(ret[0], expected[0])
+            pd.testing.assert_frame_equal(ret[1], expected[1])
+
+
+class SinrServingEnbTest(unittest.TestCase):
+    def test_ffill_serving_enb(self):
+        df = create_sinr_enb()
+        expected = ffill_loop(df.copy())
+        ret = OppAnalysis.ffill_serving_enb(df.copy())
+        pd.testing.assert_frame_equal(ret, expected)
+        # no fill across hosts
+        first = ret.groupby(level="hostId").head(1)
+        src_first = df.groupby(level="hostId").head(1)
+        pd.testing.assert_series_equal(first["eNB"], src_first["eNB"])
+
+    @unittest.skipUnless(os.environ.get("ROVER_BENCHMARK"), "set ROVER_BENCHMARK=1")
+    def test_benchmark_ffill_serving_enb(self):
+        df = create_sinr_enb(hosts=2000, times=200)
+        t_loop = timeit.timeit(lambda: ffill_loop(df.copy()), number=1)
+        t_vec = timeit.timeit(
+            lambda: OppAnalysis.ffill_serving_enb(df.copy()), number=1
+        )
+        print(
+            f"ffill eNB ({df.shape[0]} rows): loop {t_loop:.3f}s grouped {t_vec:.3f}s"
+        )
+        self.assertLess(t_vec, t_loop)
+
+
+def window_stats(sql, module_name, window=1.0):
+    """replaces OppAnalysis.iter_received_packet_stats"""
+    for t in range(2):
+        idx = pd.Index([t * window], name="time")
+        yield pd.DataFrame({"pkt_count": [t + 1]}, index=idx)
+
+
+class HdfExtractorTest(unittest.TestCase):
+    fs: TempFS = create_tmp_fs("HdfExtractorTest")
+    test_out_dir: str = os.path.join(fs.root_path, "unittest")
+
+    @classmethod
+    def setUpClass(cls):
+        make_dirs(cls.test_out_dir)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.fs.close()
+
+    def test_window_statistics_in_existing_file(self):
+        hdf_file = os.path.join(self.test_out_dir, "rcvd_stats.h5")
+        # cumulative statistics extracted first
+        BaseHdfProvider(hdf_file).write_frame(
+            "rcvd_stats", pd.DataFrame({"PRR": [1.0]})
+        )
+        sql = mock.Mock()
+        with mock.patch.object(OppAnalysis, "iter_received_packet_stats", window_stats):
+            HdfExtractor.extract_rvcd_window_statistics(hdf_file, sql)
+            df = BaseHdfProvider(hdf_file).get_dataframe("rcvd_window_stats")
+            self.assertEqual(df.shape[0], 4)
+            # existing group is not extracted again
+            HdfExtractor.extract_rvcd_window_statistics(hdf_file, sql)
+        df = BaseHdfProvider(hdf_file).get_dataframe("rcvd_window_stats")
+        self.assertEqual(df.shape[0], 4)
+
+    def test_incomplete_window_statistics(self):
+        hdf_file = os.path.join(self.test_out_dir, "incomplete.h5")
+
+        def failing_stats(sql, module_name, window=1.0):
+            yield from window_stats(sql, module_name, window)
+            raise RuntimeError("simulation output incomplete")
+
+        with mock.patch.object(
+            OppAnalysis, "iter_received_packet_stats", failing_stats
+        ):
+            with self.assertRaises(RuntimeError):
+                HdfExtractor.extract_rvcd_window_statistics(hdf_file, mock.Mock())
+        self.assertFalse(BaseHdfProvider(hdf_file).contains_group("rcvd_window_stats"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+import os
+import time
+import unittest
+
+import numpy as np
+import pandas as pd
+from fs.tempfs import TempFS
+
+from roveranalyzer.analysis.common import RunMap, Simulation, SimulationGroup
+from roveranalyzer.analysis.result_cache import ResultCache, cached_result
+from roveranalyzer.simulators.opp.provider.hdf.tests.utils import (
+    create_tmp_fs,
+    make_dirs,
+)
+
+
+class _Analysis:
+    def __init__(self) -> None:
+        self.calls = 0
+
+    @cached_result()
+    def run_sum(
+        self, run_map: RunMap, cell_slice=(slice(None), slice(None)), pool_size=1
+    ):
+        self.calls += 1
+        return pd.DataFrame({"val": np.arange(4, dtype=float)})
+
+    @cached_result()
+    def run_materialize(self, run_map: RunMap):
+        """writes to the hdf file of the simulation (e.g. DcdMap2D measures)"""
+        self.calls += 1
+        for sim in run_map.get_simulation_group()[0]:
+            with open(os.path.join(sim.data_root, "data.h5"), "a") as fd:
+                fd.write("measure")
+        return pd.DataFrame({"val": np.arange(4, dtype=float)})
+
+
+class ResultCacheTest(unittest.TestCase):
+    fs: TempFS = create_tmp_fs("ResultCacheTest")
+    test_out_dir: str = os.path.join(fs.root_path, "unittest")
+
+    @classmethod
+    def setUpClass(cls):
+        make_dirs(os.path.join(cls.test_out_dir, "sim_0"))
+        with open(os.path.join(cls.test_out_dir, "sim_0", "vars_rep_0.sca"), "w") as fd:
+            fd.write("v0")
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.fs.close()
+
+    def setUp(self):
+        ResultCache.enabled = True
+
+    def tearDown(self):
+        ResultCache.enabled = False
+
+    def run_map(self, out="out") -> RunMap:
+        run_map = RunMap(os.path.join(self.test_out_dir, out))
+        sim = Simulation(os.path.join(self.test_out_dir, "sim_0"), label="s0")
+        run_map["g0"] = SimulationGroup("g0", [sim])
+        return run_map
+
+    def test_hit_and_miss(self):
+        a = _Analysis()
+        df = a.run_sum(self.run_map())
+        pd.testing.assert_frame_equal(a.run_sum(self.run_map(), pool_size=4), df)
+        self.assertEqual(a.calls, 1)
+        # changed argument
+        a.run_sum(self.run_map(), cell_slice=(slice(0, 2), slice(None)))
+        self.assertEqual(a.calls, 2)
+        # bypass cache
+        a.run_sum(self.run_map(), use_cache=False)
+        self.assertEqual(a.calls, 3)
+        # changed simulation output
+        time.sleep(0.01)
+        with open(
+            os.path.join(self.test_out_dir, "sim_0", "vars_rep_0.sca"), "w"
+        ) as fd:
+            fd.write("v1 changed")
+        a.run_sum(self.run_map())
+        self.assertEqual(a.calls, 4)
+        # changed hdf file of the simulation
+        with open(os.path.join(self.test_out_dir, "sim_0", "data.h5"), "w") as fd:
+            fd.write("h5")
+        a.run_sum(self.run_map())
+        self.assertEqual(a.calls, 5)
+        # arguments without stable representation are not cached
+        a.run_sum(self.run_map(), cell_slice=iter([1]))
+        a.run_sum(self.run_map(), cell_slice=iter([1]))
+        self.assertEqual(a.calls, 7)
+
+    def test_output_written_by_call(self):
+        a = _Analysis()
+        a.run_materialize(self.run_map("out_materialize"))
+        a.run_materialize(self.run_map("out_materialize"))
+        self.assertEqual(a.calls, 1)
+
+    def test_opt_in(self):
+        ResultCache.enabled = False
+        a = _Analysis()
+        a.run_sum(self.run_map("out_opt_in"))
+        a.run_sum(self.run_map("out_opt_in"))
+        self.assertEqual(a.calls, 2)
+        self.assertFalse(
+            os.path.exists(self.run_map("out_opt_in").path("result_cache.h5"))
+        )
+        a.run_sum(self.run_map("out_opt_in"), use_cache=True)
+        a.run_sum(self.run_map("out_opt_in"), use_cache=True)
+        self.assertEqual(a.calls, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
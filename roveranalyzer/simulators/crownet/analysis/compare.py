@@ -1,17 +1,25 @@
 import datetime
-import math
+import itertools
 import os
 import re
 from enum import Enum
-from typing import List, Union, Tuple, Any, Dict
+from typing import Any, Dict, List, Tuple, Union
 
 import numpy as np
 import pandas as pd
 from matplotlib import pyplot as plt
+from scipy.spatial import cKDTree
+from scipy.spatial.distance import cdist
 
 from roveranalyzer.simulators.opp.scave import ScaveTool
 from roveranalyzer.simulators.opp.utils import Simulation
 from roveranalyzer.utils import PathHelper
+from roveranalyzer.utils.binning import TimeBins, aggregate_codes
+from roveranalyzer.utils.parallel import run_kwargs_map
+from roveranalyzer.utils.result_cache import ResultCache, cache_key, file_fingerprint
+
+# default name of the (opt-in) vector cache, see _read_vectors_from_simulation()
+VECTOR_CACHE = "vector_cache.h5"
 
 
 class How(Enum):
@@ -187,7 +195,7 @@ def distance_plot_mean(
         float("".join(c for c in enb[0] if (c.isdigit() or c == "."))),
         float("".join(c for c in enb[1] if (c.isdigit() or c == "."))),
     )
-    dfs = [_read_position_data(sim, True) for sim in sims]
+    dfs = [_read_position_data(sim) for sim in sims]
     dfs_dist_nodes = [_distances_between_nodes(df) for df in dfs]
 
     dfs_dist_enb = [_distance_between_nodes_enb(df, enb) for df in dfs]
@@ -335,13 +343,87 @@ def plot_comparison(
     )
 
 
+def _positions_to_array(df: pd.DataFrame) -> Tuple[np.ndarray, pd.Index]:
+    """Converts positional data into a float array of shape (time, node, 2). Missing positions are NaN.
+
+    :param df: DataFrame containing positional data as posX/posY column pairs (e.g. as returned by
+               read_position_data()) or in tuple form (read_position_data(as_tuples=True))
+    :return: array of shape (time, node, 2) and the node columns (e.g. 'pNode[0].pos')
+    """
+    x_cols, y_cols = df.columns[0::2], df.columns[1::2]
+    if (
+        len(x_cols) == len(y_cols)
+        and all("posX" in str(c) for c in x_cols)
+        and all("posY" in str(c) for c in y_cols)
+    ):
+        columns = pd.Index([f"{c.split('.')[0]}.pos" for c in x_cols])
+        pos = df.to_numpy(dtype=float).reshape((df.shape[0], len(x_cols), 2))
+        return pos, columns
+
+    # tuple form: all cells at once (row major). Cells without position (e.g. NaN) stay NaN.
+    cells = df.to_numpy(dtype=object).ravel()
+    valid = ~pd.isna(cells)
+    pos = np.full((cells.size, 2), np.nan)
+    pos[valid] = np.fromiter(
+        itertools.chain.from_iterable(cells[valid]), float, 2 * int(valid.sum())
+    ).reshape((-1, 2))
+    return pos.reshape((df.shape[0], df.shape[1], 2)), df.columns
+
+
+def _mean_distances(pos: np.ndarray) -> np.ndarray:
+    """Average distance of each node to all other active nodes for each time step.
+
+    :param pos: positions of shape (time, node, 2). A node is inactive if its x coordinate is NaN.
+    :return: array of shape (time, node). NaN for inactive nodes and time steps with a single active node.
+    """
+    n_time, n_node, _ = pos.shape
+    ret = np.full((n_time, n_node), np.nan)
+    for t in range(n_time):
+        idx = np.flatnonzero(~np.isnan(pos[t, :, 0]))
+        if len(idx) < 2:
+            continue
+        _pos = pos[t, idx]
+        ret[t, idx] = cdist(_pos, _pos).sum(axis=1) / (len(idx) - 1)
+    return ret
+
+
+def _neighbor_distances(
+    pos: np.ndarray, radius: float
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Number of neighbors within radius and the average distance to them for each node
+    and time step. Based on a KD-tree of the active nodes of each time step.
+
+    :param pos: positions of shape (time, node, 2). A node is inactive if its x coordinate is NaN.
+    :param radius: maximum distance of a neighbor
+    :return: neighbor count and mean distance, both of shape (time, node). The mean distance is NaN for
+             inactive nodes and nodes without neighbors. The count is NaN for inactive nodes.
+    """
+    n_time, n_node, _ = pos.shape
+    count = np.full((n_time, n_node), np.nan)
+    mean = np.full((n_time, n_node), np.nan)
+    for t in range(n_time):
+        idx = np.flatnonzero(~np.isnan(pos[t, :, 0]))
+        if len(idx) == 0:
+            continue
+        tree = cKDTree(pos[t, idx])
+        # ndarray output keeps pairs with distance 0 (nodes at the same position)
+        pairs = tree.sparse_distance_matrix(tree, radius, output_type="ndarray")
+        pairs = pairs[pairs["i"] != pairs["j"]]
+        _count = np.bincount(pairs["i"], minlength=len(idx))
+        _sum = np.bincount(pairs["i"], weights=pairs["v"], minlength=len(idx))
+        count[t, idx] = _count
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean[t, idx] = np.where(_count > 0, _sum / _count, np.nan)
+    return count, mean
+
+
 def _distance_between_nodes_enb(
     df: pd.DataFrame, enb: Tuple[float, float]
 ) -> pd.DataFrame:
     """For a dataframe containing positional data of a simulations nodes. Returns d dataframe containing the distance
     to the eNB for each node for each timeframe
 
-    :param df: DataFrame containing positional data in tuple form (e.g. as returned by read_position_data())
+    :param df: DataFrame containing positional data (see _positions_to_array())
     :param enb: the coordinates of the eNB to which the distances should be calculated
     :return: the DataFrame containing the distance of each node to the enb over time
     |   time |   pNode[0].pos |   pNode[10].pos |   pNode[11].pos |   pNode[12].pos |  ...
@@ -354,36 +436,20 @@ def _distance_between_nodes_enb(
             .               .               .                  .                .
             .               .               .                  .                .
     """
-    res = df.apply(_apply_distance_between_nodes_enb, raw=True, axis=1, enb=enb)
-    return res
-
-
-def _apply_distance_between_nodes_enb(
-    ndarray: np.ndarray, enb: Tuple[float, float]
-) -> List[float]:
-    """Calculates the average distance between nodes for a row of positional data (in tuple form).
-    Meant to be used as argument for Dataframe.apply()
-
-    :param ndarray: rows of a Dataframe created by read_position_data() with the as_tuples option enabled
-    :param enb: the coordinates of the eNB the distance shall be calculated to
-    :return: row containing the average distance for each node to the enb
-    """
-    res = []
-    node_count = len(ndarray)
-    for i in range(node_count):
-        node = ndarray[i]
-        if math.isnan(node[0]):
-            res.append(np.nan)
-            continue
-        res.append(math.dist(node, enb))
-    return res
+    pos, columns = _positions_to_array(df)
+    dist = np.hypot(pos[:, :, 0] - enb[0], pos[:, :, 1] - enb[1])
+    return pd.DataFrame(dist, index=df.index, columns=columns)
 
 
-def _distances_between_nodes(df: pd.DataFrame) -> pd.DataFrame:
+def _distances_between_nodes(
+    df: pd.DataFrame, radius: Union[float, None] = None
+) -> pd.DataFrame:
     """For a dataframe containing positional data of a simulations nodes. Returns d dataframe containing the average distance
     for each node to all other nodes for each time frame
 
-    :param df: DataFrame containing positional data in tuple form (e.g. as returned by read_position_data())
+    :param df: DataFrame containing positional data (see _positions_to_array())
+    :param radius: if set, only nodes within this distance are taken into account (KD-tree based). Nodes without
+                   any neighbor are NaN.
     :return: the DataFrame containing the average distance of each node to all other nodes over time
 
     |   time |   pNode[0].pos |   pNode[10].pos |   pNode[11].pos |   pNode[12].pos | .....
@@ -396,35 +462,25 @@ def _distances_between_nodes(df: pd.DataFrame) -> pd.DataFrame:
             .               .               .                  .                .
             .               .               .                  .                .
     """
-    res = df.apply(_apply_distances_between_nodes, raw=True, axis=1)
-    return res
+    pos, columns = _positions_to_array(df)
+    if radius is None:
+        dist = _mean_distances(pos)
+    else:
+        _, dist = _neighbor_distances(pos, radius)
+    return pd.DataFrame(dist, index=df.index, columns=columns)
 
 
-def _apply_distances_between_nodes(ndarray: np.ndarray) -> List[float]:
-    """Calculates the average distance between nodes for a row of positional data (in tuple form).
-    Meant to be used as argument for Dataframe.apply()
+def _neighbor_count(df: pd.DataFrame, radius: float) -> pd.DataFrame:
+    """For a dataframe containing positional data of a simulations nodes. Returns a dataframe containing the number
+    of other nodes within radius for each node for each time frame (same columns as df).
 
-    :param ndarray: rows of a Dataframe created by read_position_data() with the as_tuples option enabled
-    :return: row containing the average distance for each node to all other nodes.
+    :param df: DataFrame containing positional data (see _positions_to_array())
+    :param radius: maximum distance of a neighbor
+    :return: the DataFrame containing the neighbor count of each node over time
     """
-    res = []
-    node_count = len(ndarray)
-    active_node_count = len([t for t in ndarray if not math.isnan(t[0])])
-    if active_node_count == 1:
-        return [np.nan] * node_count
-    for i in range(node_count):
-        node = ndarray[i]
-        if math.isnan(node[0]):
-            res.append(np.nan)
-            continue
-        sum_dist = 0.0
-        for k in range(node_count):
-            other = ndarray[k]
-            if k == i or math.isnan(other[0]):
-                continue
-            sum_dist += math.dist(node, other)
-        res.append(sum_dist / (active_node_count - 1))
-    return res
+    pos, columns = _positions_to_array(df)
+    count, _ = _neighbor_distances(pos, radius)
+    return pd.DataFrame(count, index=df.index, columns=columns)
 
 
 def _aggregate_vectors(
@@ -461,39 +517,27 @@ def _aggregate_vectors(
     |      3 |                       0.0429197 |                       0.0402769 |                       0.0396673 | ...
     |      4 |                       0.042134  |                       0.0443483 |                       0.0432054 | ...
     """
-    df_res = None
+    if not isinstance(how, How):
+        raise ValueError(f"Value '{how}' not recognized for 'how' kwarg")
     num_vectors = int(len(df.columns) / 2)
-    for k in range(num_vectors):
-        df_vector: pd.DataFrame = df.iloc[:, [k * 2, k * 2 + 1]]
-        # group values in second long intervals
-        df_tmp_group_by = df_vector.groupby(
-            pd.cut(
-                df_vector.iloc[:, 0],
-                range(0, int(df_vector.iloc[:, 0].max()) + 1, interval),
-            )
-        )
-        # apply to groups
-        if how == How.sum:
-            df_vector = df_tmp_group_by.sum()
-        elif how == How.min:
-            df_vector = df_tmp_group_by.min()
-        elif how == How.max:
-            df_vector = df_tmp_group_by.max()
-        elif how == How.mean:
-            df_vector = df_tmp_group_by.mean()
-        elif how == How.first:
-            df_vector = df_tmp_group_by.first()
-        else:
-            raise ValueError(f"Value '{how}' not recognized for 'how' kwarg")
-
-        df_vector.drop(df_vector.columns[0], axis=1, inplace=True)
-        df_vector.index.name = "time"  # index
-        if df_res is None:
-            df_res = df_vector
-        else:
-            df_res = df_res.join(df_vector, how="outer")
-
-    df_res.reset_index(drop=True, inplace=True)
+    time = df.iloc[:, 0 : num_vectors * 2 : 2].to_numpy(dtype=float)
+    values = df.iloc[:, 1 : num_vectors * 2 : 2].to_numpy(dtype=float)
+    # number of (right closed) intervals of each vector. All vectors share the same
+    # bin edges, a shorter vector only uses the first bins.
+    n_bins = np.array(
+        [len(range(0, int(m) + 1, interval)) - 1 for m in np.nanmax(time, axis=0)]
+    )
+    n = int(n_bins.max())
+    bins = TimeBins.from_breaks(range(0, n * interval + 1, interval), closed="right")
+    codes = bins.codes(time)
+    codes[codes >= n_bins] = -1
+    # one group for each (vector, bin) pair, reduced in a single pass
+    codes = np.where(codes >= 0, codes + np.arange(num_vectors) * n, -1)
+    agg = aggregate_codes(values.ravel(), codes.ravel(), num_vectors * n, how.value)
+    agg = agg.reshape(num_vectors, n).T.astype(float)
+    agg[np.arange(n)[:, None] >= n_bins] = np.nan
+
+    df_res = pd.DataFrame(agg, columns=df.columns[1 : num_vectors * 2 : 2])
     df_res.index.name = "time"
     return df_res
 
@@ -507,14 +551,14 @@ def _active_vectors(df: pd.DataFrame) -> pd.Series:
     :return: the Series over time representing how many of these vectors were still recording data at the time
         or a later time in the simulation
     """
-    df_t = df.copy(deep=True)
-    for column in df_t.columns:
-        last = df_t[column].last_valid_index()
-        # first = df_t[column].first_valid_index()
-        df_t[column].loc[:last] = df_t[column].loc[:last].ffill()
-
-    active_nodes = df_t.apply(func=lambda x: sum(~np.isnan(x)), raw=True, axis=1)
-    return active_nodes
+    valid = df.notna().to_numpy()
+    n = valid.shape[0]
+    has_data = valid.any(axis=0)
+    # a vector is active between its first and last valid index
+    first = valid.argmax(axis=0)[has_data]
+    last = (n - 1 - valid[::-1].argmax(axis=0))[has_data]
+    delta = np.bincount(first, minlength=n + 1) - np.bincount(last + 1, minlength=n + 1)
+    return pd.Series(np.cumsum(delta[:n]), index=df.index)
 
 
 def _average_sim_data(
@@ -586,24 +630,58 @@ def _average_sim_data(
     return res
 
 
-def _aggregate_vectors_from_simulation(
+def _load_vectors(vec_path: str, scave_filter) -> pd.DataFrame:
+    """Export the vectors matching scave_filter with scavetool. Only the vector rows of each
+    exported chunk are kept (see ScaveTool.iter_df_from_scave).
+
+    :return: the time/value vectors as returned by normalize_vectors(axis=1)
+    """
+    df = pd.concat(
+        [
+            chunk.opp.filter().vector().apply()
+            for chunk in ScaveTool().iter_df_from_scave(vec_path, scave_filter)
+        ],
+        axis=0,
+        ignore_index=True,
+    )
+    return df.opp.filter().vector().normalize_vectors(axis=1)
+
+
+def _read_vectors_from_simulation(
     sim: Simulation,
     module: str,
     vector_names: Union[str, List[str]],
-    how: How = How.mean,
+    vector_cache: Union[str, None] = None,
 ) -> pd.DataFrame:
-    """This function will read vector data of the given simulation and aggregate it with the given method over
-        one second long intervals.
+    """This function will read the vector data of the given simulation (as returned by Opp.normalize_vectors(axis=1)).
+        If vector_cache is set the result is cached in this hdf file. The cache entry is keyed by the simulation path,
+        the module, the vector names and the size and modification time of the .vec files.
 
-
-    :param sim: The simulation whose data will be aggregated
+    :param sim: The simulation whose data will be read
     :param module: name of the module of the vectors to be read
     :param vector_names: names of the vectors to be read
-    :param how: Determines the way of aggregating the value for each time bin
-    :return: a DataFrame containing the aggregated data (as returned by the aggregate_vectors() function)
+    :param vector_cache: path of the cache file. A relative path (e.g. VECTOR_CACHE) is relative to the simulation
+                         folder. Default None (no cache).
+    :return: a DataFrame containing the time/value vectors
     """
     if isinstance(vector_names, str):
         vector_names = [vector_names]
+    cache = None
+    if vector_cache is not None:
+        cache = ResultCache(os.path.join(sim.path, vector_cache))
+        key = cache_key(
+            _read_vectors_from_simulation.__name__,
+            {
+                "sim_path": os.path.abspath(sim.path),
+                "module": module,
+                "vector_names": vector_names,
+                "vec_files": file_fingerprint(sim.path, ["*.vec"]),
+            },
+        )
+        df_sim = cache.get(key)
+        if df_sim is not None:
+            return df_sim
+
     sfilter = (
         ScaveTool().filter_builder().module(module).AND().gOpen().name(vector_names[0])
     )
@@ -613,13 +691,53 @@ def _aggregate_vectors_from_simulation(
     vec_paths = [
         os.path.join(sim.path, f) for f in os.listdir(sim.path) if f.endswith(".vec")
     ]
-    df_sim = ScaveTool().load_df_from_scave(vec_paths[0], sfilter)
-    df_sim = df_sim.opp.filter().vector().normalize_vectors(axis=1)
-    df_data = _aggregate_vectors(df_sim, how)
+    df_sim = _load_vectors(vec_paths[0], sfilter)
+    if cache is not None:
+        cache.put(key, _read_vectors_from_simulation.__name__, df_sim)
+    return df_sim
+
+
+def _aggregate_vectors_from_simulation(
+    sim: Simulation,
+    module: str,
+    vector_names: Union[str, List[str]],
+    how: How = How.mean,
+    interval: int = 1,
+    vector_cache: Union[str, None] = None,
+) -> pd.DataFrame:
+    """This function will read vector data of the given simulation and aggregate it with the given method over
+        intervals of the given length. Only the aggregation is computed again for cached vector data.
+
+
+    :param sim: The simulation whose data will be aggregated
+    :param module: name of the module of the vectors to be read
+    :param vector_names: names of the vectors to be read
+    :param how: Determines the way of aggregating the value for each time bin
+    :param interval: the interval in seconds over which metrics are aggregated
+    :param vector_cache: see _read_vectors_from_simulation()
+    :return: a DataFrame containing the aggregated data (as returned by the aggregate_vectors() function)
+    """
+    df_sim = _read_vectors_from_simulation(sim, module, vector_names, vector_cache)
+    df_data = _aggregate_vectors(df_sim, how, interval)
     df_data = df_data.reindex(sorted(df_data.columns), axis=1)
     return df_data
 
 
+def _mean_from_simulation(
+    sim: Simulation,
+    module: str,
+    vector: str,
+    how: How,
+    interval: int = 1,
+    vector_cache: Union[str, None] = None,
+) -> float:
+    """Mean of all aggregated values of a simulation. Used as task of compare_parameter_study()"""
+    df = _aggregate_vectors_from_simulation(
+        sim, module, vector, how, interval, vector_cache
+    )
+    return df.stack().dropna().mean()
+
+
 def _find_simulations(
     file_extension: str,
     path: str,
@@ -707,9 +825,14 @@ def compare_parameter_study(
     vector_description: str,
     unit: str,
     how: How,
+    interval: int = 1,
+    pool_size: int = 10,
+    vector_cache: Union[str, None] = None,
 ):
     """Sorts a List of simulations into groups by the given sim configuration parameter
      and plots the mean vector value of those groups over the parameter values.
+     The simulations are processed in parallel. The vector data of each simulation is cached if vector_cache
+     is set (see _read_vectors_from_simulation()).
 
     :param sims: List of simulations
     :param parameter_name: the variable parameter
@@ -719,17 +842,38 @@ def compare_parameter_study(
     :param vector_description: description of the vector
     :param unit: unit of the vector
     :param how: aggregation method of the vector
+    :param interval: the interval in seconds over which metrics are aggregated
+    :param pool_size: number of processes
+    :param vector_cache: see _read_vectors_from_simulation()
     :return:  fig, ax as returned by pyplot.subplots()
     """
     dict_sims = _sort_sims_by_parameter(sims, parameter_name)
+    tasks = [
+        (parameter_value, sim)
+        for parameter_value, _sims in dict_sims.items()
+        for sim in _sims
+    ]
+    means = run_kwargs_map(
+        _mean_from_simulation,
+        [
+            dict(
+                sim=sim,
+                module=module,
+                vector=vector,
+                how=how,
+                interval=interval,
+                vector_cache=vector_cache,
+            )
+            for _, sim in tasks
+        ],
+        pool_size=pool_size,
+        reuse_pool=True,
+    )
     data = {}
-    for parameter_value in dict_sims.keys():
-        mean = 0
-        for sim in dict_sims[parameter_value]:
-            df = _aggregate_vectors_from_simulation(sim, module, vector, how)
-            mean += df.stack().dropna().mean()
-        mean /= len(dict_sims[parameter_value])
-        data[parameter_value] = mean
+    for (parameter_value, _), mean in zip(tasks, means):
+        data[parameter_value] = data.get(parameter_value, 0) + mean
+    for parameter_value in data.keys():
+        data[parameter_value] /= len(dict_sims[parameter_value])
     fig, ax = plt.subplots()
     df = pd.DataFrame.from_dict(data, orient="index", columns=[vector_description])
     df.sort_index(inplace=True)
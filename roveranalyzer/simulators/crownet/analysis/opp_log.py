@@ -1,9 +1,13 @@
+import os
 import re
+import time
+from typing import Iterator
 
+import numpy as np
 import pandas as pd
 from matplotlib import pyplot as plt
 
-from roveranalyzer.utils.file import read_lines
+from roveranalyzer.utils.logging import logger
 
 
 def cumulative_messages(
@@ -32,46 +36,211 @@ def cumulative_messages(
         return fig, ax
 
 
-def parse_cmdEnv_outout(path):
-    lines = read_lines(path)
-
-    pattern1 = re.compile(
-        "^\*\* Event #(?P<event>\d+)\s+t=(?P<time>\S+)\s+Elapsed: (?P<elapsed>\S+?)s\s+\((?P<elapsed_s>.*?)\).*?completed\s+\((?P<completed>.*?)\% total\)"
-    )
-    pattern2 = re.compile(
-        "^.*?Speed:\s+ev/sec=(?P<events_per_sec>\S+)\s+simsec/sec=(?P<simsec_per_sec>\S+)\s+ev/simsec=(?P<elapsed>\S+)"
-    )
-    pattern3 = re.compile(
-        "^.*?Messages:\s+created:\s+(?P<msg_created>\d+)\s+present:\s+(?P<msg_present>\d+)\s+in\s+FES:\s+(?P<msg_in_fes>\d+)"
-    )
-
-    data = []
-    event_data = []
-    for l in lines:
-        if l.strip().startswith("** "):
-            if len(event_data) != 0:
-                data.append(event_data)
-            event_data = []
-            if m := pattern1.match(l):
-                event_data.extend(list(m.groups()))
-            else:
-                raise ValueError("ddd")
-        elif l.strip().startswith("Speed:"):
-            if m := pattern2.match(l):
-                event_data.extend(list(m.groups()))
-            else:
-                raise ValueError("ddd")
-        elif l.strip().startswith("Messages:"):
-            if m := pattern3.match(l):
-                event_data.extend(list(m.groups()))
-            else:
-                raise ValueError("ddd")
+# progress output of Cmdenv (express mode):
+# ** Event #1536   t=1.2   Elapsed: 2.05s (0m 02s)  11% completed  (11% total)
+#      Speed:     ev/sec=749.268   simsec/sec=0.585366   ev/simsec=1280
+#      Messages:  created: 1234   present: 56   in FES: 34
+_EVENT = b"** Event #"
+_SPEED = b"Speed:"
+_MESSAGES = b"Messages:"
+_event_pattern = re.compile(
+    rb"\*\* Event #(?P<event>\d+)\s+t=(?P<time>\S+)\s+Elapsed: (?P<elapsed>\S+?)s\s+\((?P<elapsed_s>.*?)\)"
+    rb"(?:.*?completed\s+\((?P<completed>[^%]*?)\% total\))?"
+)
+_speed_pattern = re.compile(
+    rb"Speed:\s+ev/sec=(?P<events_per_sec>\S+)\s+simsec/sec=(?P<simsec_per_sec>\S+)\s+ev/simsec=(?P<ev_per_simsec>\S+)"
+)
+_messages_pattern = re.compile(
+    rb"Messages:\s+created:\s+(?P<msg_created>\d+)\s+present:\s+(?P<msg_present>\d+)\s+in\s+FES:\s+(?P<msg_in_fes>\d+)"
+)
+# all three lines without other output in between
+_progress_pattern = re.compile(
+    _event_pattern.pattern
+    + rb"[^\n]*\n[ \t]*"
+    + _speed_pattern.pattern
+    + rb"[^\n]*\n[ \t]*"
+    + _messages_pattern.pattern
+)
+# missing values (Speed or Messages line not found) are NaN. The message counts are
+# float columns for this reason (exact for counts < 2**53).
+CMDENV_COLUMNS = {
+    "event": np.int64,
+    "time": np.float64,
+    "elapsed": np.float64,
+    "elapsed_s": object,
+    "completed": np.float64,
+    "events_per_sec": np.float64,
+    "simsec_per_sec": np.float64,
+    "ev_per_simsec": np.float64,
+    "msg_created": np.float64,
+    "msg_present": np.float64,
+    "msg_in_fes": np.float64,
+}
+
+
+def _find_line(buf: bytes, marker: bytes, start: int, end: int) -> int:
+    """Position of the first line in buf[start:end] starting with marker (leading
+    whitespace is ignored) or -1."""
+    pos = buf.find(marker, start, end)
+    while pos >= 0:
+        line_start = buf.rfind(b"\n", 0, pos) + 1
+        if buf[line_start:pos].strip() == b"":
+            return pos
+        pos = buf.find(marker, pos + 1, end)
+    return -1
+
+
+def _match_line(pattern, buf: bytes, marker: bytes, start: int, end: int):
+    """Match pattern on the first line in buf[start:end] starting with marker. start must
+    be the beginning of a line. The line at start is checked first (usual case)."""
+    line_end = buf.find(b"\n", start, end)
+    if line_end < 0:
+        return None
+    stripped = buf[start:line_end].lstrip()
+    if stripped.startswith(marker):
+        pos = line_end - len(stripped)
+    else:
+        pos = _find_line(buf, marker, line_end, end)
+        if pos < 0:
+            return None
+        line_end = buf.find(b"\n", pos, end)
+        if line_end < 0:
+            return None
+    return pattern.match(buf, pos, line_end)
+
+
+_NO_SPEED = (b"nan", b"nan", b"nan")
+_NO_MESSAGES = (b"nan", b"nan", b"nan")
+# return a record without Messages line if more output follows its event line
+_MAX_PENDING = 64 * 1024
+
+
+def _parse_progress(buf: bytes, records: list, final: bool) -> int:
+    """Append progress records (tuple of raw values) found in buf to records and return the
+    number of consumed bytes. Complete progress outputs (three consecutive lines) are matched
+    at once. Everything in between is searched line by line (see _parse_lines)."""
+    end = buf.rfind(b"\n") + 1 if not final else len(buf)
+    pos = 0
+    for m in _progress_pattern.finditer(buf, 0, end):
+        if buf.find(_EVENT, pos, m.start()) >= 0:
+            _parse_lines(buf, records, pos, m.start(), True)
+        records.append(m.groups(b"nan"))
+        pos = m.end()
+    return _parse_lines(buf, records, pos, end, final)
+
+
+def _parse_lines(buf: bytes, records: list, start: int, end: int, final: bool) -> int:
+    """Parse progress records in buf[start:end] and return the end of the consumed bytes.
+    Event lines are located with bytes.find, the Speed and Messages lines are searched
+    between an event line and the next one. Unrelated lines are skipped. The last record
+    is not consumed until its Messages line is complete (unless final)."""
+    pos = _find_line(buf, _EVENT, start, end)
+    if pos < 0:
+        # no event in buf. Keep the last (incomplete) line only.
+        return end
+    while pos >= 0:
+        next_pos = _find_line(buf, _EVENT, pos + 1, end)
+        span_end = end if next_pos < 0 else next_pos
+        line_end = buf.find(b"\n", pos, span_end)
+        line_end = span_end if line_end < 0 else line_end
+        speed = _match_line(_speed_pattern, buf, _SPEED, line_end + 1, span_end)
+        next_line = line_end + 1 if speed is None else speed.end() + 1
+        messages = _match_line(_messages_pattern, buf, _MESSAGES, next_line, span_end)
+        if next_pos < 0 and messages is None and not final:
+            if end - pos <= _MAX_PENDING:
+                # wait for the rest of the progress output
+                return pos
+        event = _event_pattern.match(buf, pos, line_end)
+        if event is None:
+            logger.debug(f"skip malformed progress line at {pos}")
         else:
-            break
-
-    col = list(pattern1.groupindex.keys())
-    col.extend(list(pattern2.groupindex.keys()))
-    col.extend(list(pattern3.groupindex.keys()))
-    df = pd.DataFrame(data, columns=col)
-    df = df.apply(pd.to_numeric, errors="ignore")
-    return df
+            records.append(
+                event.groups(b"nan")
+                + (_NO_SPEED if speed is None else speed.groups())
+                + (_NO_MESSAGES if messages is None else messages.groups())
+            )
+        if next_pos < 0:
+            return end if messages is None else buf.find(b"\n", messages.end()) + 1
+        pos = next_pos
+    return end
+
+
+def _progress_frame(records: list) -> pd.DataFrame:
+    """Convert raw records to typed columns"""
+    columns = list(zip(*records)) if len(records) > 0 else [()] * len(CMDENV_COLUMNS)
+    ret = {}
+    for (name, dtype), col in zip(CMDENV_COLUMNS.items(), columns):
+        if dtype is object:
+            ret[name] = np.array([v.decode() for v in col], dtype=object)
+        else:
+            # parse all values of the column at once (exact for integers < 2**53)
+            values = np.fromstring(b" ".join(col), dtype=np.float64, sep=" ")
+            ret[name] = values.astype(dtype)
+    return pd.DataFrame(ret)
+
+
+def iter_cmdEnv_output(
+    path,
+    chunksize=10_000,
+    follow=False,
+    poll_interval=1.0,
+    idle_timeout=None,
+    block_size=4 * 1024**2,
+) -> Iterator[pd.DataFrame]:
+    """
+    Parse the progress output of OMNeT++ Cmdenv (express mode) while reading the log file
+    in blocks. Lines not belonging to the progress output are skipped.
+    :param path:            log file (e.g. container_opp.out)
+    :param chunksize:       (default: 10_000) maximal number of records per data frame
+    :param follow:          (default: False) keep reading new output of a running simulation
+                            ('tail -f'). Records are yielded as soon as they are complete.
+    :param poll_interval:   (default: 1.0) seconds to wait for new output if follow is set
+    :param idle_timeout:    (default: None) stop following after this many seconds without new
+                            output. Follow until the iterator is closed if None.
+    :param block_size:      (default: 4 MiB) bytes read at once
+    :return:                Iterator of pd.DataFrame with columns CMDENV_COLUMNS. The
+                            ev/simsec value of the Speed line is the column 'ev_per_simsec'.
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError("File not found {}".format(path))
+
+    records = []
+    buf = b""
+    idle = 0.0
+    with open(path, "rb") as fd:
+        while True:
+            block = fd.read(block_size)
+            if block != b"":
+                idle = 0.0
+                buf += block
+                consumed = _parse_progress(buf, records, False)
+                buf = buf[consumed:]
+                while len(records) >= chunksize:
+                    yield _progress_frame(records[:chunksize])
+                    records = records[chunksize:]
+                continue
+
+            # end of file
+            if not follow or (idle_timeout is not None and idle >= idle_timeout):
+                break
+            if len(records) > 0:
+                yield _progress_frame(records)
+                records = []
+            time.sleep(poll_interval)
+            idle += poll_interval
+            if os.fstat(fd.fileno()).st_size < fd.tell():
+                # log file was truncated (new simulation run)
+                fd.seek(0)
+                buf = b""
+
+    _parse_progress(buf, records, True)
+    if len(records) > 0:
+        yield _progress_frame(records)
+
+
+def parse_cmdEnv_outout(path) -> pd.DataFrame:
+    """Progress output of OMNeT++ Cmdenv (see iter_cmdEnv_output)"""
+    frames = list(iter_cmdEnv_output(path))
+    if len(frames) == 0:
+        return _progress_frame([])
+    return pd.concat(frames, axis=0, ignore_index=True)
@@ -0,0 +1,230 @@
+import math
+import os
+import time
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+import roveranalyzer.simulators.crownet.analysis.compare as compare
+from roveranalyzer.simulators.crownet.analysis.compare import (
+    How,
+    _active_vectors,
+    _aggregate_vectors,
+    _aggregate_vectors_from_simulation,
+    _distance_between_nodes_enb,
+    _distances_between_nodes,
+    _neighbor_count,
+    _positions_to_array,
+)
+from roveranalyzer.simulators.opp.provider.hdf.tests.utils import (
+    create_tmp_fs,
+    make_dirs,
+)
+from roveranalyzer.simulators.opp.utils import Simulation
+
+
+def create_positions(nodes=12, times=20, seed=11) -> pd.DataFrame:
+    """Positional data in tuple form with nodes entering and leaving the simulation."""
+    rnd = np.random.default_rng(seed)
+    df = pd.DataFrame(index=pd.Index(np.arange(times), name="time"))
+    for n in range(nodes):
+        xy = rnd.uniform(0.0, 50.0, (times, 2))
+        xy[rnd.random(times) < 0.3] = np.nan
+        df[f"pNode[{n}].pos"] = list(zip(xy[:, 0], xy[:, 1]))
+    # a single active node
+    for n in range(nodes - 1):
+        df.iat[0, n] = (np.nan, np.nan)
+    df.iat[0, nodes - 1] = (1.0, 2.0)
+    return df
+
+
+def distances_loop(row, radius=math.inf):
+    """old implementation (double loop over all nodes)"""
+    res = []
+    active = [t for t in row if not math.isnan(t[0])]
+    for node in row:
+        if math.isnan(node[0]) or len(active) == 1:
+            res.append(np.nan)
+            continue
+        dist = [
+            math.dist(node, o) for o in row if o is not node and not math.isnan(o[0])
+        ]
+        dist = [d for d in dist if d <= radius]
+        res.append(sum(dist) / len(dist) if len(dist) > 0 else np.nan)
+    return res
+
+
+def create_vectors(vectors=5, rows=60, seed=2) -> pd.DataFrame:
+    """Time/value vectors of different length as returned by normalize_vectors(axis=1)"""
+    rnd = np.random.default_rng(seed)
+    df = pd.DataFrame(index=np.arange(rows))
+    for k in range(vectors):
+        length = rnd.integers(rows // 4, rows)
+        time = np.full(rows, np.nan)
+        value = np.full(rows, np.nan)
+        time[:length] = np.sort(rnd.uniform(0.0, 20.0 * length / rows, length))
+        value[:length] = rnd.normal(size=length)
+        df[f"pNode[{k}].vec.time"] = time
+        df[f"pNode[{k}].vec.value"] = value
+    return df
+
+
+def aggregate_loop(df: pd.DataFrame, how: How, interval=1) -> pd.DataFrame:
+    """old implementation (groupby(pd.cut) and outer join for each vector)"""
+    df_res = None
+    for k in range(int(len(df.columns) / 2)):
+        df_vector = df.iloc[:, [k * 2, k * 2 + 1]]
+        bins = pd.interval_range(
+            start=0, end=int(df_vector.iloc[:, 0].max()), freq=interval
+        )
+        df_vector = (
+            df_vector.groupby(pd.cut(df_vector.iloc[:, 0], bins))
+            .agg(how.value)
+            .iloc[:, [1]]
+        )
+        df_vector.index = bins.left
+        df_res = df_vector if df_res is None else df_res.join(df_vector, how="outer")
+    df_res.reset_index(drop=True, inplace=True)
+    df_res.index.name = "time"
+    return df_res
+
+
+def active_loop(df: pd.DataFrame) -> pd.Series:
+    """old implementation (ffill column by column)"""
+    df_t = df.copy(deep=True)
+    for column in df_t.columns:
+        last = df_t[column].last_valid_index()
+        df_t.loc[:last, column] = df_t.loc[:last, column].ffill()
+    return df_t.apply(func=lambda x: sum(~np.isnan(x)), raw=True, axis=1)
+
+
+class AggregateVectorsTest(unittest.TestCase):
+    def test_aggregate_vectors(self):
+        df = create_vectors()
+        for how in How:
+            for interval in [1, 3]:
+                pd.testing.assert_frame_equal(
+                    _aggregate_vectors(df, how, interval),
+                    aggregate_loop(df, how, interval),
+                    check_index_type=False,
+                    obj=f"{how} {interval}",
+                )
+        with self.assertRaises(ValueError):
+            _aggregate_vectors(df, "mean")
+
+    def test_active_vectors(self):
+        df = _aggregate_vectors(create_vectors(), How.mean)
+        df.iloc[0:3, 1] = np.nan
+        df.iloc[:, 2] = np.nan
+        pd.testing.assert_series_equal(
+            _active_vectors(df), active_loop(df), check_dtype=False
+        )
+
+
+class VectorCacheTest(unittest.TestCase):
+    fs = create_tmp_fs("VectorCacheTest")
+    test_out_dir: str = os.path.join(fs.root_path, "unittest")
+
+    @classmethod
+    def setUpClass(cls):
+        make_dirs(cls.test_out_dir)
+        cls.vec_file = os.path.join(cls.test_out_dir, "vars_rep_0.vec")
+        with open(cls.vec_file, "w") as fd:
+            fd.write("v0")
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.fs.close()
+
+    def test_cached_vectors(self):
+        sim = Simulation(0, self.test_out_dir, "cfg")
+        df = create_vectors()
+        with mock.patch.object(compare, "_load_vectors", return_value=df) as load:
+            cache = compare.VECTOR_CACHE
+            ret_mean = _aggregate_vectors_from_simulation(
+                sim, "m", "vec", How.mean, vector_cache=cache
+            )
+            ret_max = _aggregate_vectors_from_simulation(
+                sim, "m", "vec", How.max, 3, vector_cache=cache
+            )
+            self.assertEqual(load.call_count, 1)
+            pd.testing.assert_frame_equal(ret_mean, _aggregate_vectors(df, How.mean))
+            pd.testing.assert_frame_equal(ret_max, _aggregate_vectors(df, How.max, 3))
+            # changed result file
+            time.sleep(0.01)
+            with open(self.vec_file, "w") as fd:
+                fd.write("v1 changed")
+            _aggregate_vectors_from_simulation(
+                sim, "m", "vec", How.mean, vector_cache=cache
+            )
+            self.assertEqual(load.call_count, 2)
+            # no cache by default
+            _aggregate_vectors_from_simulation(sim, "m", "vec", How.mean)
+            self.assertEqual(load.call_count, 3)
+
+    def test_no_sidecar_by_default(self):
+        sim = Simulation(0, self.test_out_dir, "cfg")
+        sidecar = os.path.join(self.test_out_dir, compare.VECTOR_CACHE)
+        if os.path.exists(sidecar):
+            os.remove(sidecar)
+        with mock.patch.object(compare, "_load_vectors", return_value=create_vectors()):
+            _aggregate_vectors_from_simulation(sim, "m", "vec", How.mean)
+        self.assertFalse(os.path.exists(sidecar))
+
+
+class DistanceTest(unittest.TestCase):
+    def test_distances_between_nodes(self):
+        df = create_positions()
+        expected = df.apply(distances_loop, raw=True, axis=1, result_type="expand")
+        ret = _distances_between_nodes(df)
+        self.assertListEqual(list(ret.columns), list(df.columns))
+        np.testing.assert_allclose(ret.to_numpy(), expected.to_numpy())
+
+    def test_radius(self):
+        df = create_positions()
+        expected = df.apply(
+            distances_loop, raw=True, axis=1, result_type="expand", radius=20.0
+        )
+        ret = _distances_between_nodes(df, radius=20.0)
+        np.testing.assert_allclose(ret.to_numpy(), expected.to_numpy())
+        count = _neighbor_count(df, radius=20.0)
+        self.assertTrue(np.isnan(count.iloc[1].to_numpy()).any())
+        np.testing.assert_array_equal(count.iloc[0].to_numpy()[-1], 0)
+
+    def test_positions_to_array(self):
+        df = create_positions()
+        # node without position at the first time step (e.g. after reindex)
+        df.iat[0, 0] = np.nan
+        pos, columns = _positions_to_array(df)
+        self.assertEqual(pos.shape, (df.shape[0], df.shape[1], 2))
+        self.assertListEqual(list(columns), list(df.columns))
+        self.assertTrue(np.isnan(pos[0, 0]).all())
+        np.testing.assert_array_equal(pos[0, -1], [1.0, 2.0])
+        np.testing.assert_array_equal(pos[5, 3], df.iat[5, 3])
+        # posX/posY columns as returned by _read_position_data()
+        df_xy = pd.DataFrame(index=df.index)
+        for c in df.columns:
+            node = c.split(".")[0]
+            xy = np.array(
+                [p if isinstance(p, tuple) else (np.nan, np.nan) for p in df[c]]
+            )
+            df_xy[f"{node}.posX.value"] = xy[:, 0]
+            df_xy[f"{node}.posY.value"] = xy[:, 1]
+        pos_xy, columns_xy = _positions_to_array(df_xy)
+        np.testing.assert_array_equal(pos_xy, pos)
+        self.assertListEqual(list(columns_xy), list(df.columns))
+        pd.testing.assert_frame_equal(
+            _distances_between_nodes(df_xy), _distances_between_nodes(df)
+        )
+
+    def test_distance_enb(self):
+        df = create_positions()
+        ret = _distance_between_nodes_enb(df, (10.0, 20.0))
+        expected = df.applymap(lambda p: math.dist(p, (10.0, 20.0)))
+        np.testing.assert_allclose(ret.to_numpy(), expected.to_numpy())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+import os
+import unittest
+
+import numpy as np
+from fs.tempfs import TempFS
+
+from roveranalyzer.simulators.crownet.analysis.opp_log import (
+    CMDENV_COLUMNS,
+    iter_cmdEnv_output,
+    parse_cmdEnv_outout,
+)
+from roveranalyzer.simulators.opp.provider.hdf.tests.utils import (
+    create_tmp_fs,
+    make_dirs,
+)
+
+
+def progress(k: int, noise: str = "") -> str:
+    """Cmdenv progress output of record k. noise is written between the lines."""
+    return (
+        f"** Event #{k * 1000}   t={k * 0.5}   Elapsed: {k * 2.5}s (0m {k:02d}s)  "
+        f"{k}% completed  ({k}% total)\n{noise}"
+        f"     Speed:     ev/sec={k * 10.5}   simsec/sec={k * 0.25}   ev/simsec={k * 4}\n"
+        f"{noise}     Messages:  created: {k * 7}   present: {k * 3}   in FES: {k}\n"
+    )
+
+
+NOISE = "INFO World.pNode[0].app: Speed: 3 Messages: none\n"
+
+
+class CmdEnvLogTest(unittest.TestCase):
+    fs: TempFS = create_tmp_fs("CmdEnvLogTest")
+    test_out_dir: str = os.path.join(fs.root_path, "unittest")
+
+    @classmethod
+    def setUpClass(cls):
+        make_dirs(cls.test_out_dir)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.fs.close()
+
+    def check_records(self, df, ks):
+        ks = np.array(ks)
+        self.assertListEqual(list(df.columns), list(CMDENV_COLUMNS.keys()))
+        np.testing.assert_array_equal(df["event"], ks * 1000)
+        np.testing.assert_array_equal(df["time"], ks * 0.5)
+        np.testing.assert_array_equal(df["events_per_sec"], ks * 10.5)
+        np.testing.assert_array_equal(df["msg_present"], ks * 3)
+        np.testing.assert_array_equal(df["msg_in_fes"], ks)
+        self.assertListEqual(list(df["elapsed_s"]), [f"0m {k:02d}s" for k in ks])
+
+    def test_parse(self):
+        path = os.path.join(self.test_out_dir, "container_opp.out")
+        with open(path, "w") as fd:
+            fd.write("OMNeT++ Discrete Event Simulation\nSetting up Cmdenv...\n")
+            for k in range(1, 40):
+                fd.write(NOISE * (k % 3))
+                fd.write(progress(k, noise=NOISE if k % 5 == 0 else ""))
+            fd.write("** Event #malformed\n")
+            fd.write("<!> Simulation time limit reached -- at t=20s\n")
+        df = parse_cmdEnv_outout(path)
+        self.check_records(df, range(1, 40))
+        self.assertEqual(df["event"].dtype, np.int64)
+        self.assertEqual(df["completed"].dtype, np.float64)
+        # block boundaries within records
+        frames = list(iter_cmdEnv_output(path, chunksize=7, block_size=50))
+        self.assertListEqual([f.shape[0] for f in frames], [7, 7, 7, 7, 7, 4])
+        self.check_records(frames[-1], range(36, 40))
+
+    def test_missing_lines(self):
+        path = os.path.join(self.test_out_dir, "missing.out")
+        with open(path, "w") as fd:
+            fd.write(progress(1).splitlines(keepends=True)[0])
+            fd.write(progress(2))
+            fd.write("".join(progress(3).splitlines(keepends=True)[:2]))
+        df = parse_cmdEnv_outout(path)
+        self.assertListEqual(list(df["event"]), [1000, 2000, 3000])
+        self.assertTrue(np.isnan(df["events_per_sec"].iloc[0]))
+        np.testing.assert_array_equal(df["msg_in_fes"], [np.nan, 2, np.nan])
+        self.assertEqual(df["events_per_sec"].iloc[2], 31.5)
+
+    def test_follow(self):
+        path = os.path.join(self.test_out_dir, "running.out")
+        with open(path, "w") as fd:
+            fd.write(progress(1) + progress(2))
+            fd.write(progress(3)[:-20])  # incomplete record
+            fd.flush()
+            frames = iter_cmdEnv_output(
+                path, follow=True, poll_interval=0.01, idle_timeout=0.2
+            )
+            self.check_records(next(frames), [1, 2])
+            fd.write(progress(3)[-20:] + NOISE + progress(4))
+            fd.flush()
+            self.check_records(next(frames), [3, 4])
+            fd.write(progress(5).splitlines(keepends=True)[0])
+            fd.flush()
+            # no further output: the pending record is returned after idle_timeout
+            df = next(frames)
+            self.assertListEqual(list(df["event"]), [5000])
+            self.assertTrue(np.isnan(df["msg_created"].iloc[0]))
+            with self.assertRaises(StopIteration):
+                next(frames)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,5 @@
 from itertools import repeat
-from typing import Tuple, Union
+from typing import Iterator, Tuple, Union
 
 import geopandas as gpd
 import numpy as np
@@ -109,6 +109,8 @@ def owner_dist_feature(_df_ret, meta: DcdMetaData, **kwargs):
         # Warning: may lead to error if not all owner locations are part of the data frame
         return owner_dist_feature_old(_df_ret, **kwargs)
 
+    # new columns are only added to the (shallow) copy, input frame is not changed
+    _df_ret = _df_ret.copy(deep=False)
     if "global_metadata" in kwargs and kwargs["global_metadata"].is_entropy_data():
         # entropy based map. Owner distance invalid!
         _df_ret["x_owner"] = -1.0
@@ -120,26 +122,42 @@ def owner_dist_feature(_df_ret, meta: DcdMetaData, **kwargs):
     glb_pos = kwargs["global_position"]
     # node_id = _df_ret.index.get_level_values("ID").unique()[0]
     node_id = int(meta.node_id)
-    node_positions = glb_pos.loc[Idx[:, node_id], :]  # .reset_index()
-    node_positions = node_positions.rename(columns={"x": "x_owner", "y": "y_owner"})
-    node_positions.index.set_names("ID", level=1, inplace=True)
-
-    index_names = _df_ret.index.names
-    # merge extracted node_positions with _df_ret
-    _df_ret = pd.merge(
-        _df_ret.reset_index(),
-        node_positions,
-        on=["ID", "simtime"],
-        how="left",
-    ).reset_index(drop=True)
+    if isinstance(glb_pos, pd.DataFrame):
+        node_positions = glb_pos.loc[Idx[:, node_id], :]
+    else:
+        # position provider (bounded memory build): only select this node
+        node_positions = glb_pos[Idx[:, node_id]]
+    pos_times = node_positions.index.get_level_values("simtime")
+
+    # lookup owner position for each row by simtime. Rows of other IDs do not
+    # match (same as left merge on [ID, simtime])
+    _idx = pd.Index(pos_times).get_indexer(_df_ret.index.get_level_values("simtime"))
+    _idx[_df_ret.index.get_level_values("ID") != node_id] = -1
+    _add_owner_dist(
+        _df_ret,
+        _idx,
+        node_positions["x"].to_numpy(dtype=float),
+        node_positions["y"].to_numpy(dtype=float),
+    )
+    return _df_ret
+
 
+def _add_owner_dist(_df_ret, _idx, x_owner, y_owner):
+    """
+    Add x_owner, y_owner and owner_dist columns to _df_ret (in place). _idx contains
+    for each row the position in x_owner/y_owner or -1 if the owner location is
+    unknown (NaN).
+    """
+    missing = _idx < 0
+    _x = np.append(x_owner, np.nan)[np.where(missing, len(x_owner), _idx)]
+    _y = np.append(y_owner, np.nan)[np.where(missing, len(y_owner), _idx)]
+    _df_ret["x_owner"] = _x
+    _df_ret["y_owner"] = _y
     # compute distance between cells (row) and the owner's location at the given time
     _df_ret["owner_dist"] = np.sqrt(
-        (_df_ret["x"] - _df_ret["x_owner"]) ** 2
-        + (_df_ret["y"] - _df_ret["y_owner"]) ** 2
+        (_df_ret.index.get_level_values("x").to_numpy() - _x) ** 2
+        + (_df_ret.index.get_level_values("y").to_numpy() - _y) ** 2
     )
-    _df_ret = _df_ret.set_index(index_names, drop=True, verify_integrity=True)
-
     return _df_ret
 
 
@@ -148,42 +166,43 @@ def owner_dist_feature_old(_df_ret, **kwargs):
     Assume each node logs its own position in the DCD map thus the location
     of each node can be extracted for each time stamp solely from the data frame
     """
-    index_names = _df_ret.index.names
-
     # Distance to owner location.
     # get owner positions for each time step {ID/simtime}[x_owner,y_owner]
-    # fixme knowledge about "source" in index does not belong here
-    if "source" in index_names:
-        owner_locations = (
-            _df_ret.loc[_df_ret["own_cell"] == 1, []]
-            .index.to_frame(index=False)
-            .drop(columns=["source"])
-            .drop_duplicates()
-            .set_index(["ID", "simtime"], drop=True, verify_integrity=True)
-            .rename(columns={"x": "x_owner", "y": "y_owner"})
-        )
-    else:
-        owner_locations = (
-            _df_ret.loc[_df_ret["own_cell"] == 1, []]
-            .index.to_frame(index=False)
-            .drop_duplicates()
-            .set_index(["ID", "simtime"], drop=True, verify_integrity=True)
-            .rename(columns={"x": "x_owner", "y": "y_owner"})
+    own = _df_ret.index[_df_ret["own_cell"].to_numpy() == 1]
+    owner_locations = pd.DataFrame(
+        {
+            "x": own.get_level_values("x"),
+            "y": own.get_level_values("y"),
+        },
+        index=pd.MultiIndex.from_arrays(
+            [own.get_level_values("ID"), own.get_level_values("simtime")],
+            names=["ID", "simtime"],
+        ),
+    )
+    owner_locations = owner_locations[
+        ~(owner_locations.reset_index().duplicated().to_numpy())
+    ]
+    if not owner_locations.index.is_unique:
+        raise ValueError(
+            f"Index has duplicate keys: {owner_locations.index[owner_locations.index.duplicated()].unique()}"
         )
 
-    # merge owner position
-    _df_ret = pd.merge(
-        _df_ret.reset_index(),
-        owner_locations,
-        on=["ID", "simtime"],
-    ).reset_index(drop=True)
-
-    _df_ret["owner_dist"] = np.sqrt(
-        (_df_ret["x"] - _df_ret["x_owner"]) ** 2
-        + (_df_ret["y"] - _df_ret["y_owner"]) ** 2
+    # rows without owner location are removed (same as inner merge)
+    _idx = owner_locations.index.get_indexer(
+        pd.MultiIndex.from_arrays(
+            [
+                _df_ret.index.get_level_values("ID"),
+                _df_ret.index.get_level_values("simtime"),
+            ]
+        )
+    )
+    _df_ret = _df_ret[_idx >= 0].copy()
+    _add_owner_dist(
+        _df_ret,
+        _idx[_idx >= 0],
+        owner_locations["x"].to_numpy(dtype=float),
+        owner_locations["y"].to_numpy(dtype=float),
     )
-    _df_ret = _df_ret.set_index(index_names, drop=True, verify_integrity=True)
-
     return _df_ret
 
 
@@ -230,6 +249,51 @@ def read_csv(
     return df_raw, _m
 
 
+def read_csv_chunked(
+    csv_path,
+    _index_types: dict,
+    _col_types: dict,
+    chunk_size: int,
+    real_coords=True,
+) -> Iterator[Tuple[pd.DataFrame, DcdMetaData]]:
+    """
+    read csv in chunks of complete time steps and set index. The csv must be
+    ordered by the first index column (simtime). Rows of the last time step in a
+    chunk are held back and prepended to the next chunk, thus one time step is
+    never split between two chunks.
+    """
+    _df = LazyDataFrame.from_path(csv_path)
+    _df.dtype = {**_index_types, **_col_types}
+    select_columns = list(_df.dtype.keys())
+    index_names = list(_index_types.keys())
+    time_name = index_names[0]
+    _m = DcdMetaData.from_dict(_df.read_meta_data())
+
+    def _prepare(df_raw: pd.DataFrame) -> pd.DataFrame:
+        df_raw = df_raw.set_index(index_names).sort_index()
+        if real_coords:
+            df_raw = _apply_real_coords(df_raw, _m)
+        return df_raw
+
+    carry = None
+    for chunk in _df.chunks(chunk_size, column_selection=select_columns):
+        if carry is not None:
+            chunk = pd.concat([carry, chunk], axis=0, ignore_index=True)
+        times = chunk[time_name].to_numpy()
+        if np.any(np.diff(times) < 0):
+            raise ValueError(
+                f"expected csv ordered by '{time_name}' for chunked reading: {csv_path}"
+            )
+        # hold back last (possible incomplete) time step
+        split = np.searchsorted(times, times[-1], side="left")
+        carry = chunk.iloc[split:]
+        if split > 0:
+            yield _prepare(chunk.iloc[:split]), _m
+
+    if carry is not None and not carry.empty:
+        yield _prepare(carry), _m
+
+
 def _density_get_raw(csv_path, index, col_types):
     """
     read csv and set index
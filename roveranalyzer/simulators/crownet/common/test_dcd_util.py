@@ -0,0 +1,103 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+import roveranalyzer.simulators.crownet.common.dcd_util as DcdUtil
+from roveranalyzer.simulators.crownet.common.dcd_metadata import DcdMetaData
+
+
+def create_map(node_id=3, times=(1.0, 2.0, 3.0), cells=4):
+    idx = pd.MultiIndex.from_product(
+        [list(times), np.arange(cells, dtype=float), [5.0], [7, 8], [node_id]],
+        names=["simtime", "x", "y", "source", "ID"],
+    )
+    df = pd.DataFrame(index=idx)
+    df["count"] = 1.0
+    # own cell: x==simtime (one per time step, independent of source)
+    df["own_cell"] = (
+        df.index.get_level_values("x") == df.index.get_level_values("simtime")
+    ).astype(int)
+    return df
+
+
+def merge_owner_dist(df, node_positions):
+    """reference implementation based on merge"""
+    node_positions = node_positions.rename(columns={"x": "x_owner", "y": "y_owner"})
+    node_positions.index.set_names("ID", level=1, inplace=True)
+    index_names = df.index.names
+    df = pd.merge(
+        df.reset_index(), node_positions, on=["ID", "simtime"], how="left"
+    ).reset_index(drop=True)
+    df["owner_dist"] = np.sqrt(
+        (df["x"] - df["x_owner"]) ** 2 + (df["y"] - df["y_owner"]) ** 2
+    )
+    return df.set_index(index_names, drop=True, verify_integrity=True)
+
+
+def merge_owner_dist_old(df):
+    """reference implementation based on inner merge with the own cells"""
+    index_names = df.index.names
+    owner_locations = (
+        df.loc[df["own_cell"] == 1, []]
+        .index.to_frame(index=False)
+        .drop(columns=["source"])
+        .drop_duplicates()
+        .set_index(["ID", "simtime"], drop=True, verify_integrity=True)
+        .rename(columns={"x": "x_owner", "y": "y_owner"})
+    )
+    df = pd.merge(df.reset_index(), owner_locations, on=["ID", "simtime"]).reset_index(
+        drop=True
+    )
+    df["owner_dist"] = np.sqrt(
+        (df["x"] - df["x_owner"]) ** 2 + (df["y"] - df["y_owner"]) ** 2
+    )
+    return df.set_index(index_names, drop=True, verify_integrity=True)
+
+
+class OwnerDistFeatureTest(unittest.TestCase):
+    def test_owner_dist_feature(self):
+        df = create_map()
+        # node 3 has no position at time 3.0
+        glb_pos = pd.DataFrame(
+            {"x": [1.0, 2.0, 1.5, 9.0], "y": [0.0, 1.0, 2.0, 9.0]},
+            index=pd.MultiIndex.from_tuples(
+                [(1.0, 3), (1.0, 4), (2.0, 3), (3.0, 4)], names=["simtime", "node_id"]
+            ),
+        )
+        meta = DcdMetaData(1.0, [10, 10], [10.0, 10.0], 3)
+        expected = merge_owner_dist(df.copy(), glb_pos.loc[pd.IndexSlice[:, 3], :])
+        columns = list(df.columns)
+        ret = DcdUtil.owner_dist_feature(df, meta, global_position=glb_pos)
+        pd.testing.assert_frame_equal(ret, expected)
+        # input frame is not changed
+        self.assertListEqual(list(df.columns), columns)
+        self.assertTrue(
+            ret.loc[pd.IndexSlice[3.0, :, :, :, :], "owner_dist"].isna().all()
+        )
+
+    def test_owner_dist_feature_old(self):
+        df = create_map()
+        # no own cell at time 3.0 -> rows are removed
+        df.loc[pd.IndexSlice[3.0, :, :, :, :], "own_cell"] = 0
+        ret = DcdUtil.owner_dist_feature_old(df)
+        pd.testing.assert_frame_equal(ret, merge_owner_dist_old(df))
+        self.assertListEqual(list(df.columns), ["count", "own_cell"])
+        self.assertEqual(ret.shape[0], df.shape[0] - 8)
+        self.assertListEqual(
+            ret.index.get_level_values("simtime").unique().tolist(), [1.0, 2.0]
+        )
+        np.testing.assert_array_equal(
+            ret["x_owner"].to_numpy(), ret.index.get_level_values("simtime").to_numpy()
+        )
+        np.testing.assert_array_equal(ret["y_owner"].to_numpy(), 5.0)
+        np.testing.assert_array_equal(
+            ret["owner_dist"].to_numpy(),
+            np.abs(
+                ret.index.get_level_values("x") - ret.index.get_level_values("simtime")
+            ),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
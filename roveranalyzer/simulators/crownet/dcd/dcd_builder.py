@@ -5,8 +5,14 @@ import json
 import multiprocessing
 import os
 import pickle
+import sys
+import timeit
+import traceback
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
 from functools import partial
-from typing import Union
+from typing import Iterator, List, Union
 
 import numpy as np
 import pandas as pd
@@ -22,6 +28,7 @@ from roveranalyzer.simulators.crownet.dcd.dcd_map import (
 from roveranalyzer.simulators.opp.provider.hdf.DcDGlobalPosition import (
     DcdGlobalDensity,
     DcdGlobalPosition,
+    GlobalExtent,
     pos_density_from_csv,
 )
 from roveranalyzer.simulators.opp.provider.hdf.DcdMapCountProvider import DcdMapCount
@@ -34,6 +41,8 @@ from roveranalyzer.utils.dataframe import (
     FrameConsumer,
     MissingValueImputationStrategy,
 )
+from roveranalyzer.utils.misc import StageTelemetry
+from roveranalyzer.utils.parallel import available_memory
 
 
 def _hdf_job(args):
@@ -47,8 +56,51 @@ def _hdf_job(args):
         # append filters before processing
         _builder.map_p.csv_filters.extend(_builder.single_df_filters)
         _builder.create_hdf_fast()
+        return _builder.telemetry.as_dict()
     else:
         print(f"{_builder.hdf_path} already exist and override_existing is false")
+        return _builder.get_build_telemetry()
+
+
+def _hdf_job_timed(args):
+    """Execute _hdf_job and report duration and error instead of raising."""
+    ts = timeit.default_timer()
+    telemetry = {}
+    try:
+        telemetry = _hdf_job(args)
+        err = None
+    except Exception as e:
+        err = f"{e}\n{traceback.format_exc()}"
+    return {
+        "job": list(args[0:-2]),
+        "ok": err is None,
+        "duration": timeit.default_timer() - ts,
+        "error": err,
+        "telemetry": telemetry,
+    }
+
+
+def _job_executor(n_jobs: int, maxtasksperchild: int | None) -> ProcessPoolExecutor:
+    kwargs = {}
+    if maxtasksperchild is not None:
+        if sys.version_info >= (3, 11):
+            # not compatible with the fork start method, workers are spawned
+            kwargs["max_tasks_per_child"] = maxtasksperchild
+        else:
+            logging.logger.warning(
+                "maxtasksperchild requires python >= 3.11, workers are reused"
+            )
+    return ProcessPoolExecutor(max_workers=n_jobs, **kwargs)
+
+
+def estimate_job_size(job) -> int:
+    """Size in bytes of all csv input files of a job [hdf_name, source_path, map_glob, global_name]"""
+    source_path = job[1]
+    map_glob = job[2] if len(job) > 2 else "dcdMap_*.csv"
+    global_name = job[3] if len(job) > 3 else "global.csv"
+    paths = glob.glob(os.path.join(source_path, map_glob))
+    paths.append(os.path.join(source_path, global_name))
+    return sum([os.path.getsize(p) for p in paths if os.path.exists(p)])
 
 
 class DcdProviders:
@@ -113,11 +165,24 @@ class DcdHdfBuilder(FrameConsumer):
         n_jobs: Union[int, float] = 0.6,
         override_existing=False,
         _filter=None,
-    ):
+        mem_budget: float | None = None,
+        mem_factor: float = 5.0,
+        maxtasksperchild: int | None = 1,
+    ) -> List[dict]:
         """
         job_list:  [[hdf_name, source_path, map_glob, global_name], ..., []]
         n_jobs:    number of parallel jobs or percentage of number of cpus to use
         override_existing: if true delete hdf_name and recreate it.
+        mem_budget: memory in bytes all running jobs may use together. Defaults to available memory.
+        mem_factor: estimated memory usage of a job as multiple of its csv input size.
+        maxtasksperchild: number of jobs a worker process executes before it is replaced
+            (python >= 3.11, workers are spawned). None to reuse forked workers.
+
+        Jobs are executed largest input first. Returns one dict per job with
+        keys job, ok, duration, error, size and telemetry (stage-level build
+        telemetry, see StageTelemetry). If a worker process dies (e.g. killed by the
+        OOM killer) the jobs running at this time are reported as failed and the
+        remaining jobs are executed by a new process pool.
         """
         if isinstance(n_jobs, int):
             if n_jobs <= 0:
@@ -130,12 +195,82 @@ class DcdHdfBuilder(FrameConsumer):
             )
         else:
             n_jobs = 1
+        n_jobs = max(1, n_jobs)
 
-        pool = multiprocessing.Pool(processes=n_jobs)
         if _filter is None:
             _filter = []
+        # longest (largest input) first to avoid idle workers at the end
+        sizes = [estimate_job_size(j) for j in job_list]
         job_list = [[*i, _filter, override_existing] for i in job_list]
-        pool.map(_hdf_job, job_list)
+        order = sorted(range(len(job_list)), key=lambda i: sizes[i], reverse=True)
+        mem_need = {i: sizes[i] * mem_factor for i in order}
+        if mem_budget is None:
+            mem_budget = available_memory()
+        if mem_budget is None:
+            mem_budget = float("inf")
+
+        results = []
+        pending = list(order)
+        running = {}  # Future -> job index
+        executor = None
+        try:
+            while len(pending) > 0 or len(running) > 0:
+                if executor is None:
+                    executor = _job_executor(n_jobs, maxtasksperchild)
+                mem_used = sum([mem_need[i] for i in running.values()])
+                while len(pending) > 0 and len(running) < n_jobs:
+                    # largest pending job fitting into the remaining budget. If
+                    # nothing is running, start the largest job regardless.
+                    fit = [i for i in pending if mem_used + mem_need[i] <= mem_budget]
+                    if len(fit) == 0 and len(running) > 0:
+                        break
+                    i = fit[0] if len(fit) > 0 else pending[0]
+                    if mem_need[i] > mem_budget:
+                        logging.logger.warning(
+                            f"job {job_list[i][0:-2]} exceeds memory budget "
+                            f"({mem_need[i]:.0f} > {mem_budget:.0f} bytes)"
+                        )
+                    pending.remove(i)
+                    running[executor.submit(_hdf_job_timed, job_list[i])] = i
+                    mem_used += mem_need[i]
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                broken = False
+                for future in done:
+                    i = running.pop(future)
+                    try:
+                        ret = future.result()
+                    except BrokenProcessPool as e:
+                        broken = True
+                        ret = {
+                            "job": list(job_list[i][0:-2]),
+                            "ok": False,
+                            "duration": float("nan"),
+                            "error": f"worker process terminated abruptly: {e}",
+                            "telemetry": {},
+                        }
+                    ret["size"] = sizes[i]
+                    results.append(ret)
+                    if ret["ok"]:
+                        logging.logger.info(
+                            f"job {ret['job']} done in {ret['duration']:2.4f} seconds"
+                        )
+                    else:
+                        logging.logger.error(
+                            f"job {ret['job']} failed after {ret['duration']:2.4f} seconds: {ret['error']}"
+                        )
+                if broken:
+                    # all futures of a broken pool fail, pending jobs get a new pool
+                    executor.shutdown(wait=True)
+                    executor = None
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=True)
+
+        failed = [r for r in results if not r["ok"]]
+        if len(failed) > 0:
+            logging.logger.error(f"{len(failed)} out of {len(job_list)} jobs failed")
+        return results
 
     def __init__(self, hdf_path, map_paths, global_path, epsg=""):
         super().__init__()
@@ -155,8 +290,12 @@ class DcdHdfBuilder(FrameConsumer):
         self._epsg = epsg
         self._imputation_function = ArbitraryValueImputation(0.0)
         self._map_type: MapType = MapType.DENSITY
+        # number of rows read at once from global.csv (None: read whole file).
+        # If set, the global density and position frames are never loaded as a whole.
+        self._global_chunk_size: int | None = None
 
         # set later on
+        self.telemetry = StageTelemetry(self.hdf_path)
         self.global_df = None
         self.position_df = None
         self._all_times = None
@@ -175,6 +314,10 @@ class DcdHdfBuilder(FrameConsumer):
         self._only_selected_cells = val
         return self
 
+    def global_chunk_size(self, val: int | None):
+        self._global_chunk_size = val
+        return self
+
     def set_imputation_strategy(self, s: MissingValueImputationStrategy):
         self._imputation_function = s
 
@@ -282,74 +425,80 @@ class DcdHdfBuilder(FrameConsumer):
 
     def create_hdf_fast(self):
         t = DcdUtil.Timer.create_and_start("create_hdf", label="")
+        self.telemetry = StageTelemetry(self.hdf_path)
         # 1) parse global.csv in position and global provider
-        self.position_p, self.global_p, meta = pos_density_from_csv(
-            self.global_path, self.hdf_path
-        )
-        # 2) access global_df and setup helpers for parsing map_*.csv to create
-        #    map and count provider together
-        self.global_df = self.global_p.get_dataframe()
-        self.position_df = self.position_p.get_dataframe()
-        self._all_times = (
-            self.global_df.index.get_level_values("simtime")
-            .unique()
-            .sort_values()
-            .to_numpy()
-        )
+        with self.telemetry.stage("global_parse") as rec:
+            self.position_p, self.global_p, meta = pos_density_from_csv(
+                self.global_path, self.hdf_path, chunk_size=self._global_chunk_size
+            )
+            extent = {
+                k: self.position_p.get_attribute(k) for k in GlobalExtent.ATTRIBUTES
+            }
+            # 2) access global_df and setup helpers for parsing map_*.csv to create
+            #    map and count provider together
+            if self._global_chunk_size is None:
+                self.global_df = self.global_p.get_dataframe()
+                self.position_df = self.position_p.get_dataframe()
+                self._all_times = (
+                    self.global_df.index.get_level_values("simtime")
+                    .unique()
+                    .sort_values()
+                    .to_numpy()
+                )
+                rec["rows_out"] = self.global_df.shape[0] + self.position_df.shape[0]
+            else:
+                # bounded memory: global frames stay in the HDF file and only
+                # the parts needed for one node are selected.
+                self.global_df = None
+                self.position_df = None
+                self._all_times = self._global_times()
+                rec["rows_out"] = self._nrows(self.global_p) + self._nrows(
+                    self.position_p
+                )
         # add self as frame_consumer to build count_map iteratively
         self.map_p.create_from_csv(
             self.map_paths,
             frame_consumer=[
                 partial(self.create_count_map, imputation_f=self._imputation_function)
             ],
-            global_position=self.position_df,
+            telemetry=self.telemetry,
+            global_position=self.position_p
+            if self.position_df is None
+            else self.position_df,
             global_metadata=meta,
         )
         # 3) append global count to count provider
         self.append_global_count()
         # 4) create index on count_map_provider
-        with self.count_p.ctx() as store:
-            store.create_table_index(
-                key=self.count_p.group,
-                columns=list(self.count_p.index_order().values()),
-                optlevel=9,
-                kind="full",
-            )
+        with self.telemetry.stage("index_creation"):
+            with self.count_p.ctx() as store:
+                store.create_table_index(
+                    key=self.count_p.group,
+                    columns=list(self.count_p.index_order().values()),
+                    optlevel=9,
+                    kind="full",
+                )
 
         # 5) set attributes
+        with self.telemetry.stage("attribute_writes"):
+            for p in [self.position_p, self.global_p, self.map_p, self.count_p]:
+                p.set_attribute("cell_size", meta.cell_size)
+                p.set_attribute("cell_count", meta.cell_count)
+                p.set_attribute("cell_bound", meta.bound)
+                p.set_attribute("offset", meta.offset)
+                p.set_attribute("epsg", self._epsg)
+                p.set_attribute("version", meta.version)
+                p.set_attribute("data_type", meta.data_type)
+                # _cell_bound is the whole simulation area. Map_extends only gives the area of the density map
+                for k, v in extent.items():
+                    p.set_attribute(k, v)
+            # materialized measures (see DcdMap2D) are only valid for this count map
+            self.count_p.set_attribute("build_id", uuid.uuid4().hex)
+
+        # 6) persist build telemetry (json) with each provider
+        telemetry = self.telemetry.to_json()
         for p in [self.position_p, self.global_p, self.map_p, self.count_p]:
-            p.set_attribute("cell_size", meta.cell_size)
-            p.set_attribute("cell_count", meta.cell_count)
-            p.set_attribute("cell_bound", meta.bound)
-            p.set_attribute("offset", meta.offset)
-            p.set_attribute("epsg", self._epsg)
-            p.set_attribute("version", meta.version)
-            p.set_attribute("data_type", meta.data_type)
-            p.set_attribute(
-                "time_interval", [np.min(self._all_times), np.max(self._all_times)]
-            )
-            # _cell_bound is the whole simulation area. Map_extends only gives the area of the density map
-            p.set_attribute(
-                "map_extend_x",
-                [
-                    self.global_df.index.get_level_values("x").min(),
-                    self.global_df.index.get_level_values("x").max(),
-                ],
-            )
-            p.set_attribute(
-                "map_extend_y",
-                [
-                    self.global_df.index.get_level_values("y").min(),
-                    self.global_df.index.get_level_values("y").max(),
-                ],
-            )
-            p.set_attribute(
-                "id_interval",
-                [
-                    self.position_df.index.get_level_values("node_id").min(),
-                    self.position_df.index.get_level_values("node_id").max(),
-                ],
-            )
+            p.set_attribute("build_telemetry", telemetry)
 
         t.stop()
         return {
@@ -359,10 +508,14 @@ class DcdHdfBuilder(FrameConsumer):
             "count": self.count_p,
         }
 
+    def get_build_telemetry(self) -> dict:
+        """Build telemetry stored in the HDF file (empty if not available)"""
+        return json.loads(self.count_p.get_attribute("build_telemetry", default="{}"))
+
     def create_hdf(self):
         t = DcdUtil.Timer.create_and_start("create_hdf", label="")
         print("build global")
-        self.position_p, self.global_p = pos_density_from_csv(
+        self.position_p, self.global_p, _ = pos_density_from_csv(
             self.global_path, self.hdf_path
         )
         print("build dcd map")
@@ -372,6 +525,8 @@ class DcdHdfBuilder(FrameConsumer):
             self.map_p.get_dataframe(), self.global_p.get_dataframe()
         )
         self.count_p.write_dataframe(count_df)
+        # materialized measures (see DcdMap2D) are only valid for this count map
+        self.count_p.set_attribute("build_id", uuid.uuid4().hex)
         t.stop()
         print("done")
         return {
@@ -399,6 +554,15 @@ class DcdHdfBuilder(FrameConsumer):
             # (mostly artifacts at end of simulation. Node created at end and
             # simulation finished before the item is logged)
             return
+        with self.telemetry.stage("count_map", rows_in=df.shape[0]) as rec:
+            _df = self._build_count_map(df, imputation_f)
+            rec["rows_out"] = _df.shape[0]
+        with self.telemetry.stage("hdf_append", rows_in=_df.shape[0]):
+            self.append_to_provider(self.count_p, _df)
+
+    def _build_count_map(
+        self, df: pd.DataFrame, imputation_f: MissingValueImputationStrategy
+    ) -> pd.DataFrame:
         # only use selected values
         _df = df[df["selection"] != 0].copy(deep=True)
         # extract id, times and positions from data frame
@@ -417,7 +581,7 @@ class DcdHdfBuilder(FrameConsumer):
         # merge with global, rename columns and fill glb_count nan with '0'
         # fill only global. The index where this happens are values where
         # the global map does not have any values -> thus count=0
-        _df = pd.concat([self.global_df, _df], axis=1)
+        _df = pd.concat([self._global_at(present_at_times), _df], axis=1)
         _df.columns = ["glb_count", "count", "x_owner", "y_owner"]
         # add marker column for which data imputation is used.
         missing_value_idx = _df[_df["count"].isna().values].index
@@ -453,18 +617,62 @@ class DcdHdfBuilder(FrameConsumer):
         _df = _df.set_index(["ID"], drop=True, append=True)
         # _df["count"] = _df["count"].astype(int)
         # _df["err"] = _df["err"].astype(int)
-        self.append_to_provider(self.count_p, _df)
+        return _df
+
+    @staticmethod
+    def _nrows(provider) -> int:
+        with provider.query as store:
+            return store.get_storer(provider.group).nrows
+
+    def _global_chunks(self) -> Iterator[pd.DataFrame]:
+        """Global density map in chunks of global_chunk_size rows (or as one frame)"""
+        if self.global_df is not None:
+            yield self.global_df
+            return
+        for start in range(0, self._nrows(self.global_p), self._global_chunk_size):
+            with self.global_p.query as store:
+                df = store.select(
+                    self.global_p.group,
+                    start=start,
+                    stop=start + self._global_chunk_size,
+                )
+            yield df
+
+    def _global_times(self) -> np.ndarray:
+        """Sorted unique simtime values of the global density map read in chunks"""
+        times = []
+        with self.global_p.query as store:
+            nrows = store.get_storer(self.global_p.group).nrows
+            for start in range(0, nrows, self._global_chunk_size):
+                col = store.select_column(
+                    self.global_p.group,
+                    "simtime",
+                    start=start,
+                    stop=start + self._global_chunk_size,
+                )
+                times.append(np.unique(col.to_numpy()))
+        if len(times) == 0:
+            return np.array([], dtype=float)
+        return np.unique(np.concatenate(times))
+
+    def _global_at(self, times: np.ndarray) -> pd.DataFrame:
+        """Global density map covering the given (sorted) times"""
+        if self.global_df is not None:
+            return self.global_df
+        return self.global_p[slice(times[0], times[-1])]
 
     def append_global_count(self):
-        _df = self.global_df.copy()
-        _df["ID"] = 0  # global id set to 0
-        _df["ID"].convert_dtypes(int)
-        _df["err"] = 0.0
-        _df["sqerr"] = 0.0
-        _df["owner_dist"] = 0.0
-        _df["missing_value"] = False
-        _df = _df.set_index(["ID"], drop=True, append=True)
-        self.append_to_provider(self.count_p, _df)
+        for _df in self._global_chunks():
+            _df = _df.copy()
+            _df["ID"] = 0  # global id set to 0
+            _df["ID"].convert_dtypes(int)
+            _df["err"] = 0.0
+            _df["sqerr"] = 0.0
+            _df["owner_dist"] = 0.0
+            _df["missing_value"] = False
+            _df = _df.set_index(["ID"], drop=True, append=True)
+            with self.telemetry.stage("hdf_append", rows_in=_df.shape[0]):
+                self.append_to_provider(self.count_p, _df)
 
     @staticmethod
     def append_to_provider(provider, df: pd.DataFrame):
@@ -1,6 +1,8 @@
 from __future__ import annotations
 
 import enum
+import hashlib
+import numbers
 import os
 from itertools import combinations
 from typing import Callable, List, Tuple, Union
@@ -25,7 +27,7 @@ from roveranalyzer.utils.dataframe import (
     FrameConsumerList,
     partial_index_match,
 )
-from roveranalyzer.utils.misc import intersect
+from roveranalyzer.utils.misc import file_lock, intersect
 from roveranalyzer.utils.plot import PlotUtil, Style, savefigure, with_axis
 
 
@@ -119,6 +121,7 @@ class DcdMap2D(DcdMap):
         map_p: DcdMapProvider = None,
         map_slice: pd.IndexSlice = None,
         plotter=None,
+        materialize_measures: bool = True,
         **kwargs,
     ):
         super().__init__(metadata, position_df, plotter, **kwargs)
@@ -130,6 +133,131 @@ class DcdMap2D(DcdMap):
 
         self._map_p: DcdMapProvider = map_p
         self._map_slice = map_slice
+        # store computed measures in the map HDF (only if the file is writable)
+        self.materialize_measures = materialize_measures
+
+    @classmethod
+    def _measure_key(cls, val) -> str:
+        """Stable key of a measure parameter. Arrays and pandas objects are
+        hashed by content (repr truncates large arrays)."""
+        if isinstance(val, (tuple, list)):
+            items = ",".join([cls._measure_key(v) for v in val])
+            return f"{type(val).__name__}({items})"
+        if isinstance(val, (pd.Index, pd.Series, pd.DataFrame)):
+            if isinstance(val, pd.Index):
+                h = pd.util.hash_pandas_object(val.to_frame(index=False), index=False)
+            else:
+                h = pd.util.hash_pandas_object(val, index=True)
+            return (
+                f"{type(val).__name__}({hashlib.sha1(h.values.tobytes()).hexdigest()})"
+            )
+        if isinstance(val, np.ndarray):
+            h = hashlib.sha1(np.ascontiguousarray(val).tobytes()).hexdigest()
+            return f"ndarray({val.dtype},{val.shape},{h})"
+        return repr(val)
+
+    def _measure_group(self, base_name: str, xy_slice=None) -> str:
+        """Group name of a materialized measure. Default parameters map to the
+        base name, any other xy_slice gets its own group."""
+        if xy_slice is None or (
+            isinstance(xy_slice, tuple) and xy_slice == (slice(None), slice(None))
+        ):
+            return base_name
+        key = hashlib.sha1(self._measure_key(xy_slice).encode()).hexdigest()[:16]
+        return f"{base_name}_{key}"
+
+    def _count_map_build_id(self) -> str | None:
+        """Id of the current count map (see DcdHdfBuilder). None for files
+        created without build id. Measures of these files are never materialized
+        because an outdated measure cannot be detected."""
+        build_id = self.count_p.get_attribute("build_id")
+        return None if build_id is None else str(build_id)
+
+    def _measure_lock(self, shared: bool):
+        """Inter-process lock for materialized measures. Writers do not wait for
+        the lock and skip materialization if another process holds it."""
+        return file_lock(f"{self._map_p.hdf_path}.lock", shared=shared, blocking=shared)
+
+    def _can_materialize(self) -> bool:
+        if self._map_p is None or not self.materialize_measures:
+            return False
+        # read-only result directories (e.g. shared or archived simulations)
+        path = os.path.abspath(self._map_p.hdf_path)
+        return os.access(path, os.W_OK) and os.access(os.path.dirname(path), os.W_OK)
+
+    @staticmethod
+    def _index_condition(names: List[str], index_slice) -> List[str] | None:
+        """where condition selecting index_slice on the index levels `names`. None
+        if index_slice cannot be expressed as condition."""
+        items = index_slice if isinstance(index_slice, tuple) else (index_slice,)
+        if len(items) > len(names):
+            return None
+        condition = []
+        for name, item in zip(names, items):
+            if isinstance(item, slice):
+                bounds = [item.start, item.stop]
+                if item.step is not None or not all(
+                    [b is None or isinstance(b, numbers.Real) for b in bounds]
+                ):
+                    return None
+                if item.start is not None:
+                    condition.append(f"{name}>={float(item.start)}")
+                if item.stop is not None:
+                    condition.append(f"{name}<={float(item.stop)}")
+            elif isinstance(item, numbers.Real) and not isinstance(item, bool):
+                condition.append(f"{name}=={float(item)}")
+            else:
+                return None
+        return condition
+
+    def _load_measure(
+        self,
+        group_name: str,
+        index_slice: slice | Tuple(slice) = slice(None),
+        columns: slice | List[str] = slice(None),
+    ) -> pd.DataFrame | None:
+        """Load materialized measure if it exists and was created from the
+        current count map. Returns None otherwise."""
+        if self._map_p is None or not self._map_p.contains_group(group_name):
+            return None
+        current_id = self._count_map_build_id()
+        build_id = self._map_p.get_attribute("count_map_build_id", group=group_name)
+        if current_id is None or build_id is None or str(build_id) != current_id:
+            logger.info(f"materialized measure '{group_name}' outdated")
+            return None
+        with self._measure_lock(shared=True), self._map_p.ctx(mode="r") as store:
+            storer = store.get_storer(group_name)
+            levels = storer.levels
+            names = levels if isinstance(levels, list) else storer.index_axes[0].name
+            where = self._index_condition(
+                names if isinstance(names, list) else [names], index_slice
+            )
+            df = store.select(
+                key=group_name,
+                where=where if where else None,
+                columns=None if isinstance(columns, slice) else columns,
+            )
+        # index_slice semantic (e.g. dropped levels of scalar keys) of .loc
+        return pd.DataFrame(df).loc[index_slice, :]
+
+    def _save_measure(self, group_name: str, df: pd.DataFrame, **params):
+        if not self._can_materialize():
+            return
+        build_id = self._count_map_build_id()
+        if build_id is None:
+            return
+        with self._measure_lock(shared=False) as locked:
+            if not locked:
+                logger.info(f"measure '{group_name}' is written by another process")
+                return
+            self._map_p.override_frame(group_name, df)
+            self._map_p.set_attribute(
+                "measure_params",
+                {k: self._measure_key(v) for k, v in params.items()},
+                group=group_name,
+            )
+            # written last: an interrupted write is never loaded
+            self._map_p.set_attribute("count_map_build_id", build_id, group=group_name)
 
     def iter_nodes_d2d(self, first_node_id=0):
         # index order: [time, x, y, source, node]
@@ -751,8 +879,11 @@ class DcdMap2D(DcdMap):
                 map_mean_err, map_mean_sqrerr, map_median_err, map_median_sqerr
                 )
         """
-        if self._map_p.contains_group("map_measure") and load_cached_version:
-            return self._map_p.get_dataframe(group="map_measure")
+        group_name = self._measure_group("map_measure")
+        if load_cached_version:
+            df = self._load_measure(group_name)
+            if df is not None:
+                return df
 
         _i = pd.IndexSlice
         nodes: pd.DataFrame = (
@@ -795,6 +926,7 @@ class DcdMap2D(DcdMap):
         df["map_median_err"] = df["map_median_count"] - df["map_glb_count"]
         df["map_median_sqerr"] = np.power(df["map_median_err"], 2)
 
+        self._save_measure(group_name, df)
         return df
 
     def remove_missing_values(self, df: pd.DataFrame, count_slice: slice):
@@ -825,11 +957,11 @@ class DcdMap2D(DcdMap):
         Returns:
             _type_: _description_
         """
-        group_name = "cell_measures"
-        if self._map_p.contains_group(group_name) and load_cached_version:
-            return fc(
-                self._map_p.get_dataframe(group=group_name).loc[index_slice, columns]
-            )
+        group_name = self._measure_group("cell_value_measures", xy_slice)
+        if load_cached_version:
+            df = self._load_measure(group_name, index_slice, columns)
+            if df is not None:
+                return fc(df)
 
         _i = pd.IndexSlice
         # ground truth of nodes at each time where at least one agent was present at some earlier time
@@ -908,6 +1040,7 @@ class DcdMap2D(DcdMap):
 
         # remove uncessary columns
         # cell_base = cell_base.drop(columns=["err_sum", "count_sum", "sqerr_sum", "abserr_sum"])
+        self._save_measure(group_name, cell_base, xy_slice=xy_slice)
         return fc(cell_base.loc[index_slice, columns])
 
     def cell_count_measure(
@@ -964,13 +1097,14 @@ class DcdMap2D(DcdMap):
         Returns:
             pd.DataFrame: _description_
         """
-        group_name = (
-            "cell_measures_no_missing" if remove_missing_values else "cell_measures"
+        group_name = self._measure_group(
+            "cell_measures_no_missing" if remove_missing_values else "cell_measures",
+            xy_slice,
         )
-        if self._map_p.contains_group(group_name) and load_cached_version:
-            return fc(
-                self._map_p.get_dataframe(group=group_name).loc[index_slice, columns]
-            )
+        if load_cached_version:
+            df = self._load_measure(group_name, index_slice, columns)
+            if df is not None:
+                return fc(df)
 
         _i = pd.IndexSlice
         # total number of nodes at each time
@@ -1045,6 +1179,12 @@ class DcdMap2D(DcdMap):
 
         # remove uncessary columns
         # cell_base = cell_base.drop(columns=["err_sum", "count_sum", "sqerr_sum", "abserr_sum"])
+        self._save_measure(
+            group_name,
+            cell_base,
+            xy_slice=xy_slice,
+            remove_missing_values=remove_missing_values,
+        )
         return fc(cell_base.loc[index_slice, columns])
 
     def count_diff(
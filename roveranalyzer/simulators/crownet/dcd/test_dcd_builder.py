@@ -0,0 +1,174 @@
+import os
+import signal
+import time
+import unittest
+from unittest import mock
+
+import pandas as pd
+from fs.tempfs import TempFS
+
+import roveranalyzer.simulators.crownet.dcd.dcd_builder as dcd_builder
+from roveranalyzer.simulators.crownet.dcd.dcd_builder import (
+    DcdHdfBuilder,
+    estimate_job_size,
+)
+from roveranalyzer.simulators.opp.provider.hdf.tests.utils import (
+    create_dcd_scenario,
+    create_tmp_fs,
+    make_dirs,
+)
+
+
+def timed_job(args):
+    """Replaces _hdf_job_timed. Reports start time instead of building the hdf."""
+    start = time.time()
+    time.sleep(0.3)
+    return {
+        "job": list(args[0:-2]),
+        "ok": True,
+        "duration": time.time() - start,
+        "error": None,
+        "telemetry": {"start": start},
+    }
+
+
+def killed_job(args):
+    """Worker process of the large job is killed (e.g. by the OOM killer)"""
+    if os.path.basename(args[1]) == "large":
+        os.kill(os.getpid(), signal.SIGKILL)
+    return timed_job(args)
+
+
+def write_job_input(path, global_size, map_sizes=()):
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, "global.csv"), "w") as fd:
+        fd.write("x" * global_size)
+    for i, size in enumerate(map_sizes):
+        with open(os.path.join(path, f"dcdMap_{i}.csv"), "w") as fd:
+            fd.write("x" * size)
+
+
+class DcdHdfBuilderTest(unittest.TestCase):
+    fs: TempFS = create_tmp_fs("DcdHdfBuilderTest")
+    test_out_dir: str = os.path.join(fs.root_path, "unittest")
+
+    @classmethod
+    def setUpClass(cls):
+        make_dirs(cls.test_out_dir)
+        create_dcd_scenario(cls.test_out_dir)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.fs.close()
+
+    def test_build_telemetry(self):
+        builder = DcdHdfBuilder.get("telemetry.h5", self.test_out_dir)
+        builder.create_hdf_fast()
+        telemetry = builder.get_build_telemetry()
+        self.assertDictEqual(telemetry, builder.telemetry.as_dict())
+        for stage in [
+            "global_parse",
+            "node_parse",
+            "owner_dist_feature",
+            "count_map",
+            "hdf_append",
+            "index_creation",
+            "attribute_writes",
+        ]:
+            self.assertIn(stage, telemetry)
+        self.assertEqual(telemetry["node_parse"]["calls"], 2)
+        self.assertEqual(telemetry["node_parse"]["rows_out"], 12)
+        self.assertEqual(telemetry["count_map"]["rows_in"], 12)
+        self.assertGreater(telemetry["hdf_append"]["bytes_written"], 0)
+        for stage in telemetry.values():
+            self.assertGreaterEqual(stage["peak_rss_increase"], 0)
+            self.assertGreaterEqual(
+                stage["process_peak_rss"], stage["peak_rss_increase"]
+            )
+        self.assertEqual(builder.count_p.get_dataframe().shape[0], 12 + 6)
+
+    def test_global_chunk_size(self):
+        full = DcdHdfBuilder.get("full.h5", self.test_out_dir)
+        full.create_hdf_fast()
+        chunked = DcdHdfBuilder.get("chunked.h5", self.test_out_dir)
+        chunked.global_chunk_size(2).create_hdf_fast()
+        # global frames are not held in memory
+        self.assertIsNone(chunked.global_df)
+        self.assertIsNone(chunked.position_df)
+        pd.testing.assert_frame_equal(
+            full.count_p.get_dataframe(), chunked.count_p.get_dataframe()
+        )
+
+
+class CreateSchedulerTest(unittest.TestCase):
+    fs: TempFS = create_tmp_fs("CreateSchedulerTest")
+    test_out_dir: str = os.path.join(fs.root_path, "unittest")
+
+    @classmethod
+    def setUpClass(cls):
+        make_dirs(cls.test_out_dir)
+        cls.jobs = []
+        for name, size in [("small", 100), ("large", 300), ("medium", 200)]:
+            path = os.path.join(cls.test_out_dir, name)
+            write_job_input(path, size // 2, map_sizes=[size // 4, size // 4])
+            cls.jobs.append(["out.h5", path])
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.fs.close()
+
+    def test_estimate_job_size(self):
+        self.assertListEqual([estimate_job_size(j) for j in self.jobs], [100, 300, 200])
+        # other map glob and missing global file
+        job = [*self.jobs[1], "dcdMap_0.csv", "missing.csv"]
+        self.assertEqual(estimate_job_size(job), 75)
+
+    def _create(self, job=timed_job, n_jobs=2, maxtasksperchild=None, **kwargs):
+        with mock.patch.object(dcd_builder, "_hdf_job_timed", job):
+            with mock.patch.object(
+                dcd_builder.multiprocessing, "cpu_count", return_value=2
+            ):
+                results = DcdHdfBuilder.create(
+                    self.jobs,
+                    n_jobs=n_jobs,
+                    mem_factor=1.0,
+                    maxtasksperchild=maxtasksperchild,
+                    **kwargs,
+                )
+        # failed jobs first (no telemetry), then in start order
+        results = sorted(results, key=lambda r: r["telemetry"].get("start", 0))
+        return [os.path.basename(r["job"][1]) for r in results], results
+
+    def test_largest_fitting_job_first(self):
+        # large and medium do not fit together, the small job is started instead
+        order, results = self._create(mem_budget=400)
+        # large and small are started together, their start order is not fixed
+        self.assertListEqual(sorted(order[:2]), ["large", "small"])
+        self.assertEqual(order[2], "medium")
+        self.assertListEqual(sorted(r["size"] for r in results[:2]), [100, 300])
+        self.assertTrue(all(r["ok"] for r in results))
+        starts = [r["telemetry"]["start"] for r in results]
+        self.assertGreater(starts[2] - starts[0], 0.2)
+
+    def test_jobs_exceeding_budget(self):
+        # no job fits: all jobs are executed one after another, largest first
+        order, results = self._create(mem_budget=50)
+        self.assertListEqual(order, ["large", "medium", "small"])
+        for prev, job in zip(results[:-1], results[1:]):
+            self.assertGreaterEqual(
+                job["telemetry"]["start"],
+                prev["telemetry"]["start"] + prev["duration"],
+            )
+
+    def test_killed_worker(self):
+        # the worker of the large job dies, the other jobs get a new pool
+        order, results = self._create(
+            job=killed_job, n_jobs=1, mem_budget=50, maxtasksperchild=1
+        )
+        self.assertListEqual(order, ["large", "medium", "small"])
+        self.assertListEqual([r["ok"] for r in results], [False, True, True])
+        self.assertIn("terminated abruptly", results[0]["error"])
+
+
+if __name__ == "__main__":
+    unittest.main()
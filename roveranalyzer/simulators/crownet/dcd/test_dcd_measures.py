@@ -0,0 +1,152 @@
+import os
+import unittest
+
+import numpy as np
+import pandas as pd
+from fs.tempfs import TempFS
+
+from roveranalyzer.simulators.crownet.dcd.dcd_map import DcdMap2D
+from roveranalyzer.simulators.opp.provider.hdf.DcdMapCountProvider import (
+    CountMapKey,
+    DcdMapCount,
+)
+from roveranalyzer.simulators.opp.provider.hdf.DcdMapProvider import DcdMapProvider
+from roveranalyzer.simulators.opp.provider.hdf.HdfGroups import HdfGroups
+from roveranalyzer.simulators.opp.provider.hdf.IHdfProvider import ProviderVersion
+from roveranalyzer.simulators.opp.provider.hdf.tests.utils import (
+    create_tmp_fs,
+    make_dirs,
+    safe_dataframe_to_hdf,
+)
+
+
+def create_count_map(times=4, cells=3, nodes=2) -> pd.DataFrame:
+    idx = pd.MultiIndex.from_product(
+        [
+            np.arange(times, dtype=float),
+            np.arange(cells, dtype=float),
+            [1.0],
+            range(nodes + 1),
+        ],
+        names=[CountMapKey.SIMTIME, CountMapKey.X, CountMapKey.Y, CountMapKey.ID],
+    )
+    df = pd.DataFrame(index=idx)
+    df[CountMapKey.COUNT] = np.arange(len(idx), dtype=float) % 3
+    df[CountMapKey.ERR] = np.arange(len(idx), dtype=float) % 2
+    df[CountMapKey.OWNER_DIST] = 1.0
+    df[CountMapKey.SQERR] = df[CountMapKey.ERR] ** 2
+    return df
+
+
+class DcdMapMeasureTest(unittest.TestCase):
+    fs: TempFS = create_tmp_fs("DcdMapMeasureTest")
+    test_out_dir: str = os.path.join(fs.root_path, "unittest")
+    hdf_path: str = os.path.join(test_out_dir, "data.h5")
+    count_p: DcdMapCount = DcdMapCount(hdf_path)
+    map_p: DcdMapProvider = DcdMapProvider(hdf_path, version=ProviderVersion.V0_3)
+
+    @classmethod
+    def setUpClass(cls):
+        make_dirs(cls.test_out_dir)
+        safe_dataframe_to_hdf(create_count_map(), HdfGroups.COUNT_MAP, cls.hdf_path)
+        cls.count_p.set_attribute("build_id", "build_1")
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.fs.close()
+
+    def dcd_map(self, count_p=None, map_p=None, **kwargs):
+        return DcdMap2D(
+            metadata=None,
+            global_df=None,
+            map_df=None,
+            position_df=None,
+            count_p=self.count_p if count_p is None else count_p,
+            map_p=self.map_p if map_p is None else map_p,
+            **kwargs,
+        )
+
+    def test_materialize_cell_count_measure(self):
+        m = self.dcd_map()
+        xy = (slice(0.0, 1.0), slice(None))
+        df = m.cell_count_measure(xy_slice=xy)
+        group = m._measure_group("cell_measures", xy)
+        self.assertNotEqual(group, "cell_measures")
+        self.assertTrue(m._map_p.contains_group(group))
+        self.assertFalse(m._map_p.contains_group("cell_measures"))
+
+        # served from hdf including column selection
+        cached = m._load_measure(group, columns=["cell_mse"])
+        self.assertListEqual(list(cached.columns), ["cell_mse"])
+        pd.testing.assert_frame_equal(
+            m.cell_count_measure(xy_slice=xy, columns=["cell_mse", "glb_count"]),
+            df.loc[:, ["cell_mse", "glb_count"]],
+            check_like=True,
+        )
+
+    def test_invalidate_on_count_map_rebuild(self):
+        m = self.dcd_map()
+        df = m.map_count_measure()
+        self.assertIsNotNone(m._load_measure("map_measure"))
+        m.count_p.set_attribute("build_id", "build_2")
+        self.assertIsNone(m._load_measure("map_measure"))
+        pd.testing.assert_frame_equal(m.map_count_measure(), df)
+        self.assertIsNotNone(m._load_measure("map_measure"))
+
+    def test_index_slice_query(self):
+        m = self.dcd_map()
+        xy = (slice(None), slice(0.0, 5.0))
+        df = m.cell_count_measure(xy_slice=xy)
+        group = m._measure_group("cell_measures", xy)
+        for index_slice in [
+            slice(1.0, 2.0),
+            (slice(None), slice(1.0, None)),
+            (2.0, slice(None, 1.0)),
+        ]:
+            pd.testing.assert_frame_equal(
+                m._load_measure(group, index_slice=index_slice),
+                df.loc[index_slice, :],
+            )
+        self.assertListEqual(
+            m._index_condition(["simtime", "x", "y"], (2.0, slice(None, 1.0))),
+            ["simtime==2.0", "x<=1.0"],
+        )
+        # not expressible as condition: selected in memory
+        self.assertIsNone(m._index_condition(["simtime"], [1.0, 2.0]))
+
+    def test_measure_key_hashes_content(self):
+        a = np.zeros(10_000)
+        b = a.copy()
+        b[5_000] = 1.0
+        # repr of both arrays is identical (truncated)
+        self.assertEqual(repr(a), repr(b))
+        self.assertNotEqual(DcdMap2D._measure_key(a), DcdMap2D._measure_key(b))
+        idx = pd.MultiIndex.from_arrays([a, a], names=["x", "y"])
+        idx_b = pd.MultiIndex.from_arrays([a, b], names=["x", "y"])
+        self.assertNotEqual(DcdMap2D._measure_key(idx), DcdMap2D._measure_key(idx_b))
+        self.assertEqual(
+            DcdMap2D._measure_key((slice(0.0, 1.0), slice(None))),
+            "tuple(slice(0.0, 1.0, None),slice(None, None, None))",
+        )
+
+    def test_no_materialization(self):
+        # count map without build id (legacy file): outdated measures not detectable
+        legacy_path = os.path.join(self.test_out_dir, "legacy.h5")
+        m = self.dcd_map(
+            count_p=DcdMapCount(legacy_path),
+            map_p=DcdMapProvider(legacy_path, version=ProviderVersion.V0_3),
+        )
+        safe_dataframe_to_hdf(create_count_map(), HdfGroups.COUNT_MAP, legacy_path)
+        m.map_count_measure()
+        self.assertFalse(m._map_p.contains_group("map_measure"))
+
+        # read only access
+        m = self.dcd_map(materialize_measures=False)
+        xy = (slice(1.0, 1.0), slice(None))
+        m.cell_count_measure(xy_slice=xy)
+        group = m._measure_group("cell_measures", xy)
+        self.assertFalse(m._map_p.contains_group(group))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,6 @@
 import re
 from string import Template
-from typing import List
+from typing import List, Tuple
 
 import matplotlib as mpl
 import matplotlib.pyplot as plt
@@ -8,6 +8,7 @@ import numpy as np
 import pandas as pd
 
 from roveranalyzer.tempaltes import read_tmpl_str
+from roveranalyzer.utils.ragged import RaggedArray
 
 # fixme: are they different? (sca, vec)
 _scave_cols = ["run", "type", "module", "name", "attrname", "attrvalue"]
@@ -128,26 +129,38 @@ class Opp:
         def_vec data frame of opp vector values only. This will transform the values into normalized
         column vectors  ['time', 'value']
         """
-        frames = []
-        time_name = "time"
-        value_name = "value"
-        for idx in df_vec.index:
-            if axis == 1:
-                mod_name = f"{Opp.module_path(df_vec.loc[idx]['module'], index=1)}"
-                stat_name = df_vec.loc[idx]["name"].split(":")[0]
-                time_name = f"{mod_name}.{stat_name}.time"
-                value_name = f"{mod_name}.{stat_name}.value"
-
-            data = df_vec.loc[idx]["vectime"].copy()
-            data = np.append(data, df_vec.loc[idx]["vecvalue"].copy())
-            data = data.reshape((-1, 2), order="F")
-            tmp_d = pd.DataFrame(data, columns=[time_name, value_name])
-            tmp_d.reset_index(drop=True, inplace=True)
-            frames.append(tmp_d)
-
-        df_n = pd.concat(frames, axis=axis, ignore_index=True if axis == 0 else False)
+        if df_vec.shape[0] == 0:
+            raise ValueError("No vectors to normalize")
+        # values/offsets of the cells. The flat buffer parsed by ScaveConverter.convert is
+        # used without copy if the vectors are still in parsed order without gaps
+        # (see RaggedArray.from_arrays), otherwise the cells are concatenated.
+        times = RaggedArray.from_arrays(df_vec["vectime"])
+        values = RaggedArray.from_arrays(df_vec["vecvalue"])
+        time = times.values
+        value = values.values
+        if axis == 0:
+            dtype = np.result_type(time, value)
+            return pd.DataFrame(
+                {
+                    "time": time.astype(dtype, copy=False),
+                    "value": value.astype(dtype, copy=False),
+                }
+            )
 
-        return df_n
+        names = []
+        for module, name in zip(df_vec["module"], df_vec["name"]):
+            mod_name = f"{Opp.module_path(module, index=1)}"
+            stat_name = name.split(":")[0]
+            names.extend(
+                [f"{mod_name}.{stat_name}.time", f"{mod_name}.{stat_name}.value"]
+            )
+        # place all vectors at once: row within vector and column pair of each value
+        row = times.position()
+        col = 2 * times.row_index()
+        data = np.full((times.lengths.max(), 2 * len(times)), np.nan)
+        data[row, col] = time
+        data[row, col + 1] = value
+        return pd.DataFrame(data, columns=names)
 
 
 class OppTex:
@@ -266,6 +279,30 @@ class OppTex:
                 f.write(tmpl)
 
 
+class OppCategories:
+    """
+    Categorical encoding (codes and unique values) of the string columns of an OMNeT++
+    based data frame. Filters are evaluated once for each unique value and broadcast to
+    all rows via the codes. Columns with a categorical dtype are used as is. Other columns
+    are encoded once per instance, i.e. once per applied OppFilter. Convert the columns
+    to 'category' to reuse the encoding for repeated filtering of the same frame.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self._df = df
+        self._cache = {}
+
+    def codes(self, column) -> Tuple[np.ndarray, pd.Index]:
+        """codes (-1 for missing values) and unique values of column"""
+        col = self._df[column]
+        if isinstance(col.dtype, pd.CategoricalDtype):
+            return col.cat.codes.to_numpy(), col.cat.categories
+        if column not in self._cache:
+            codes, uniques = pd.factorize(col.to_numpy())
+            self._cache[column] = (codes, pd.Index(uniques))
+        return self._cache[column]
+
+
 class OppFilterItem:
     """
     Filter item applicable to OMNeT++ based data frame. #name corresponds to column of df.
@@ -291,6 +328,23 @@ class OppFilterItem:
             f"FilterItem(name: {self.name}, value: {self.value}, regex: {self.regex})"
         )
 
+    def match(self, values: pd.Index) -> np.ndarray:
+        """boolean array of matching values"""
+        if self.regex:
+            ret = pd.Series(values, dtype=object).str.match(self.value)
+            return ret.fillna(False).to_numpy(dtype=bool)
+        elif self.is_list:
+            return np.asarray(values.isin(self.value), dtype=bool)
+        else:
+            return np.asarray(values == self.value, dtype=bool)
+
+    def mask(self, categories: OppCategories) -> np.ndarray:
+        """boolean row mask. Only the unique values of the column are matched."""
+        codes, values = categories.codes(self.name)
+        # last entry is used for missing values (code -1)
+        lookup = np.append(self.match(values), False)
+        return lookup[codes]
+
 
 class OppFilter:
     """
@@ -303,7 +357,11 @@ class OppFilter:
     Note: All special characters must be escaped if literal brackets or dots should be matched.
     """
 
-    def __init__(self, df: pd.DataFrame = None, data_only=True):
+    def __init__(
+        self,
+        df: pd.DataFrame = None,
+        data_only=True,
+    ):
         self._filter_dict = {}
         self._name = None
         self._name_regex = None
@@ -397,20 +455,10 @@ class OppFilter:
         if self._df is None:
             raise ValueError("no Dataframe set")
 
-        bool_filter = pd.Series(
-            [True for _ in range(0, self._df.shape[0])], self._df.index
-        )
-        for key, filter_item in self._filter_dict.items():
-            if filter_item.regex:
-                bool_filter = bool_filter & self._df.loc[:, key].str.match(
-                    filter_item.value
-                )
-            elif filter_item.is_list:
-                bool_filter = bool_filter & (
-                    self._df.loc[:, key].isin(filter_item.value)
-                )
-            else:
-                bool_filter = bool_filter & (self._df.loc[:, key] == filter_item.value)
+        categories = OppCategories(self._df)
+        bool_filter = np.ones(self._df.shape[0], dtype=bool)
+        for filter_item in self._filter_dict.values():
+            bool_filter &= filter_item.mask(categories)
         if columns is not None:
             ret = self._df.loc[bool_filter, columns]
         else:
@@ -3,11 +3,12 @@ from __future__ import annotations
 from typing import Dict, List, Tuple, Union
 
 import geopandas as gpd
+import numpy as np
 import pandas as pd
 from shapely.geometry import Point, box
 
 from roveranalyzer.simulators.crownet.common import DcdMetaData
-from roveranalyzer.simulators.crownet.common.dcd_util import read_csv
+from roveranalyzer.simulators.crownet.common.dcd_util import read_csv, read_csv_chunked
 from roveranalyzer.simulators.opp.provider.hdf.HdfGroups import HdfGroups
 from roveranalyzer.simulators.opp.provider.hdf.IHdfProvider import IHdfProvider
 
@@ -191,10 +192,75 @@ class DcdGlobalDensity(IHdfProvider):
         return gdf
 
 
+class GlobalExtent:
+    """
+    Running min/max of time, cell coordinates and node ids over the
+    global density and position frames. Used to compute the extent
+    attributes without holding the whole global map in memory.
+    """
+
+    ATTRIBUTES = ["time_interval", "map_extend_x", "map_extend_y", "id_interval"]
+
+    def __init__(self):
+        self._extent = {k: [np.inf, -np.inf] for k in self.ATTRIBUTES}
+
+    @staticmethod
+    def _update(interval: List, values: np.ndarray):
+        if len(values) > 0:
+            interval[0] = min(interval[0], values.min())
+            interval[1] = max(interval[1], values.max())
+
+    def update(self, density_df: pd.DataFrame, position_df: pd.DataFrame):
+        self._update(
+            self._extent["time_interval"],
+            density_df.index.get_level_values(DcdGlobalMapKey.SIMTIME),
+        )
+        self._update(
+            self._extent["map_extend_x"],
+            density_df.index.get_level_values(DcdGlobalMapKey.X),
+        )
+        self._update(
+            self._extent["map_extend_y"],
+            density_df.index.get_level_values(DcdGlobalMapKey.Y),
+        )
+        self._update(
+            self._extent["id_interval"],
+            position_df.index.get_level_values(DcdGlobalMapKey.NODE_ID),
+        )
+        return self
+
+    def as_dict(self) -> Dict[str, List]:
+        return {k: list(v) for k, v in self._extent.items()}
+
+    def write_attributes(self, *providers: IHdfProvider):
+        for p in providers:
+            for k, v in self.as_dict().items():
+                p.set_attribute(k, v)
+
+
 def pos_density_from_csv(
     csv_path: str,
     hdf_path: str,
+    chunk_size: int | None = None,
 ) -> Tuple[DcdGlobalPosition, DcdGlobalDensity, DcdMetaData]:
+    """
+    Parse global.csv into the position and density provider. The extent
+    attributes (time_interval, map_extend_x, map_extend_y, id_interval) are
+    set on both providers.
+
+    Args:
+        csv_path: path to global.csv (must be ordered by simtime if chunk_size is set)
+        hdf_path: target hdf file
+        chunk_size: if set, read the csv in chunks of (at least) chunk_size rows and append
+            each chunk to the providers. Memory usage is bounded by the chunk size
+            and the number of rows of a single time step.
+
+    Returns:
+        position provider, density provider and metadata of the global map
+    """
+    if chunk_size is not None:
+        return _pos_density_from_csv_chunked(csv_path, hdf_path, chunk_size)
+
     pos = DcdGlobalPosition(hdf_path)
     density = DcdGlobalDensity(hdf_path)
     global_df, meta = read_csv(
@@ -209,5 +275,54 @@ def pos_density_from_csv(
     )
     pos.write_dataframe(position_df)
     density.write_dataframe(global_df)
+    GlobalExtent().update(global_df, position_df).write_attributes(pos, density)
+
+    return pos, density, meta
+
+
+def _pos_density_from_csv_chunked(
+    csv_path: str,
+    hdf_path: str,
+    chunk_size: int,
+) -> Tuple[DcdGlobalPosition, DcdGlobalDensity, DcdMetaData]:
+    pos = DcdGlobalPosition(hdf_path)
+    density = DcdGlobalDensity(hdf_path)
+    for p in [pos, density]:
+        if p.contains_group(p.group):
+            with p.ctx() as store:
+                store.remove(p.group)
+
+    extent = GlobalExtent()
+    meta = None
+    for global_df, meta in read_csv_chunked(
+        csv_path=csv_path,
+        _index_types=DcdGlobalMapKey.types_global_raw_csv_index,
+        _col_types=DcdGlobalMapKey.types_global_raw_csv_col,
+        chunk_size=chunk_size,
+        real_coords=True,
+    ):
+        position_df, global_df = build_position_df(global_df)
+        # fixed dtype, downcast may differ between chunks
+        position_df = position_df.astype(DcdGlobalMapKey.types_global_pos)
+        # chunks contain complete time steps, thus integrity check per chunk is sufficient
+        position_df.set_index(
+            keys=list(pos.index_order().values()), inplace=True, verify_integrity=True
+        )
+        pos.write_frame(pos.group, position_df, index=False)
+        density.write_frame(density.group, global_df, index=False)
+        extent.update(global_df, position_df)
+
+    if meta is None:
+        raise ValueError(f"no data found in {csv_path}")
+
+    for p in [pos, density]:
+        with p.ctx() as store:
+            store.create_table_index(
+                key=p.group,
+                columns=list(p.index_order().values()),
+                optlevel=9,
+                kind="full",
+            )
+    extent.write_attributes(pos, density)
 
     return pos, density, meta
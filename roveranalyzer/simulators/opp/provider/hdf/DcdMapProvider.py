@@ -20,7 +20,7 @@ from roveranalyzer.simulators.opp.provider.hdf.IHdfProvider import (
 )
 from roveranalyzer.utils.dataframe import FrameConsumer, LazyDataFrame
 from roveranalyzer.utils.logging import logger
-from roveranalyzer.utils.misc import ProgressCmd
+from roveranalyzer.utils.misc import ProgressCmd, StageTelemetry
 
 
 class DcdMapKey:
@@ -125,6 +125,8 @@ class DcdMapProvider(IHdfProvider):
         self.node_regex = re.compile(r"dcdMap_(?P<node>\d+)\.csv")
         # some filter callbacks to apply to parsed csv before any further processing
         self.csv_filters = []
+        # stage-level measurements of create_from_csv
+        self.telemetry = StageTelemetry()
 
     def group_key(self) -> str:
         return HdfGroups.DCD_MAP
@@ -145,8 +147,15 @@ class DcdMapProvider(IHdfProvider):
         return DcdMapKey.SIMTIME
 
     def create_from_csv(
-        self, csv_paths: List[str], frame_consumer: List[FrameConsumer] = [], **kwargs
+        self,
+        csv_paths: List[str],
+        frame_consumer: List[FrameConsumer] = [],
+        telemetry: StageTelemetry | None = None,
+        **kwargs,
     ) -> None:
+        if telemetry is not None:
+            self.telemetry = telemetry
+        telemetry = self.telemetry
         progress = ProgressCmd(prefix="read csv: ", cycle_count=len(csv_paths))
         for file_path in csv_paths:
             progress.incr()
@@ -154,32 +163,35 @@ class DcdMapProvider(IHdfProvider):
             dcd_df = self.build_dcd_dataframe(file_path, **kwargs)
 
             # append to table but do not index (will be done at the end)
-            with self.ctx() as store:
-                store.append(
-                    key=self.group,
-                    value=dcd_df,
-                    index=False,
-                    format="table",
-                    data_columns=True,
-                )
+            with telemetry.stage("hdf_append", rows_in=dcd_df.shape[0]):
+                with self.ctx() as store:
+                    store.append(
+                        key=self.group,
+                        value=dcd_df,
+                        index=False,
+                        format="table",
+                        data_columns=True,
+                    )
             # send data frame to frame_consumers
             for consumer in frame_consumer:
                 consumer(dcd_df)
 
         # create index
-        with self.ctx() as store:
-            columns_to_index = list(self.index_order().values())
-            if "selection" in self.columns():
-                columns_to_index.append("selection")
-            logger.info(f"create index for columns: {','.join(columns_to_index)}")
-            store.create_table_index(
-                key=self.group,
-                columns=columns_to_index,
-                optlevel=9,
-                kind="full",
-            )
-        self.set_selection_mapping_attribute()
-        self.set_used_selection_attribute()
+        with telemetry.stage("index_creation"):
+            with self.ctx() as store:
+                columns_to_index = list(self.index_order().values())
+                if "selection" in self.columns():
+                    columns_to_index.append("selection")
+                logger.info(f"create index for columns: {','.join(columns_to_index)}")
+                store.create_table_index(
+                    key=self.group,
+                    columns=columns_to_index,
+                    optlevel=9,
+                    kind="full",
+                )
+        with telemetry.stage("attribute_writes"):
+            self.set_selection_mapping_attribute()
+            self.set_used_selection_attribute()
 
     def parse_node_id(self, path: str) -> int:
         grps = [m.groupdict() for m in self.node_regex.finditer(path)]
@@ -189,35 +201,38 @@ class DcdMapProvider(IHdfProvider):
         return node_id
 
     def build_dcd_dataframe(self, path: str, **kwargs) -> pd.DataFrame:
+        telemetry = self.telemetry
         _df = LazyDataFrame.from_path(path)
         meta = _df.read_meta_data()
         meta = DcdMetaData.from_dict(meta)
         if meta.version != self.version:
             logger.warn(f"version missmatch {meta.version}!={self.version} in {path}")
 
-        df, meta = DcdUtil.read_csv(
-            csv_path=path,
-            _index_types=DcdMapKey.types_csv_index[meta.version],
-            _col_types=DcdMapKey.types_csv_columns[meta.version],
-            real_coords=True,
-            df_filter=self.csv_filters,
-        )
-        # add own node id
-        df[DcdMapKey.NODE] = self.parse_node_id(path)
-        # set index
-        df = df.reset_index()
-        index = list(self.index_order().values())
-        df = df.set_index(keys=index, verify_integrity=True, drop=True)
-        # cleanup string based column
-        # ensure all keys in df are mapped to integer. Add new ones if needed.
-        self.update_selection_map(df[DcdMapKey.SELECTION].unique().tolist())
-
-        df[DcdMapKey.SELECTION] = df[DcdMapKey.SELECTION].fillna(
-            self.selection_mapping["NaN"]
-        )
-        df[DcdMapKey.SELECTION] = df[DcdMapKey.SELECTION].replace(
-            self.selection_mapping
-        )
+        with telemetry.stage("node_parse") as rec:
+            df, meta = DcdUtil.read_csv(
+                csv_path=path,
+                _index_types=DcdMapKey.types_csv_index[meta.version],
+                _col_types=DcdMapKey.types_csv_columns[meta.version],
+                real_coords=True,
+                df_filter=self.csv_filters,
+            )
+            # add own node id
+            df[DcdMapKey.NODE] = self.parse_node_id(path)
+            # set index
+            df = df.reset_index()
+            index = list(self.index_order().values())
+            df = df.set_index(keys=index, verify_integrity=True, drop=True)
+            # cleanup string based column
+            # ensure all keys in df are mapped to integer. Add new ones if needed.
+            self.update_selection_map(df[DcdMapKey.SELECTION].unique().tolist())
+
+            df[DcdMapKey.SELECTION] = df[DcdMapKey.SELECTION].fillna(
+                self.selection_mapping["NaN"]
+            )
+            df[DcdMapKey.SELECTION] = df[DcdMapKey.SELECTION].replace(
+                self.selection_mapping
+            )
+            rec["rows_out"] = df.shape[0]
 
         # #####
         # apply features
@@ -226,7 +241,9 @@ class DcdMapProvider(IHdfProvider):
         num_rows = df.shape[0]
 
         # apply owner_dist_feature
-        df = DcdUtil.owner_dist_feature(df, meta, **kwargs)
+        with telemetry.stage("owner_dist_feature", rows_in=num_rows) as rec:
+            df = DcdUtil.owner_dist_feature(df, meta, **kwargs)
+            rec["rows_out"] = df.shape[0]
         if df.shape[0] != num_rows:
             raise RuntimeError(
                 "Inconsistency detected in owner_dist_feature. "
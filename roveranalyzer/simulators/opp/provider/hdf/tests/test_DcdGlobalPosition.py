@@ -0,0 +1,84 @@
+import os
+import unittest
+
+import pandas as pd
+from fs.tempfs import TempFS
+
+from roveranalyzer.simulators.opp.provider.hdf.DcDGlobalPosition import (
+    GlobalExtent,
+    pos_density_from_csv,
+)
+from roveranalyzer.simulators.opp.provider.hdf.tests.utils import (
+    create_tmp_fs,
+    make_dirs,
+)
+
+
+def write_global_csv(path, num_times=10, cells_per_time=3):
+    lines = [
+        "#CELLSIZE=3.0,DATACOL=-1,IDXCOL=3,SEP=;,XSIZE=30.0,YSIZE=30.0,NODE_ID=global",
+        "simtime;x;y;count;node_id",
+    ]
+    for t in range(num_times):
+        for c in range(cells_per_time):
+            ids = ",".join(str(100 + 10 * c + i) for i in range(c + 1))
+            lines.append(f"{t * 0.4 + 1.0};{t % 5 + c};{c};{c + 1};{ids}")
+    with open(path, "w") as fd:
+        fd.write("\n".join(lines))
+        fd.write("\n")
+
+
+class DcdGlobalPositionTest(unittest.TestCase):
+    fs: TempFS = create_tmp_fs("DcdGlobalPositionTest")
+    test_out_dir: str = os.path.join(fs.root_path, "unittest")
+    csv_path: str = os.path.join(test_out_dir, "global.csv")
+
+    @classmethod
+    def setUpClass(cls):
+        make_dirs(cls.test_out_dir)
+        write_global_csv(cls.csv_path)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.fs.close()
+
+    def test_chunked_equals_full_read(self):
+        full_hdf = os.path.join(self.test_out_dir, "full.h5")
+        chunk_hdf = os.path.join(self.test_out_dir, "chunk.h5")
+        pos, density, meta = pos_density_from_csv(self.csv_path, full_hdf)
+        # chunk size smaller than one time step and not a divider of the row count
+        pos_c, density_c, meta_c = pos_density_from_csv(
+            self.csv_path, chunk_hdf, chunk_size=4
+        )
+
+        self.assertEqual(meta.cell_size, meta_c.cell_size)
+        pd.testing.assert_frame_equal(
+            density.get_dataframe(), density_c.get_dataframe()
+        )
+        pd.testing.assert_frame_equal(pos.get_dataframe(), pos_c.get_dataframe())
+        for k in GlobalExtent.ATTRIBUTES:
+            self.assertListEqual(
+                list(pos.get_attribute(k)), list(pos_c.get_attribute(k))
+            )
+            self.assertListEqual(
+                list(density.get_attribute(k)), list(density_c.get_attribute(k))
+            )
+        self.assertListEqual(list(pos_c.get_attribute("time_interval")), [1.0, 4.6])
+        self.assertListEqual(list(pos_c.get_attribute("map_extend_x")), [0.0, 18.0])
+        self.assertListEqual(list(pos_c.get_attribute("id_interval")), [100, 122])
+
+    def test_chunked_unordered_csv(self):
+        path = os.path.join(self.test_out_dir, "unordered.csv")
+        with open(self.csv_path, "r") as fd:
+            lines = fd.read().strip().split("\n")
+        lines = lines[:2] + lines[2:][::-1]
+        with open(path, "w") as fd:
+            fd.write("\n".join(lines))
+        with self.assertRaises(ValueError):
+            pos_density_from_csv(
+                path, os.path.join(self.test_out_dir, "unordered.h5"), chunk_size=5
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -94,3 +94,36 @@ def safe_dataframe_to_hdf(
     dataframe.to_hdf(
         path_or_buf=path, key=hdf_group_key, format="table", data_columns=True
     )
+
+
+def create_dcd_scenario(path: str, times: int = 3) -> None:
+    """
+    Write global.csv and dcdMap_<id>.csv files (version 0.1) of two nodes
+    moving along the x and y axis. Each node sees both nodes at all times.
+    """
+    meta = "#CELLSIZE=3.0,DATACOL=-1,IDXCOL=3,SEP=;,XSIZE=30.0,YSIZE=30.0,NODE_ID={}"
+    positions = {
+        1: [(t, 0) for t in range(times)],
+        2: [(0, t + 1) for t in range(times)],
+    }
+    with open(os.path.join(path, "global.csv"), "w") as fd:
+        fd.write(f"{meta.format('global')}\nsimtime;x;y;count;node_id\n")
+        for t in range(times):
+            cells = {}
+            for node_id, pos in positions.items():
+                cells.setdefault(pos[t], []).append(str(node_id))
+            for (x, y), ids in sorted(cells.items()):
+                fd.write(f"{t + 1.0};{x};{y};{len(ids)};{','.join(ids)}\n")
+    for node_id in positions:
+        with open(os.path.join(path, f"dcdMap_{node_id}.csv"), "w") as fd:
+            fd.write(
+                f"{meta.format(node_id)}\n"
+                "simtime;x;y;count;measured_t;received_t;source;selection;own_cell\n"
+            )
+            for t in range(times):
+                for source, pos in positions.items():
+                    x, y = pos[t]
+                    own = int(source == node_id)
+                    fd.write(
+                        f"{t + 1.0};{x};{y};1;{t + 0.5};{t + 0.8};{source};ymf;{own}\n"
+                    )
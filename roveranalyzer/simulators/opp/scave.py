@@ -9,9 +9,11 @@ import re
 import signal
 import sqlite3 as sq
 import subprocess
+import tempfile
+import threading
 import time
 from multiprocessing import Value
-from typing import Any, List, Tuple, Union
+from typing import Any, Iterator, List, Tuple, Union
 
 import geopandas as gpd
 import numpy as np
@@ -23,6 +25,7 @@ from roveranalyzer.simulators.opp.accessor import Opp
 from roveranalyzer.simulators.opp.configuration import Config
 from roveranalyzer.utils import Timer, logger
 from roveranalyzer.utils.logging import timing
+from roveranalyzer.utils.ragged import RaggedArray
 
 
 class SqlEmptyResult(Exception):
@@ -97,19 +100,23 @@ class ScaveData:
         df = df.set_index(index)
 
         timer.stop_start("stack data")
-        stacked = list()
-        for col in columns:
-            stacked.append(df[col].apply(pd.Series).stack())
-
-        timer.stop_start("concatenate data")
-        df = pd.concat(stacked, axis=1, keys=columns)
-
-        timer.stop_start("cleanup index")  #
-        if None in df.index.names:
-            df.index = df.index.droplevel(level=None)
+        stacked = {c: RaggedArray.from_arrays(df[c], dtype=float) for c in columns}
+        lengths = stacked[columns[0]].lengths
+        for col, ragged in stacked.items():
+            if not np.array_equal(ragged.lengths, lengths):
+                raise ValueError(f"length of {col} does not match {columns[0]}")
+
+        timer.stop_start("repeat index")
+        df = pd.DataFrame(
+            {c: r.values for c, r in stacked.items()}, index=df.index.repeat(lengths)
+        )
+        # same as DataFrame.stack(): drop entries where all columns are NaN
+        all_nan = np.all([np.isnan(r.values) for r in stacked.values()], axis=0)
+        if all_nan.any():
+            df = df[~all_nan]
 
         timer.stop_start("drop columns or index level")
-        for c in drop:
+        for c in [] if drop is None else drop:
             if c in df.index.names:
                 df.index = df.index.droplevel(level=c)
             elif c in df.columns:
@@ -738,6 +745,72 @@ class OppSql:
 
         return df
 
+    def vec_data_windows(
+        self,
+        ids: List[int] | pd.DataFrame,
+        window: float,
+        columns: List[str] = ("vectorId", "eventNumber", "simtimeRaw", "value"),
+        value_name: str = "value",
+        time_resolution=1e12,
+        chunksize: int = 500_000,
+    ) -> Iterator[Tuple[float, pd.DataFrame]]:
+        """Stream vector data in consecutive simtime windows [k*window, (k+1)*window).
+
+        The data is read in chunks ordered by simtime and a window is returned as soon
+        as the first row of a later window was read. Only one window (plus one chunk)
+        is held in memory at any time. Windows without any data are skipped.
+
+        Args:
+            ids (List[int] | pd.DataFrame): vector ids. If a DataFrame is given its columns are merged on vectorId (see vec_data).
+            window (float): window size in seconds
+            columns (List[str], optional): columns of vectorData to select. Must contain simtimeRaw.
+            value_name (str, optional): rename value column. Defaults to "value".
+            time_resolution (float, optional): simtimeRaw per second. Defaults to 1e12.
+            chunksize (int, optional): number of rows read at once. Defaults to 500_000.
+
+        Yields:
+            Tuple[float, pd.DataFrame]: start time of the window and the data of the window.
+        """
+        if "simtimeRaw" not in columns:
+            raise ValueError("simtimeRaw column is needed to create time windows")
+        if type(ids) == pd.DataFrame:
+            _ids = ids["vectorId"].unique()
+            if "vectorId" not in columns:
+                columns = [*columns, "vectorId"]
+        else:
+            _ids = ids
+        window_raw = int(round(window * time_resolution))
+        _ids = ", ".join([str(i) for i in _ids])
+        _columns = ", ".join([f"v_data.{c}" for c in columns])
+        _sql = (
+            f"select {_columns} from vectorData v_data where v_data.vectorId in ({_ids}) "
+            f"order by v_data.simtimeRaw, v_data.eventNumber"
+        )
+
+        def _frame(df: pd.DataFrame, w: int):
+            df = df.copy()
+            df["simtimeRaw"] = df["simtimeRaw"] / time_resolution
+            df = df.rename(columns={"simtimeRaw": "time", "value": value_name})
+            if type(ids) == pd.DataFrame:
+                df = pd.merge(df, ids, how="left", on=["vectorId"])
+            return w * window_raw / time_resolution, df
+
+        logger.debug(f"execute sql on db vec: {_sql}")
+        pending = None
+        with self.vec_con() as con:
+            for chunk in pd.read_sql_query(_sql, con, chunksize=chunksize):
+                if pending is not None:
+                    chunk = pd.concat([pending, chunk], axis=0, ignore_index=True)
+                w = chunk["simtimeRaw"].to_numpy() // window_raw
+                # rows are ordered by time: all but the last window are complete
+                bounds = np.flatnonzero(np.diff(w)) + 1
+                starts = np.r_[0, bounds]
+                for start, end in zip(starts[:-1], bounds):
+                    yield _frame(chunk.iloc[start:end], w[start])
+                pending = chunk.iloc[starts[-1] :]
+        if pending is not None and not pending.empty:
+            yield _frame(pending, pending["simtimeRaw"].iloc[0] // window_raw)
+
 
 class CrownetSql(OppSql):
 
@@ -1115,6 +1188,48 @@ class CrownetSql(OppSql):
         vec_data = self.vec_data(
             ids=df, columns=("vectorId", "eventNumber", "simtimeRaw", "value")
         )
+        return self._pivot_vec_data(vec_data, vector_name_map, append_index, index)
+
+    def vec_data_pivot_windows(
+        self,
+        module_name: SqlOp | str,
+        vector_name_map: dict,
+        window: float,
+        append_index: List[str] = (),
+        index: List[str] | None = None,
+        chunksize: int = 500_000,
+    ) -> Iterator[Tuple[float, pd.DataFrame]]:
+        """Same as vec_data_pivot but the data is read and transformed window by window
+        (see vec_data_windows). All vectors of one event share the same time and thus
+        are part of the same window.
+
+        Yields:
+            Tuple[float, pd.DataFrame]: start time of the window and pivoted data of the window.
+        """
+        df = self.vector_ids_to_host(
+            module_name,
+            self.OR(list(vector_name_map.keys())),
+            vec_info_columns=["vectorId", "vectorName"],
+            name_columns=["hostId"],
+        )
+        if df.empty:
+            raise SqlEmptyResult(
+                f"No data for vector names: {list(vector_name_map.keys())} found."
+            )
+        for time, vec_data in self.vec_data_windows(
+            ids=df, window=window, chunksize=chunksize
+        ):
+            yield time, self._pivot_vec_data(
+                vec_data, vector_name_map, append_index, index
+            )
+
+    def _pivot_vec_data(
+        self,
+        vec_data: pd.DataFrame,
+        vector_name_map: dict,
+        append_index: List[str] = (),
+        index: List[str] | None = None,
+    ) -> pd.DataFrame:
         vec_data["vectorName"] = vec_data["vectorName"].map(
             {k: v["name"] for k, v in vector_name_map.items()}
         )
@@ -1307,8 +1422,10 @@ class ScaveTool:
         """
         if converters is None:
             converters = ScaveConverter()
-        df = pd.read_csv(csv_file, converters=converters.get())
-        return df
+        df = pd.read_csv(
+            csv_file, converters=converters.get(), dtype=converters.get_dtypes()
+        )
+        return converters.convert(df)
 
     def create_or_get_csv_file(
         self,
@@ -1353,6 +1470,10 @@ class ScaveTool:
         scave_filter: Union[str, ScaveFilter] = None,
         recursive=True,
         converters=None,
+        stream=False,
+        chunksize=100_000,
+        native=False,
+        pool_size=1,
     ) -> pd.DataFrame:
         """
          Directly load data into Dataframe from *.vec and *.sca files without creating a
@@ -1363,11 +1484,32 @@ class ScaveTool:
         :param input_paths:     List of glob patters search for *.vec and *.sca files
         :param scave_filter:    (default: None) string based filter for scavetool see #print_filter_help for syntax
         :param recursive:       (default: True) use recursive glob patterns
+        :param stream:          (default: False) parse stdout while scavetool is running (see #read_csv_stream)
+                                instead of waiting for the complete output. This only overlaps parsing
+                                with the scavetool run, the chunks are concatenated and memory usage is
+                                not reduced. Use #iter_df_from_scave to process the chunks with bounded memory.
+        :param chunksize:       (default: 100_000) rows per chunk if stream is True
+        :param native:          (default: False) read text based *.vec files directly without
+                                scavetool (see VecFile). Only vectors are loaded.
+        :param pool_size:       (default: 1) if native is True decode the blocks of each file
+                                with a process pool of this size (see VecFile#read_arrays)
         :return:
         """
         if type(input_paths) == str:
             input_paths = [input_paths]
 
+        if native:
+            # imported here, vec_file depends on this module
+            from roveranalyzer.simulators.opp.vec_file import VecFile
+
+            files = self.result_files(input_paths, recursive)
+            if any([not f.endswith(".vec") for f in files]):
+                raise ValueError("native reader only supports *.vec files")
+            frames = [
+                VecFile(f).load_df(scave_filter, pool_size=pool_size) for f in files
+            ]
+            return pd.concat(frames, axis=0, ignore_index=True)
+
         cmd = self.export_cmd(
             input_paths=input_paths,
             output="-",  # read from stdout of scavetool
@@ -1376,6 +1518,12 @@ class ScaveTool:
             options=["-F", "CSV-R"],
         )
         print(" ".join(cmd))
+        if stream:
+            frames = list(self.read_csv_stream(cmd, converters, chunksize))
+            if len(frames) == 0:
+                return pd.DataFrame()
+            return pd.concat(frames, axis=0, ignore_index=True)
+
         stdout, stderr = self.read_stdout(cmd, encoding="")
         if stdout == b"":
             logger.error("error executing scavetool")
@@ -1389,8 +1537,107 @@ class ScaveTool:
             io.BytesIO(stdout),
             encoding="utf-8",
             converters=converters.get(),
+            dtype=converters.get_dtypes(),
         )
-        return df
+        return converters.convert(df)
+
+    def iter_df_from_scave(
+        self,
+        input_paths: Union[str, List[str]],
+        scave_filter: Union[str, ScaveFilter] = None,
+        recursive=True,
+        converters=None,
+        chunksize=100_000,
+    ) -> Iterator[pd.DataFrame]:
+        """
+         Same as #load_df_from_scave but yield the data in chunks of at most chunksize rows
+         as soon as they are exported by scavetool.
+
+        :param input_paths:     List of glob patters search for *.vec and *.sca files
+        :param scave_filter:    (default: None) string based filter for scavetool see #print_filter_help for syntax
+        :param recursive:       (default: True) use recursive glob patterns
+        :param chunksize:       (default: 100_000) rows per chunk
+        :return:                Iterator of pd.DataFrame
+        """
+        if type(input_paths) == str:
+            input_paths = [input_paths]
+
+        cmd = self.export_cmd(
+            input_paths=input_paths,
+            output="-",  # read from stdout of scavetool
+            scave_filter=scave_filter,
+            recursive=recursive,
+            options=["-F", "CSV-R"],
+        )
+        print(" ".join(cmd))
+        yield from self.read_csv_stream(cmd, converters, chunksize)
+
+    def read_csv_stream(
+        self, cmd, converters=None, chunksize=100_000
+    ) -> Iterator[pd.DataFrame]:
+        """
+         Execute cmd and parse its csv output while the command is still running. Only the
+         current chunk and the pipe buffer are held in memory. If the parser is slower than the
+         command, the command blocks on the full pipe. The command is killed after self.timeout
+         seconds or if the iterator is closed early.
+
+        :param cmd:         command writing csv to stdout
+        :param converters:  (default: None) ScaveConverter to use.
+        :param chunksize:   (default: 100_000) rows per chunk
+        :return:            Iterator of pd.DataFrame
+        :raises subprocess.TimeoutExpired: after all chunks are read if the command was killed due to the timeout
+        :raises subprocess.CalledProcessError: after all chunks are read if the command failed
+        """
+        if converters is None:
+            converters = ScaveConverter()
+        with tempfile.TemporaryFile() as stderr:
+            scave_cmd = subprocess.Popen(
+                cmd,
+                cwd=os.path.curdir,
+                stdin=None,
+                env=os.environ.copy(),
+                stdout=subprocess.PIPE,
+                stderr=stderr,
+            )
+            timed_out = threading.Event()
+
+            def _kill():
+                timed_out.set()
+                scave_cmd.kill()
+
+            timer = threading.Timer(self.timeout, _kill)
+            timer.start()
+            try:
+                try:
+                    reader = pd.read_csv(
+                        scave_cmd.stdout,
+                        encoding="utf-8",
+                        converters=converters.get(),
+                        dtype=converters.get_dtypes(),
+                        chunksize=chunksize,
+                    )
+                    for df in reader:
+                        yield converters.convert(df)
+                except pd.errors.EmptyDataError:
+                    pass
+                scave_cmd.wait()
+            finally:
+                timer.cancel()
+                if scave_cmd.poll() is None:
+                    # iterator closed early or parser error
+                    scave_cmd.kill()
+                scave_cmd.wait()
+                scave_cmd.stdout.close()
+            if scave_cmd.returncode != 0:
+                stderr.seek(0)
+                err = str(stderr.read(), encoding="utf8")
+                logger.error(f"return code was {scave_cmd.returncode}")
+                logger.error(err)
+                if timed_out.is_set():
+                    raise subprocess.TimeoutExpired(cmd, self.timeout, stderr=err)
+                raise subprocess.CalledProcessError(
+                    scave_cmd.returncode, cmd, stderr=err
+                )
 
     def export_cmd(
         self,
@@ -1415,6 +1662,17 @@ class ScaveTool:
         if options is not None:
             cmd.extend(options)
 
+        opp_result_files = self.result_files(input_paths, recursive)
+        if print_selected_files:
+            print("selected files:")
+            for f in opp_result_files:
+                print(f"\t{f}")
+
+        cmd.extend(opp_result_files)
+        return cmd
+
+    def result_files(self, input_paths, recursive=True) -> List[str]:
+        """*.vec and *.sca files selected by the given paths or glob patterns."""
         if len(input_paths) == 0:
             raise ValueError("no *.vec or *.sca files given.")
 
@@ -1434,13 +1692,7 @@ class ScaveTool:
 
         log = "\n".join(opp_result_files)
         logger.info(f"found *.vec and *.sca:\n {log}")
-        if print_selected_files:
-            print("selected files:")
-            for f in opp_result_files:
-                print(f"\t{f}")
-
-        cmd.extend(opp_result_files)
-        return cmd
+        return opp_result_files
 
     def print_help(self):
         cmd = self._SCAVE_TOOL
@@ -1542,10 +1794,16 @@ class ScaveConverter:
     """
     pandas csv to DataFrame converter. Provides a dict of functions to use while
     reading csv file. The keys in the dict must match the column names.
+
+    With bulk=True the array columns are not converted cell by cell. They are read as
+    strings and parsed column wise afterwards (see #convert and RaggedArray). The cells
+    are views into one flat array per column.
     """
 
-    def __init__(self):
-        pass
+    array_columns = ("binedges", "binvalues", "vectime", "vecvalue")
+
+    def __init__(self, bulk: bool = True):
+        self.bulk = bulk
 
     def parse_if_number(self, s):
         try:
@@ -1569,6 +1827,9 @@ class ScaveConverter:
         }
 
     def get_array_parser(self):
+        if self.bulk:
+            # array columns are parsed by convert()
+            return {"attrvalue": self.parse_if_number}
         return {
             "attrvalue": self.parse_if_number,
             "binedges": self.parse_ndarray,  # histogram data
@@ -1577,6 +1838,25 @@ class ScaveConverter:
             "vecvalue": self.parse_ndarray,
         }
 
+    def get_dtypes(self):
+        """dtypes for read_csv. Array columns must be read as strings for bulk parsing."""
+        if self.bulk:
+            return {c: str for c in self.array_columns}
+        return None
+
+    def parse_ragged(self, column) -> RaggedArray:
+        return RaggedArray.from_strings(column, dtype=float)
+
+    def convert(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Parse all array columns at once (bulk mode only). Empty cells are None as with parse_ndarray."""
+        if not self.bulk:
+            return df
+        for col in self.array_columns:
+            if col in df.columns:
+                ragged = self.parse_ragged(df[col])
+                df[col] = pd.Series(ragged.to_list(), index=df.index, dtype=object)
+        return df
+
     def get(self):
         return self.get_array_parser()
 
@@ -1589,8 +1869,8 @@ class ScaveRunConverter(ScaveConverter):
     Simplify run name by providing a shorter name
     """
 
-    def __init__(self, run_short_hand="r"):
-        super().__init__()
+    def __init__(self, run_short_hand="r", bulk: bool = True):
+        super().__init__(bulk=bulk)
         self._short_hand = run_short_hand
         self.run_map = {}
         self.network_map = {}
@@ -1611,11 +1891,5 @@ class ScaveRunConverter(ScaveConverter):
         return self.get_array_parser()
 
     def get_array_parser(self):
-        return {
-            "run": self.parse_run,
-            "attrvalue": self.parse_if_number,
-            "binedges": self.parse_ndarray,  # histogram data
-            "binvalues": self.parse_ndarray,  # histogram data
-            "vectime": self.parse_ndarray,  # vector data
-            "vecvalue": self.parse_ndarray,
-        }
+        # array columns are parsed by convert() in bulk mode
+        return {"run": self.parse_run, **super().get_array_parser()}
@@ -0,0 +1,93 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from roveranalyzer.simulators.opp.accessor import OppCategories, OppFilter
+
+
+def create_scave_df(hosts=20, seed=3) -> pd.DataFrame:
+    """scavetool csv export with run attributes, scalars and vectors of two runs"""
+    rnd = np.random.default_rng(seed)
+    rows = []
+    for run in ["r_0", "r_1"]:
+        rows.append(dict(run=run, type="runattr", attrname="configname"))
+        for h in range(hosts):
+            module = f"World.pNode[{h}].app"
+            for name in ["rcvdPkLifetime:vector", "packetSent:vector(packetBytes)"]:
+                rows.append(dict(run=run, type="vector", module=module, name=name))
+            rows.append(
+                dict(run=run, type="scalar", module=module, name="rcvdPk:count")
+            )
+            rows.append(
+                dict(
+                    run=run,
+                    type="scalar",
+                    module=f"World.pNode[{h}].wlan.mac",
+                    name="packetDrop:count",
+                )
+            )
+    df = pd.DataFrame(rows)
+    df["attrvalue"] = np.nan
+    df["value"] = rnd.normal(size=df.shape[0])
+    return df
+
+
+def apply_loop(f: OppFilter, df: pd.DataFrame) -> pd.DataFrame:
+    """old implementation (each filter item applied to all rows)"""
+    bool_filter = pd.Series([True for _ in range(0, df.shape[0])], df.index)
+    for key, filter_item in f._filter_dict.items():
+        if filter_item.regex:
+            bool_filter = bool_filter & df.loc[:, key].str.match(filter_item.value)
+        elif filter_item.is_list:
+            bool_filter = bool_filter & (df.loc[:, key].isin(filter_item.value))
+        else:
+            bool_filter = bool_filter & (df.loc[:, key] == filter_item.value)
+    return df.loc[bool_filter]
+
+
+class OppFilterTest(unittest.TestCase):
+    def test_apply(self):
+        df = create_scave_df()
+        filters = [
+            df.opp.filter(),
+            df.opp.filter(data_only=False),
+            df.opp.filter().vector().module_regex(r"World\.pNode\[1..4\]\.app"),
+            df.opp.filter().scalar().module_regex(".*mac$").name_in(["rcvdPk:count"]),
+            df.opp.filter().scalar().name("packetDrop:count").run("r_1"),
+            df.opp.filter().run_regex("r_.*").module_in(["World.pNode[3].app"]),
+        ]
+        for f in filters:
+            pd.testing.assert_frame_equal(f.apply(), apply_loop(f, df), obj=repr(f))
+        # as categorical columns
+        df_cat = df.astype({"module": "category", "name": "category"})
+        f = df_cat.opp.filter().vector().module_regex(".*pNode\\[1.*")
+        pd.testing.assert_frame_equal(
+            f.apply(), apply_loop(f, df_cat), check_categorical=False
+        )
+
+    def test_encoding(self):
+        df = create_scave_df()
+        self.assertEqual(
+            df.opp.filter().scalar().module("World.misc").apply().shape[0], 0
+        )
+        # in place changes are seen by the next filter
+        df.loc[df["module"] == "World.pNode[0].app", "module"] = "World.misc"
+        self.assertEqual(
+            df.opp.filter().scalar().module("World.misc").apply().shape[0], 2
+        )
+        df.loc[df["module"] == "World.misc", "type"] = "scalar"
+        self.assertEqual(
+            df.opp.filter().scalar().module("World.misc").apply().shape[0], 6
+        )
+        df["type"] = df["type"].str.upper()
+        self.assertEqual(df.opp.filter().vector().apply().shape[0], 0)
+        # categorical columns are used without encoding
+        df_cat = df.astype({"module": "category"})
+        codes, values = OppCategories(df_cat).codes("module")
+        self.assertTrue(np.shares_memory(codes, df_cat["module"].cat.codes.to_numpy()))
+        self.assertIs(values, df_cat["module"].cat.categories)
+
+
+if __name__ == "__main__":
+    unittest.main()
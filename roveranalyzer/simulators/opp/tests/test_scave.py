@@ -0,0 +1,117 @@
+import io
+import subprocess
+import sys
+import time
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from roveranalyzer.simulators.opp.scave import (
+    ScaveConverter,
+    ScaveRunConverter,
+    ScaveTool,
+)
+
+CSV_R = """run,type,module,name,attrname,attrvalue,value,vectime,vecvalue
+r0,runattr,,,configname,vadere00,,,
+r0,vector,World.pNode[0].app,rcvdPkLifetime:vector,,,,0.1 0.2 0.3,1 2 3
+r0,vector,World.pNode[1].app,rcvdPkLifetime:vector,,,,0.5,4
+r0,scalar,World.pNode[1].app,count,,,42,,
+r0,vector,World.pNode[2].app,rcvdPkLifetime:vector,,,,1.5 2.5,5 6
+"""
+
+ENDLESS_EXPORT = """
+import sys
+sys.stdout.write("run,type,vectime,vecvalue\\n")
+while True:
+    sys.stdout.write("r0,vector,0.1 0.2,1 2\\n")
+"""
+
+
+class ReadCsvStreamTest(unittest.TestCase):
+    def test_chunks_equal_read_csv(self):
+        tool = ScaveTool()
+        cmd = [sys.executable, "-c", f"import sys; sys.stdout.write({CSV_R!r})"]
+        chunks = list(tool.read_csv_stream(cmd, chunksize=2))
+        self.assertListEqual([c.shape[0] for c in chunks], [2, 2, 1])
+        df = pd.concat(chunks, ignore_index=True)
+        expected = pd.read_csv(
+            io.StringIO(CSV_R), converters=ScaveConverter(bulk=False).get()
+        )
+        pd.testing.assert_frame_equal(
+            df[["run", "type", "value"]], expected[["run", "type", "value"]]
+        )
+        for col in ["vectime", "vecvalue"]:
+            for a, b in zip(df[col], expected[col]):
+                if b is None:
+                    self.assertIsNone(a)
+                else:
+                    np.testing.assert_array_equal(a, b)
+
+    def test_bulk_converter(self):
+        df = pd.read_csv(
+            io.StringIO(CSV_R), converters=ScaveConverter(bulk=False).get()
+        )
+        tool = ScaveTool()
+        bulk = tool.load_csv(io.StringIO(CSV_R))
+        pd.testing.assert_frame_equal(
+            bulk.drop(columns=["vectime", "vecvalue"]),
+            df.drop(columns=["vectime", "vecvalue"]),
+        )
+        for col in ["vectime", "vecvalue"]:
+            for a, b in zip(bulk[col], df[col]):
+                if b is None:
+                    self.assertIsNone(a)
+                else:
+                    np.testing.assert_array_equal(a, b)
+
+    def test_run_converter(self):
+        expected = ScaveTool().load_csv(io.StringIO(CSV_R))
+        for bulk in [True, False]:
+            converter = ScaveRunConverter(run_short_hand="r", bulk=bulk)
+            df = ScaveTool().load_csv(io.StringIO(CSV_R), converters=converter)
+            self.assertListEqual(list(df["run"].unique()), ["r_0"])
+            self.assertListEqual(converter.mapping_data_frame()["id"].tolist(), ["r0"])
+            for col in ["vectime", "vecvalue"]:
+                for a, b in zip(df[col], expected[col]):
+                    if b is None:
+                        self.assertIsNone(a)
+                    else:
+                        np.testing.assert_array_equal(a, b)
+            self.assertEqual(len(df.at[1, "vectime"]), 3)
+
+    def test_empty_output(self):
+        tool = ScaveTool()
+        cmd = [sys.executable, "-c", "pass"]
+        self.assertListEqual(list(tool.read_csv_stream(cmd)), [])
+
+    def test_close_early(self):
+        tool = ScaveTool()
+        cmd = [sys.executable, "-c", ENDLESS_EXPORT]
+        start = time.time()
+        stream = tool.read_csv_stream(cmd, chunksize=100)
+        self.assertEqual(next(stream).shape, (100, 4))
+        stream.close()  # kills the command
+        self.assertLess(time.time() - start, 10.0)
+
+    def test_timeout(self):
+        tool = ScaveTool(timeout=1)
+        cmd = [sys.executable, "-c", "import time; time.sleep(60)"]
+        start = time.time()
+        with self.assertRaises(subprocess.TimeoutExpired):
+            list(tool.read_csv_stream(cmd))
+        self.assertLess(time.time() - start, 10.0)
+
+    def test_failed_command(self):
+        tool = ScaveTool()
+        cmd = [sys.executable, "-c", "print('a,b'); print('1,2'); exit(3)"]
+        stream = tool.read_csv_stream(cmd)
+        self.assertEqual(next(stream).shape, (1, 2))
+        with self.assertRaises(subprocess.CalledProcessError) as ctx:
+            next(stream)
+        self.assertEqual(ctx.exception.returncode, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,196 @@
+import os
+import unittest
+
+import numpy as np
+import pandas as pd
+from fs.tempfs import TempFS
+
+from roveranalyzer.simulators.opp.provider.hdf.tests.utils import (
+    create_tmp_fs,
+    make_dirs,
+)
+from roveranalyzer.simulators.opp.scave import ScaveFilter, ScaveTool
+from roveranalyzer.simulators.opp.vec_file import OppPattern, ScaveFilterExpr, VecFile
+
+RUN = "General-0-20220101-10:00:00-42"
+HEADER = f"""version 3
+run {RUN}
+attr configname General
+attr repetition 0
+itervar seed 42
+"""
+VECTORS = [
+    ("World.pNode[0].app", "rcvdPkLifetime:vector", "ETV"),
+    ("World.pNode[1].app", "rcvdPkLifetime:vector", "ETV"),
+    ("World.pNode[12].app", "rcvdPkLifetime:vector", "ETV"),
+    ("World.pNode[1].app", "packetSent:vector(packetBytes)", "TV"),
+    ("World.misc", "queue length:vector", "ETV"),
+]
+
+
+def write_vec_file(path, blocks=4, seed=7, write_index=True):
+    """Text based vector file with interleaved data blocks and its *.vci index."""
+    rnd = np.random.default_rng(seed)
+    data = {}
+    vec_header = HEADER
+    vci_header = HEADER
+    for i, (module, name, cols) in enumerate(VECTORS):
+        line = f'vector {i} {module} "{name}" {cols}\nattr title "{name} title"\n'
+        vec_header += line
+        vci_header += line
+        data[i] = dict(event=[], time=[], value=[])
+
+    body = b""
+    vci_blocks = []
+    event = 0
+    for _ in range(blocks):
+        for i, (_, _, cols) in enumerate(VECTORS):
+            n = int(rnd.integers(1, 20))
+            block = ""
+            for _ in range(n):
+                event += 1
+                t = round(event * 0.01, 5)
+                v = round(float(rnd.normal()), 6)
+                data[i]["event"].append(event)
+                data[i]["time"].append(t)
+                data[i]["value"].append(v)
+                if cols == "ETV":
+                    block += f"{i}\t{event}\t{t}\t{v}\n"
+                else:
+                    block += f"{i}\t{t}\t{v}\n"
+            offset = len(vec_header.encode()) + len(body)
+            body += block.encode()
+            vci_blocks.append(
+                f"{i}\t{offset}\t{len(block)}\t0\t0\t0\t0\t{n}\t0\t0\t0\t0"
+            )
+
+    with open(path, "wb") as fd:
+        fd.write(vec_header.encode() + body)
+    if write_index:
+        size = len(vec_header.encode()) + len(body)
+        with open(f"{os.path.splitext(path)[0]}.vci", "w") as fd:
+            fd.write(f"file {size} 0\n{vci_header}")
+            fd.write("\n".join(vci_blocks) + "\n")
+    return {k: {c: np.array(v) for c, v in d.items()} for k, d in data.items()}
+
+
+class OppPatternTest(unittest.TestCase):
+    def test_pattern(self):
+        p = OppPattern("World.pNode[*].app")
+        self.assertTrue(p.match("World.pNode[12].app"))
+        self.assertFalse(p.match("World.pNode[1].app.x"))
+        self.assertTrue(OppPattern("**.app").match("World.pNode[1].app"))
+        self.assertFalse(OppPattern("*.app").match("World.pNode[1].app"))
+        p = OppPattern("World.pNode[0..9].app")
+        self.assertTrue(p.match("World.pNode[9].app"))
+        self.assertFalse(p.match("World.pNode[12].app"))
+        self.assertTrue(OppPattern("pNode{1..}").match("pNode12"))
+        self.assertTrue(OppPattern("rcvd{A-Z}*").match("rcvdPkLifetime:vector"))
+        self.assertFalse(OppPattern("rcvd{^A-Z}*").match("rcvdPkLifetime:vector"))
+        self.assertTrue(OppPattern("a\\*b?").match("a*bc"))
+
+    def test_filter_expr(self):
+        item = dict(type="vector", module="World.pNode[1].app", name="a:vector")
+        self.assertTrue(ScaveFilterExpr(None).match(item))
+        self.assertTrue(ScaveFilterExpr("module =~ **.app AND a:*").match(item))
+        self.assertTrue(
+            ScaveFilterExpr('name =~ "b:*" OR (module(**) AND NOT name =~ b)').match(
+                item
+            )
+        )
+        f = ScaveFilter().gOpen().module("**.app").gClose().AND().t_vector()
+        self.assertTrue(ScaveFilterExpr(f).match(item))
+        self.assertFalse(ScaveFilterExpr("attr:unit =~ s").match(item))
+        with self.assertRaises(ValueError):
+            ScaveFilterExpr("(name =~ a")
+
+
+class VecFileTest(unittest.TestCase):
+    fs: TempFS = create_tmp_fs("VecFileTest")
+    test_out_dir: str = os.path.join(fs.root_path, "unittest")
+
+    @classmethod
+    def setUpClass(cls):
+        make_dirs(cls.test_out_dir)
+        cls.vec_path = os.path.join(cls.test_out_dir, "vars_rep_0.vec")
+        cls.data = write_vec_file(cls.vec_path)
+        cls.no_index_path = os.path.join(cls.test_out_dir, "no_index.vec")
+        write_vec_file(cls.no_index_path, write_index=False)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.fs.close()
+
+    def test_read_arrays(self):
+        vec = VecFile(self.vec_path)
+        ret = vec.read_arrays([4, 1, 3])
+        for i in [1, 3, 4]:
+            for col in ret[i]:
+                np.testing.assert_array_equal(ret[i][col], self.data[i][col])
+        self.assertNotIn("event", ret[3])
+        self.assertEqual(ret[1]["event"].dtype, np.int64)
+
+    def test_read_arrays_parallel(self):
+        vec = VecFile(self.vec_path)
+        ids = [4, 0, 3, 2]
+        seq = vec.read_arrays(ids)
+        par = vec.read_arrays(ids, pool_size=3, pool_type="fork")
+        self.assertListEqual(list(par.keys()), ids)
+        for i in ids:
+            self.assertListEqual(list(par[i].keys()), list(seq[i].keys()))
+            for col in seq[i]:
+                self.assertEqual(par[i][col].dtype, seq[i][col].dtype)
+                np.testing.assert_array_equal(par[i][col], seq[i][col])
+
+    def test_index_scan(self):
+        vci = VecFile(self.vec_path).index
+        scan = VecFile(self.no_index_path).index
+        pd.testing.assert_frame_equal(vci.blocks, scan.blocks)
+        pd.testing.assert_frame_equal(vci.vectors, scan.vectors)
+        self.assertDictEqual(vci.attrs, scan.attrs)
+        self.assertListEqual(
+            vci.runs[RUN],
+            [
+                ("runattr", "configname", "General"),
+                ("runattr", "repetition", "0"),
+                ("itervar", "seed", "42"),
+            ],
+        )
+        self.assertEqual(vci.vectors.at[4, "name"], "queue length:vector")
+
+    def test_load_df(self):
+        f = ScaveFilter().module("World.pNode[0..9].app").AND().name("rcvd*")
+        df = VecFile(self.vec_path).load_df(f)
+        vectors = df.opp.filter().vector().apply()
+        self.assertListEqual(
+            list(vectors["module"]), ["World.pNode[0].app", "World.pNode[1].app"]
+        )
+        for (_, row), i in zip(vectors.iterrows(), [0, 1]):
+            np.testing.assert_array_equal(row["vectime"], self.data[i]["time"])
+            np.testing.assert_array_equal(row["vecvalue"], self.data[i]["value"])
+        self.assertEqual(df.opp.attr.run_itervar_dict(RUN), {"seed": "42"})
+        normalized = vectors.opp.filter().normalize_vectors(axis=0)
+        self.assertEqual(normalized.shape[0], sum(len(v) for v in vectors["vectime"]))
+
+    def test_scave_tool_native(self):
+        df = ScaveTool().load_df_from_scave(
+            os.path.join(self.test_out_dir, "*.vec"),
+            scave_filter="module =~ World.misc",
+            native=True,
+        )
+        vectors = df[df["type"] == "vector"]
+        self.assertEqual(vectors.shape[0], 2)
+        np.testing.assert_array_equal(
+            vectors["vecvalue"].iloc[0], self.data[4]["value"]
+        )
+        df_par = ScaveTool().load_df_from_scave(
+            os.path.join(self.test_out_dir, "*.vec"),
+            scave_filter="module =~ World.misc",
+            native=True,
+            pool_size=2,
+        )
+        pd.testing.assert_frame_equal(df_par, df)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from roveranalyzer.simulators.opp.accessor import Opp
+from roveranalyzer.simulators.opp.scave import ScaveConverter, ScaveData
+from roveranalyzer.utils.ragged import RaggedArray
+
+
+def create_vector_df(vectors=6, seed=4) -> pd.DataFrame:
+    """scavetool csv export with vectors of different length (array converter)"""
+    rnd = np.random.default_rng(seed)
+    rows = []
+    for k in range(vectors):
+        length = int(rnd.integers(1, 30))
+        rows.append(
+            dict(
+                run="r_0",
+                type="vector",
+                module=f"World.pNode[{k}].app",
+                name="rcvdPkLifetime:vector",
+                vectime=np.sort(rnd.uniform(0, 10, length)),
+                vecvalue=rnd.normal(size=length),
+            )
+        )
+    return pd.DataFrame(rows)
+
+
+def normalize_loop(df_vec, axis=0):
+    """old implementation (one DataFrame per vector)"""
+    frames = []
+    time_name = "time"
+    value_name = "value"
+    for idx in df_vec.index:
+        if axis == 1:
+            mod_name = f"{Opp.module_path(df_vec.loc[idx]['module'], index=1)}"
+            stat_name = df_vec.loc[idx]["name"].split(":")[0]
+            time_name = f"{mod_name}.{stat_name}.time"
+            value_name = f"{mod_name}.{stat_name}.value"
+        data = np.append(df_vec.loc[idx]["vectime"], df_vec.loc[idx]["vecvalue"])
+        data = data.reshape((-1, 2), order="F")
+        frames.append(pd.DataFrame(data, columns=[time_name, value_name]))
+    return pd.concat(frames, axis=axis, ignore_index=True if axis == 0 else False)
+
+
+def stack_loop(df, index, columns=("vectime", "vecvalue"), drop=()):
+    """old implementation (apply(pd.Series).stack() for each column)"""
+    df = df.set_index(index)
+    stacked = [df[col].apply(pd.Series).stack() for col in columns]
+    df = pd.concat(stacked, axis=1, keys=columns)
+    df.index = df.index.droplevel(level=None)
+    for c in drop:
+        if c in df.index.names:
+            df.index = df.index.droplevel(level=c)
+        elif c in df.columns:
+            df = df.drop(c, axis=1)
+    df = df.rename({"vectime": "time", "vecvalue": "data"}, axis=1)
+    return df.sort_index()
+
+
+class NormalizeVectorsTest(unittest.TestCase):
+    def test_normalize_vectors(self):
+        df = create_vector_df()
+        for axis in [0, 1]:
+            pd.testing.assert_frame_equal(
+                Opp.normalize_vectors(df, axis=axis), normalize_loop(df, axis=axis)
+            )
+
+    def test_stack_vectors(self):
+        df = create_vector_df()
+        ret = ScaveData.stack_vectors(df, index=["run", "module"], drop=["run"])
+        pd.testing.assert_frame_equal(
+            ret, stack_loop(df, index=["run", "module"], drop=["run"])
+        )
+        ret = ScaveData.stack_vectors(
+            df, index=["module"], drop=["vectime"], time_as_index=False
+        )
+        self.assertListEqual(list(ret.columns), ["data"])
+        self.assertEqual(ret.shape[0], sum(len(v) for v in df["vecvalue"]))
+
+    def test_parsed_buffer_reused(self):
+        df = pd.DataFrame(
+            {
+                "type": ["vector", "scalar", "vector"],
+                "vectime": ["0.1 0.2", None, "0.3"],
+                "vecvalue": ["1 2", None, "3"],
+            }
+        )
+        df = ScaveConverter().convert(df)
+        vectors = df[df["type"] == "vector"]
+        ragged = RaggedArray.from_arrays(vectors["vecvalue"])
+        self.assertTrue(np.shares_memory(ragged.values, vectors["vecvalue"].iloc[0]))
+        np.testing.assert_array_equal(ragged.values, [1.0, 2.0, 3.0])
+        pd.testing.assert_frame_equal(
+            Opp.normalize_vectors(vectors), normalize_loop(vectors)
+        )
+
+    def test_stack_vectors_nan(self):
+        df = create_vector_df()
+        df.at[1, "vecvalue"][0] = np.nan  # kept, time is known
+        df.at[2, "vectime"][1] = np.nan
+        df.at[2, "vecvalue"][1] = np.nan  # dropped
+        ret = ScaveData.stack_vectors(df, index=["run", "module"], drop=["run"])
+        pd.testing.assert_frame_equal(
+            ret, stack_loop(df, index=["run", "module"], drop=["run"])
+        )
+        self.assertEqual(ret.shape[0], sum(len(v) for v in df["vecvalue"]) - 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
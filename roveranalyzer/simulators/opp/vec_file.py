@@ -0,0 +1,596 @@
+""" Native reader for OMNeT++ text based vector files (*.vec) without scavetool.
+
+The *.vci index file lists the vectors of a *.vec file and the byte offset and length of
+each data block. Only the blocks of the selected vectors are read and parsed in bulk. If
+the index is missing or does not match the *.vec file it is rebuilt by scanning the
+*.vec file once.
+
+Vector selection uses the scavetool filter syntax (see ScaveFilter and ScaveTool.print_filter_help)
+and the returned data frame has the same layout as ScaveTool.load_df_from_scave (CSV-R).
+"""
+from __future__ import annotations
+
+import mmap
+import os
+import re
+import shlex
+from multiprocessing import shared_memory
+from typing import Callable, Dict, List, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from roveranalyzer.simulators.opp.scave import ScaveFilter
+from roveranalyzer.utils.logging import logger, timing
+from roveranalyzer.utils.parallel import effective_pool_size, run_kwargs_map
+
+
+class OppPattern:
+    """OMNeT++ pattern (module and name selectors of scavetool filters).
+
+    ?           any character except '.'
+    *           zero or more characters except '.'
+    **          zero or more characters
+    {a-z}       character in range a-z ({^a-z} not in range)
+    {32..255}   number in range 32..255
+    [32..255]   number in square brackets in range 32..255 (e.g. module vector index)
+    \\           takes away the special meaning of the subsequent character
+    """
+
+    _number_range = re.compile(r"(\d*)\.\.(\d*)")
+
+    def __init__(self, pattern: str) -> None:
+        self.pattern = pattern
+        self._ranges: List[Tuple[str, int | None, int | None]] = []
+        self._regex = re.compile(self._to_regex(pattern))
+
+    def _to_regex(self, p: str) -> str:
+        out = []
+        i = 0
+        while i < len(p):
+            c = p[i]
+            if c == "\\" and i + 1 < len(p):
+                out.append(re.escape(p[i + 1]))
+                i += 2
+            elif p.startswith("**", i):
+                out.append(".*")
+                i += 2
+            elif c == "*":
+                out.append(r"[^.]*")
+                i += 1
+            elif c == "?":
+                out.append(r"[^.]")
+                i += 1
+            elif c in "{[" and p.find("}" if c == "{" else "]", i) > 0:
+                end = p.find("}" if c == "{" else "]", i)
+                body = p[i + 1 : end]
+                m = self._number_range.fullmatch(body)
+                if m is not None:
+                    group = f"r{len(self._ranges)}"
+                    self._ranges.append(
+                        (
+                            group,
+                            int(m.group(1)) if m.group(1) else None,
+                            int(m.group(2)) if m.group(2) else None,
+                        )
+                    )
+                    num = f"(?P<{group}>\\d+)"
+                    out.append(num if c == "{" else f"\\[{num}\\]")
+                elif c == "{":
+                    body = body.replace("\\", "\\\\").replace("]", "\\]")
+                    out.append(f"[{body}]")
+                else:
+                    out.append(re.escape(c))
+                    end = i
+                i = end + 1
+            else:
+                out.append(re.escape(c))
+                i += 1
+        return "".join(out)
+
+    def match(self, val: str) -> bool:
+        if not isinstance(val, str):
+            return False
+        m = self._regex.fullmatch(val)
+        if m is None:
+            return False
+        for group, start, end in self._ranges:
+            n = int(m.group(group))
+            if (start is not None and n < start) or (end is not None and n > end):
+                return False
+        return True
+
+    def __repr__(self) -> str:
+        return f"OppPattern({self.pattern})"
+
+
+class ScaveFilterExpr:
+    """Evaluate scavetool filter expressions on result items (dict of field -> value).
+
+    Supported syntax: '<field> =~ <pattern>', '<field>(<pattern>)', a plain pattern
+    (matches the name), AND, OR, NOT and parentheses. Fields are run, type, module, name,
+    file and runattr:<name>, itervar:<name>, config:<name>, attr:<name>.
+    """
+
+    def __init__(self, scave_filter: Union[str, ScaveFilter, None] = None) -> None:
+        if isinstance(scave_filter, ScaveFilter):
+            scave_filter = scave_filter.str()
+        self.filter = scave_filter
+        if scave_filter is None or scave_filter.strip() == "":
+            self._expr = lambda item: True
+        else:
+            self._tokens = self._tokenize(scave_filter)
+            self._pos = 0
+            self._expr = self._parse_or()
+            if self._pos != len(self._tokens):
+                raise ValueError(
+                    f"unexpected token '{self._tokens[self._pos]}' in filter '{scave_filter}'"
+                )
+
+    @staticmethod
+    def _tokenize(val: str) -> List[str]:
+        lex = shlex.shlex(val, posix=True, punctuation_chars="()")
+        lex.whitespace_split = True
+        return list(lex)
+
+    def _peek(self, offset=0) -> str | None:
+        if self._pos + offset < len(self._tokens):
+            return self._tokens[self._pos + offset]
+        return None
+
+    def _next(self) -> str:
+        token = self._peek()
+        if token is None:
+            raise ValueError(f"unexpected end of filter '{self.filter}'")
+        self._pos += 1
+        return token
+
+    def _expect(self, token: str) -> None:
+        found = self._next()
+        if found != token:
+            raise ValueError(
+                f"expected '{token}' but found '{found}' in filter '{self.filter}'"
+            )
+
+    def _is_op(self, op: str) -> bool:
+        token = self._peek()
+        return token is not None and token.upper() == op
+
+    def _parse_or(self) -> Callable[[dict], bool]:
+        terms = [self._parse_and()]
+        while self._is_op("OR"):
+            self._next()
+            terms.append(self._parse_and())
+        if len(terms) == 1:
+            return terms[0]
+        return lambda item: any(t(item) for t in terms)
+
+    def _parse_and(self) -> Callable[[dict], bool]:
+        factors = [self._parse_not()]
+        while self._is_op("AND"):
+            self._next()
+            factors.append(self._parse_not())
+        if len(factors) == 1:
+            return factors[0]
+        return lambda item: all(f(item) for f in factors)
+
+    def _parse_not(self) -> Callable[[dict], bool]:
+        if self._is_op("NOT"):
+            self._next()
+            expr = self._parse_not()
+            return lambda item: not expr(item)
+        if self._peek() == "(":
+            self._next()
+            expr = self._parse_or()
+            self._expect(")")
+            return expr
+        token = self._next()
+        if self._peek() == "=~":
+            self._next()
+            return self._field_match(token, self._next())
+        if self._peek() == "(":
+            self._next()
+            pattern = self._next()
+            self._expect(")")
+            return self._field_match(token, pattern)
+        return self._field_match("name", token)
+
+    @staticmethod
+    def _field_match(field: str, pattern: str) -> Callable[[dict], bool]:
+        p = OppPattern(pattern)
+        return lambda item: p.match(item.get(field))
+
+    def match(self, item: dict) -> bool:
+        return self._expr(item)
+
+
+class VecIndex:
+    """Content of a *.vci file (or the header of a *.vec file).
+
+    runs:       run id -> list of (type, attrname, attrvalue) with type in
+                runattr, itervar, config, param
+    vectors:    DataFrame indexed by vectorId with columns run, module, name, columns
+                (e.g. 'ETV' for event number, time and value)
+    attrs:      vectorId -> list of (attrname, attrvalue)
+    blocks:     DataFrame with columns vectorId, offset, length, count ordered by offset
+    file_size:  size of the indexed *.vec file if known
+    """
+
+    def __init__(self) -> None:
+        self.runs: Dict[str, List[Tuple[str, str, str]]] = {}
+        self.vectors: pd.DataFrame = pd.DataFrame()
+        self.attrs: Dict[int, List[Tuple[str, str]]] = {}
+        self.blocks: pd.DataFrame = pd.DataFrame()
+        self.file_size: int | None = None
+        self._run = None
+        self._vectors: List[tuple] = []
+        self._blocks: List[tuple] = []
+        self._last_vector = None
+
+    def parse_header(self, line: str) -> bool:
+        """Parse one header line. Return False if the line is not a header line."""
+        if line[0].isdigit():
+            return False
+        tokens = shlex.split(line, posix=True)
+        if len(tokens) == 0:
+            return True
+        key = tokens[0]
+        if key == "run":
+            self._run = tokens[1]
+            self.runs.setdefault(self._run, [])
+            self._last_vector = None
+        elif key == "vector":
+            vector_id = int(tokens[1])
+            columns = tokens[4] if len(tokens) > 4 else "TV"
+            self._vectors.append((vector_id, self._run, tokens[2], tokens[3], columns))
+            self._last_vector = vector_id
+        elif key == "attr" and self._last_vector is not None:
+            self.attrs.setdefault(self._last_vector, []).append((tokens[1], tokens[2]))
+        elif key in ("attr", "itervar", "config", "param"):
+            _type = "runattr" if key == "attr" else key
+            self.runs.setdefault(self._run, []).append(
+                (_type, tokens[1], " ".join(tokens[2:]))
+            )
+        elif key == "file":
+            self.file_size = int(tokens[1])
+        # version and unknown lines are ignored
+        return True
+
+    def add_block(self, vector_id: int, offset: int, length: int, count: int):
+        self._blocks.append((vector_id, offset, length, count))
+
+    def finish(self) -> VecIndex:
+        self.vectors = pd.DataFrame(
+            self._vectors, columns=["vectorId", "run", "module", "name", "columns"]
+        ).set_index("vectorId")
+        self.blocks = pd.DataFrame(
+            self._blocks, columns=["vectorId", "offset", "length", "count"]
+        )
+        self.blocks = self.blocks.astype(np.int64).sort_values(
+            "offset", ignore_index=True
+        )
+        self._vectors, self._blocks = [], []
+        return self
+
+    @classmethod
+    def read_vci(cls, vci_path: str) -> VecIndex:
+        """Read index file. Block lines are 'vectorId offset length [firstEvent lastEvent]
+        firstTime lastTime count min max sum sqrsum'."""
+        index = cls()
+        with open(vci_path, "r", encoding="utf-8") as fd:
+            for line in fd:
+                line = line.rstrip("\n")
+                if line == "" or index.parse_header(line):
+                    continue
+                fields = line.split()
+                index.add_block(
+                    int(fields[0]), int(fields[1]), int(fields[2]), int(fields[-5])
+                )
+        return index.finish()
+
+    @classmethod
+    def scan_vec(cls, vec_path: str) -> VecIndex:
+        """Build the index by reading the whole *.vec file. Consecutive data lines of the
+        same vector form one block."""
+        index = cls()
+        offset = 0
+        block = None  # [vectorId, offset, length, count]
+        with open(vec_path, "rb") as fd:
+            for line in fd:
+                if line[:1].isdigit():
+                    vector_id = int(line.split(None, 1)[0])
+                    if block is not None and block[0] == vector_id:
+                        block[2] += len(line)
+                        block[3] += 1
+                    else:
+                        if block is not None:
+                            index.add_block(*block)
+                        block = [vector_id, offset, len(line), 1]
+                else:
+                    if block is not None:
+                        index.add_block(*block)
+                        block = None
+                    text = line.decode("utf-8").rstrip("\r\n")
+                    if text != "":
+                        index.parse_header(text)
+                offset += len(line)
+        if block is not None:
+            index.add_block(*block)
+        index.file_size = offset
+        return index.finish()
+
+
+class VecFile:
+    """
+    Read vectors of an OMNeT++ *.vec file (text format) based on its *.vci index.
+
+    Use #select to find the vectorIds matching a scavetool filter, #read_arrays to get
+    the data of some vectors as numpy arrays and #load_df to get a data frame in the
+    layout of ScaveTool.load_df_from_scave.
+    """
+
+    COLUMN_NAMES = {"E": "event", "T": "time", "V": "value"}
+
+    def __init__(self, vec_path: str, vci_path: str | None = None) -> None:
+        self.vec_path = vec_path
+        if vci_path is None:
+            vci_path = f"{os.path.splitext(vec_path)[0]}.vci"
+        self.vci_path = vci_path
+        self._index: VecIndex | None = None
+
+    @property
+    def index(self) -> VecIndex:
+        if self._index is None:
+            self._index = self._read_index()
+        return self._index
+
+    def _read_index(self) -> VecIndex:
+        if not os.path.exists(self.vec_path):
+            raise FileNotFoundError(f"vector file not found: {self.vec_path}")
+        if os.path.exists(self.vci_path):
+            index = VecIndex.read_vci(self.vci_path)
+            if index.file_size in (None, os.path.getsize(self.vec_path)):
+                return index
+            logger.warning(
+                f"index {self.vci_path} does not match {self.vec_path}. Scan vector file."
+            )
+        else:
+            logger.info(f"no index for {self.vec_path}. Scan vector file.")
+        return VecIndex.scan_vec(self.vec_path)
+
+    def _items(self, vector_id: int, row) -> dict:
+        item = {
+            "run": row.run,
+            "type": "vector",
+            "module": row.module,
+            "name": row.name,
+            "file": self.vec_path,
+        }
+        for _type, name, value in self.index.runs.get(row.run, []):
+            item[f"{_type}:{name}"] = value
+        for name, value in self.index.attrs.get(vector_id, []):
+            item[f"attr:{name}"] = value
+        return item
+
+    def select(self, scave_filter: Union[str, ScaveFilter, None] = None) -> List[int]:
+        """VectorIds matching the scavetool filter (all vectors if None)."""
+        expr = ScaveFilterExpr(scave_filter)
+        return [
+            vector_id
+            for vector_id, row in zip(
+                self.index.vectors.index, self.index.vectors.itertuples(index=False)
+            )
+            if expr.match(self._items(vector_id, row))
+        ]
+
+    @staticmethod
+    def parse_block_data(buf, vector_id: int, columns: str) -> Dict[str, np.ndarray]:
+        """Parse data lines ('vectorId<TAB>[event<TAB>]time<TAB>value') of one vector."""
+        n_cols = len(columns) + 1
+        data = np.fromstring(buf, sep=" ")
+        if data.shape[0] % n_cols != 0:
+            raise ValueError(f"malformed data lines of vector {vector_id}")
+        data = data.reshape((-1, n_cols))
+        if not (data[:, 0] == vector_id).all():
+            raise ValueError(f"data block does not belong to vector {vector_id}")
+        ret = {}
+        for idx, c in enumerate(columns, start=1):
+            col = VecFile.COLUMN_NAMES.get(c, c)
+            ret[col] = data[:, idx].astype(np.int64) if c == "E" else data[:, idx]
+        return ret
+
+    @timing
+    def read_arrays(
+        self, vector_ids: List[int], pool_size: int = 1, pool_type: str = "spawn"
+    ) -> Dict[int, Dict[str, np.ndarray]]:
+        """Read the data of the given vectors. Return vectorId -> {'event', 'time', 'value'}
+        (event only if recorded). Blocks are read in file order. If pool_size > 1 the blocks
+        are decoded by a process pool (see #_read_arrays_parallel) with the same result."""
+        if pool_size > 1 and len(vector_ids) > 0:
+            return self._read_arrays_parallel(vector_ids, pool_size, pool_type)
+        vectors = self.index.vectors
+        blocks = self.index.blocks
+        blocks = blocks[blocks["vectorId"].isin(vector_ids)]
+        chunks: Dict[int, List[bytes]] = {i: [] for i in vector_ids}
+        with open(self.vec_path, "rb") as fd:
+            for vector_id, offset, length in zip(
+                blocks["vectorId"], blocks["offset"], blocks["length"]
+            ):
+                fd.seek(offset)
+                chunks[vector_id].append(fd.read(length))
+        return {
+            i: self.parse_block_data(b"".join(chunks[i]), i, vectors.at[i, "columns"])
+            for i in vector_ids
+        }
+
+    def _read_arrays_parallel(
+        self, vector_ids: List[int], pool_size: int, pool_type: str
+    ) -> Dict[int, Dict[str, np.ndarray]]:
+        """The selected blocks are split in file order into tasks of similar byte size.
+        Each worker maps the *.vec file (mmap), parses its byte ranges and writes the rows
+        into the time, value and event columns of a shared memory buffer. The position of
+        each block in the buffer follows from the row counts of the index."""
+        vectors = self.index.vectors
+        blocks = self.index.blocks
+        blocks = blocks[blocks["vectorId"].isin(vector_ids)].reset_index(drop=True)
+        # output order: vectors as given by vector_ids, blocks of one vector in file order
+        vec_pos = blocks["vectorId"].map({v: i for i, v in enumerate(vector_ids)})
+        order = np.lexsort((blocks["offset"].to_numpy(), vec_pos.to_numpy()))
+        counts = blocks["count"].to_numpy()
+        row = np.empty(len(blocks), dtype=np.int64)
+        row[order] = np.cumsum(counts[order]) - counts[order]
+        n_rows = int(counts.sum())
+        vec_count = np.bincount(vec_pos, weights=counts, minlength=len(vector_ids))
+        vec_start = np.r_[0, np.cumsum(vec_count)].astype(np.int64)
+
+        length = blocks["length"].to_numpy()
+        n_tasks = min(len(blocks), pool_size * 4)
+        task_id = (np.cumsum(length) - length) * n_tasks // max(int(length.sum()), 1)
+        columns = blocks["vectorId"].map(vectors["columns"])
+        tasks = []
+        for t in np.unique(task_id):
+            mask = task_id == t
+            tasks.append(
+                dict(
+                    vec_path=self.vec_path,
+                    shm_name=None,
+                    n_rows=n_rows,
+                    blocks=list(
+                        zip(
+                            blocks["vectorId"][mask].tolist(),
+                            blocks["offset"][mask].tolist(),
+                            length[mask].tolist(),
+                            columns[mask].tolist(),
+                            counts[mask].tolist(),
+                            row[mask].tolist(),
+                        )
+                    ),
+                )
+            )
+
+        # columns time, value (float64) and event (int64) one after another
+        shm = shared_memory.SharedMemory(create=True, size=max(n_rows * 3 * 8, 1))
+        try:
+            for task in tasks:
+                task["shm_name"] = shm.name
+            run_kwargs_map(
+                _decode_blocks,
+                tasks,
+                pool_size=effective_pool_size(pool_size, num_tasks=len(tasks)),
+                pool_type=pool_type,
+            )
+            data = _shared_columns(shm.buf, n_rows)
+            # read back per vector, the segment is released afterwards
+            ret = {}
+            for k, i in enumerate(vector_ids):
+                rows = slice(vec_start[k], vec_start[k + 1])
+                ret[i] = {
+                    self.COLUMN_NAMES.get(c, c): np.array(data[c][rows])
+                    for c in vectors.at[i, "columns"]
+                }
+            del data
+        finally:
+            shm.close()
+            shm.unlink()
+        return ret
+
+    def load_df(
+        self,
+        scave_filter: Union[str, ScaveFilter, None] = None,
+        run_items=True,
+        pool_size: int = 1,
+        pool_type: str = "spawn",
+    ) -> pd.DataFrame:
+        """
+        Load vectors matching the scavetool filter. Same layout as ScaveTool.load_df_from_scave
+        (columns run, type, module, name, attrname, attrvalue, value, vectime, vecvalue).
+        :param scave_filter:    (default: None) scavetool filter. Select all vectors if None
+        :param run_items:       (default: True) add runattr, itervar, config and param rows
+                                of the runs of the selected vectors.
+        :param pool_size:       (default: 1) decode blocks in parallel if > 1 (see #read_arrays)
+        :param pool_type:       (default: spawn) multiprocessing start method
+        """
+        vector_ids = self.select(scave_filter)
+        data = self.read_arrays(vector_ids, pool_size=pool_size, pool_type=pool_type)
+        vectors = self.index.vectors
+        rows = []
+        if run_items:
+            for run in vectors.loc[vector_ids, "run"].unique():
+                for _type, name, value in self.index.runs.get(run, []):
+                    rows.append(
+                        dict(run=run, type=_type, attrname=name, attrvalue=value)
+                    )
+        for i in vector_ids:
+            run, module, name = vectors.loc[i, ["run", "module", "name"]]
+            for attrname, attrvalue in self.index.attrs.get(i, []):
+                rows.append(
+                    dict(
+                        run=run,
+                        type="attr",
+                        module=module,
+                        name=name,
+                        attrname=attrname,
+                        attrvalue=attrvalue,
+                    )
+                )
+            rows.append(
+                dict(
+                    run=run,
+                    type="vector",
+                    module=module,
+                    name=name,
+                    vectime=data[i]["time"],
+                    vecvalue=data[i]["value"],
+                )
+            )
+        columns = ["run", "type", "module", "name", "attrname", "attrvalue", "value"]
+        columns.extend(["vectime", "vecvalue"])
+        df = pd.DataFrame(rows, columns=columns)
+        df["value"] = df["value"].astype(float)
+        return df
+
+
+def _shared_columns(buf, n_rows: int) -> Dict[str, np.ndarray]:
+    """Column arrays T, V (float64) and E (int64) of the shared buffer used by
+    VecFile._read_arrays_parallel"""
+    return {
+        c: np.ndarray((n_rows,), dtype=dtype, buffer=buf, offset=pos * n_rows * 8)
+        for pos, (c, dtype) in enumerate(
+            [("T", np.float64), ("V", np.float64), ("E", np.int64)]
+        )
+    }
+
+
+def _decode_blocks(vec_path: str, shm_name: str, n_rows: int, blocks: List[tuple]):
+    """Worker of VecFile._read_arrays_parallel. Parse blocks (vectorId, offset, length,
+    columns, count, row) and write them to the shared column buffers (see #_shared_columns).
+    Blocks with the same columns are parsed at once."""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        out = _shared_columns(shm.buf, n_rows)
+        with open(vec_path, "rb") as fd, mmap.mmap(
+            fd.fileno(), 0, access=mmap.ACCESS_READ
+        ) as mm:
+            for columns in set(b[3] for b in blocks):
+                _blocks = [b for b in blocks if b[3] == columns]
+                ids, _, _, _, counts, rows = (np.array(c) for c in zip(*_blocks))
+                buf = b"".join(mm[b[1] : b[1] + b[2]] for b in _blocks)
+                data = np.fromstring(buf, sep=" ")
+                if data.shape[0] != counts.sum() * (len(columns) + 1):
+                    raise ValueError(
+                        f"data blocks of {vec_path} do not match the row counts of the index"
+                    )
+                data = data.reshape((-1, len(columns) + 1))
+                if not (data[:, 0] == np.repeat(ids, counts)).all():
+                    raise ValueError(
+                        f"data blocks of {vec_path} do not match the index"
+                    )
+                # row in out: start row of the block + position within the block
+                start = np.cumsum(counts) - counts
+                dest = np.repeat(rows - start, counts) + np.arange(data.shape[0])
+                for idx, c in enumerate(columns, start=1):
+                    out[c][dest] = data[:, idx]
+        del out
+    finally:
+        shm.close()
+    return len(blocks)
@@ -2,7 +2,7 @@ from roveranalyzer.utils.dataframe import LazyDataFrame
 from roveranalyzer.utils.file import *
 from roveranalyzer.utils.general import Project
 from roveranalyzer.utils.logging import levels, logger, set_format, set_level
-from roveranalyzer.utils.misc import Timer, intersect
+from roveranalyzer.utils.misc import StageTelemetry, Timer, intersect
 from roveranalyzer.utils.path import JsonPath, PathHelper, Suffix, from_pickle
 from roveranalyzer.utils.plot import PlotHelper, PlotUtil
 from roveranalyzer.utils.yesno import query_yes_no
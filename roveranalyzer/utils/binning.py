@@ -0,0 +1,254 @@
+""" Fixed width (time) binning based on numpy.
+
+Replacement for the pd.interval_range + pd.cut + groupby pattern. Bin codes are
+computed by floor division and all aggregations are based on np.bincount or
+sorted reductions. Bin edges are identical to pd.interval_range and values are
+assigned to the same bins as pd.cut would do.
+"""
+from __future__ import annotations
+
+from typing import List, Sequence
+
+import numpy as np
+import pandas as pd
+
+
+class TimeBins:
+    """Fixed width bins defined by their edges (breaks). Bins are left closed
+    [b_i, b_i+1) (or right closed (b_i, b_i+1] if closed='right')."""
+
+    def __init__(self, breaks: np.ndarray, closed: str = "left") -> None:
+        if closed not in ("left", "right"):
+            raise ValueError(f"closed must be 'left' or 'right' got {closed}")
+        self.breaks = np.asarray(breaks)
+        self.closed = closed
+
+    @classmethod
+    def from_range(
+        cls, start: float, end: float, width: float, closed: str = "left"
+    ) -> TimeBins:
+        """Same bins as pd.interval_range(start, end, freq=width, closed=closed)"""
+        breaks = pd.interval_range(start=start, end=end, freq=width).right
+        return cls(np.append(start, breaks.to_numpy()), closed=closed)
+
+    @classmethod
+    def from_breaks(
+        cls, breaks: Sequence[float], closed: str = "left", rtol: float = 1e-6
+    ) -> TimeBins:
+        """Bins from increasing equidistant breaks. Raises ValueError if the bin widths
+        differ by more than rtol (relative to the first width)."""
+        breaks = np.asarray(breaks)
+        width = np.diff(breaks.astype(float))
+        if len(width) > 0 and (
+            width[0] <= 0 or not np.allclose(width, width[0], rtol=rtol, atol=0.0)
+        ):
+            raise ValueError("breaks must be increasing with constant bin width")
+        return cls(breaks, closed=closed)
+
+    def __len__(self) -> int:
+        return max(0, len(self.breaks) - 1)
+
+    @property
+    def left(self) -> np.ndarray:
+        return self.breaks[:-1]
+
+    @property
+    def right(self) -> np.ndarray:
+        return self.breaks[1:]
+
+    def interval_index(self) -> pd.IntervalIndex:
+        return pd.IntervalIndex.from_breaks(self.breaks, closed=self.closed)
+
+    def labels(self, label: str = "left", name: str | None = "time") -> pd.Index:
+        """Index of the bins. label is one of 'left', 'right' or 'interval'. The
+        'interval' labels are ordered categories as returned by pd.cut."""
+        if label == "left":
+            return pd.Index(self.left, name=name)
+        if label == "right":
+            return pd.Index(self.right, name=name)
+        if label == "interval":
+            return pd.CategoricalIndex(self.interval_index(), ordered=True, name=name)
+        raise ValueError(f"unknown label {label}")
+
+    def codes(self, values) -> np.ndarray:
+        """Bin number of each value or -1 if the value is not part of any bin."""
+        values = np.asarray(values, dtype=float)
+        n = len(self)
+        if n == 0:
+            return np.full(values.shape, -1, dtype=np.int64)
+        start = float(self.breaks[0])
+        width = float(self.breaks[1] - self.breaks[0])
+        with np.errstate(invalid="ignore"):
+            if self.closed == "left":
+                codes = np.floor((values - start) / width)
+            else:
+                codes = np.ceil((values - start) / width) - 1
+        codes = np.nan_to_num(codes, nan=-1, posinf=-1, neginf=-1)
+        codes = np.clip(codes, -1, n).astype(np.int64)
+        # correct rounding errors of the division at the bin edges.
+        edges = self.breaks.astype(float)
+        lower = edges[np.clip(codes, 0, n)]
+        if self.closed == "left":
+            codes = np.where(values < lower, codes - 1, codes)
+            upper = edges[np.clip(codes + 1, 0, n)]
+            codes = np.where(values >= upper, codes + 1, codes)
+        else:
+            codes = np.where(values <= lower, codes - 1, codes)
+            upper = edges[np.clip(codes + 1, 0, n)]
+            codes = np.where(values > upper, codes + 1, codes)
+        codes[(codes < 0) | (codes >= n) | np.isnan(values)] = -1
+        return codes
+
+
+def _reduce_sorted(values, codes, n, ufunc) -> np.ndarray:
+    ret = np.full(n, np.nan)
+    if len(values) == 0:
+        return ret
+    order = np.argsort(codes, kind="stable")
+    _c = codes[order]
+    starts = np.flatnonzero(np.r_[True, _c[1:] != _c[:-1]])
+    ret[_c[starts]] = ufunc.reduceat(values[order], starts)
+    return ret
+
+
+def _quantile(values, codes, n, q: float) -> np.ndarray:
+    """Linear interpolated quantile (as pd.Series.quantile) for each bin."""
+    ret = np.full(n, np.nan)
+    if len(values) == 0:
+        return ret
+    order = np.lexsort((values, codes))
+    _v, _c = values[order], codes[order]
+    count = np.bincount(_c, minlength=n)
+    offset = np.r_[0, np.cumsum(count)[:-1]]
+    has = count > 0
+    pos = q * (count[has] - 1)
+    lo = np.floor(pos).astype(np.int64)
+    hi = np.ceil(pos).astype(np.int64)
+    v_lo = _v[offset[has] + lo]
+    v_hi = _v[offset[has] + hi]
+    ret[has] = v_lo + (v_hi - v_lo) * (pos - lo)
+    return ret
+
+
+def _first(values, codes, n, last=False) -> np.ndarray:
+    ret = np.full(n, np.nan)
+    if last:
+        _c, idx = np.unique(codes[::-1], return_index=True)
+        idx = len(codes) - 1 - idx
+    else:
+        _c, idx = np.unique(codes, return_index=True)
+    ret[_c] = values[idx]
+    return ret
+
+
+def _agg_name(how) -> str:
+    if isinstance(how, float):
+        return f"{how * 100:g}%"
+    return how
+
+
+def aggregate_codes(
+    values: np.ndarray, codes: np.ndarray, n: int, how: str | float
+) -> np.ndarray:
+    """Aggregate values by bin codes (0 <= code < n). Values with code -1 and NaN
+    values are ignored. Empty bins are 0 for 'sum' and 'count' and NaN otherwise.
+
+    Args:
+        values (np.ndarray): values to aggregate
+        codes (np.ndarray): bin code of each value
+        n (int): number of bins
+        how (str | float): one of sum, count, mean, std, var, min, max, first, last,
+            median or a float in [0, 1] for the quantile.
+    """
+    values = np.asarray(values, dtype=float)
+    mask = (codes >= 0) & ~np.isnan(values)
+    values, codes = values[mask], codes[mask]
+    if how == "count":
+        return np.bincount(codes, minlength=n).astype(np.int64)
+    if how == "sum":
+        return np.bincount(codes, weights=values, minlength=n)
+    if how in ("mean", "std", "var"):
+        count = np.bincount(codes, minlength=n)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.bincount(codes, weights=values, minlength=n) / count
+            if how == "mean":
+                return mean
+            sq = np.bincount(codes, weights=(values - mean[codes]) ** 2, minlength=n)
+            var = sq / (count - 1)
+        var[count < 2] = np.nan
+        return var if how == "var" else np.sqrt(var)
+    if how == "min":
+        return _reduce_sorted(values, codes, n, np.minimum)
+    if how == "max":
+        return _reduce_sorted(values, codes, n, np.maximum)
+    if how in ("first", "last"):
+        return _first(values, codes, n, last=how == "last")
+    if how == "median":
+        return _quantile(values, codes, n, 0.5)
+    if isinstance(how, float):
+        return _quantile(values, codes, n, how)
+    raise ValueError(f"unknown aggregation '{how}'")
+
+
+def bin_aggregate(
+    data: pd.Series | pd.DataFrame,
+    time,
+    bins: TimeBins,
+    how: str | float | List[str | float] = "sum",
+    by: List | None = None,
+    label: str = "left",
+    name: str = "time",
+) -> pd.Series | pd.DataFrame:
+    """Aggregate data over fixed width bins of time.
+
+    Args:
+        data (pd.Series | pd.DataFrame): data to aggregate. All columns must be numeric.
+        time (array-like): bin value (e.g. time) for each row of data
+        bins (TimeBins): bins to use
+        how (str | float | List[str | float], optional): See aggregate_codes. If a list is given for a
+            Series the result contains one column for each aggregation (quantiles are named as in describe()).
+        by (List | None, optional): additional group keys (arrays or Index objects of data length).
+            As with a categorical groupby the result contains the product of all unique keys and all bins.
+        label (str, optional): bin labels 'left', 'right' or 'interval'. Defaults to "left".
+        name (str, optional): Name of the bin index level. Defaults to "time".
+
+    Returns:
+        pd.Series | pd.DataFrame: Aggregated data with index [*by, name] containing all bins.
+    """
+    codes = bins.codes(time)
+    n = len(bins)
+    bin_index = bins.labels(label, name=name)
+    if by is not None and len(by) > 0:
+        # only keys of rows inside the bins are part of the result (as in groupby)
+        valid = codes >= 0
+        keys, uniques, names = [], [], []
+        for k in by:
+            _codes, _uniques = pd.factorize(np.asarray(k)[valid], sort=True)
+            keys.append(_codes)
+            uniques.append(_uniques)
+            names.append(getattr(k, "name", None))
+        shape = [len(u) for u in uniques] + [n]
+        flat = np.full(codes.shape, -1, dtype=np.int64)
+        flat[valid] = np.ravel_multi_index([*keys, codes[valid]], shape)
+        codes = flat
+        n = int(np.prod(shape))
+        index = pd.MultiIndex.from_product([*uniques, bin_index], names=[*names, name])
+    else:
+        index = bin_index
+
+    if isinstance(data, pd.Series):
+        if isinstance(how, list):
+            return pd.DataFrame(
+                {
+                    _agg_name(h): aggregate_codes(data.to_numpy(), codes, n, h)
+                    for h in how
+                },
+                index=index,
+            )
+        return pd.Series(
+            aggregate_codes(data.to_numpy(), codes, n, how), index=index, name=data.name
+        )
+    return pd.DataFrame(
+        {c: aggregate_codes(data[c].to_numpy(), codes, n, how) for c in data.columns},
+        index=index,
+    )
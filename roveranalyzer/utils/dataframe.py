@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from functools import partial
 from glob import escape
-from typing import Any, Callable, List, Protocol
+from typing import Any, Callable, Iterator, List, Protocol
 
 import pandas as pd
 from pandas.io.formats.style import Styler
@@ -253,6 +253,27 @@ class LazyDataFrame(object):
                 TypeError(f"Expected list or dict got {type(column_names)}")
         return df
 
+    def chunks(self, chunk_size: int, column_selection=None) -> Iterator[pd.DataFrame]:
+        """
+        Read csv in chunks of chunk_size rows. The index is not set. Use this
+        if the whole file does not fit into memory.
+        """
+        meta = self.read_meta_data()
+        with pd.read_csv(
+            filepath_or_buffer=self.path,
+            sep=meta["SEP"],
+            header=0,
+            usecols=column_selection,
+            dtype=self.dtype,
+            decimal=".",
+            index_col=False,
+            encoding="utf-8",
+            comment="#",
+            chunksize=chunk_size,
+        ) as reader:
+            for df in reader:
+                yield df
+
 
 def append_index(df: pd.DataFrame, col: str, val=None):
     if col not in df.columns and val is not None:
@@ -1,10 +1,24 @@
+from __future__ import annotations
+
 import contextlib as c
+import json
 import locale
+import os
 import time
-from typing import List
+from typing import Dict, List
 
 import numpy as np
 
+try:
+    import resource
+except ImportError:  # not available on windows
+    resource = None
+
+try:
+    import fcntl
+except ImportError:  # not available on windows
+    fcntl = None
+
 
 @c.contextmanager
 def change_locale(category=locale.LC_ALL, loc="de_DE.utf8"):
@@ -16,6 +30,38 @@ def change_locale(category=locale.LC_ALL, loc="de_DE.utf8"):
         locale.setlocale(category, old)
 
 
+@c.contextmanager
+def file_lock(path: str, shared: bool = False, blocking: bool = True):
+    """
+    Advisory inter-process lock on the file `path` (created if missing). Yields
+    True if the lock is held. If blocking is False and another process holds
+    the lock, False is yielded instead. Without fcntl (windows) this is a no-op.
+    A shared lock is skipped if the lock file cannot be created (read-only
+    directory) as no writer can take the exclusive lock either.
+    """
+    if fcntl is None:
+        yield True
+        return
+    try:
+        fd = open(path, "a")
+    except OSError:
+        if not shared:
+            raise
+        yield True
+        return
+    with fd:
+        flags = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
+        try:
+            fcntl.flock(fd, flags if blocking else flags | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+
+
 def ccw(a, b, c):
     """
     is triangle abc counter clockwise?
@@ -109,6 +155,77 @@ class Timer:
         return self
 
 
+class StageTelemetry:
+    """
+    Collect wall time, cpu time, rows in/out, bytes written and memory for named
+    stages. Repeated stages (e.g. one per node) are accumulated. Bytes written
+    are measured as size change of the file at path (if given).
+
+    Memory is reported as process_peak_rss, the high-water mark of the process
+    since its start at the end of the stage (bytes), and peak_rss_increase, the
+    largest amount by which one call of the stage raised this high-water mark.
+    A stage with peak_rss_increase of 0 did not need more memory than any stage
+    before it.
+    """
+
+    def __init__(self, path: str | None = None):
+        self.path = path
+        self.stages: Dict[str, dict] = {}
+
+    @staticmethod
+    def process_peak_rss() -> int:
+        """Peak resident set size (bytes) of this process since its start"""
+        if resource is None:
+            return -1
+        # linux reports kilobytes
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    def _file_size(self) -> int:
+        if self.path is None or not os.path.exists(self.path):
+            return 0
+        return os.path.getsize(self.path)
+
+    @c.contextmanager
+    def stage(self, name: str, rows_in: int | None = None):
+        """Measure stage. The yielded dict can be used to set rows_in/rows_out"""
+        rec = {"rows_in": rows_in, "rows_out": None}
+        size = self._file_size()
+        peak = self.process_peak_rss()
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield rec
+        finally:
+            s = self.stages.setdefault(
+                name,
+                {
+                    "calls": 0,
+                    "wall_time": 0.0,
+                    "cpu_time": 0.0,
+                    "process_peak_rss": 0,
+                    "peak_rss_increase": 0,
+                    "rows_in": 0,
+                    "rows_out": 0,
+                    "bytes_written": 0,
+                },
+            )
+            s["calls"] += 1
+            s["wall_time"] += time.perf_counter() - wall
+            s["cpu_time"] += time.process_time() - cpu
+            process_peak = self.process_peak_rss()
+            s["process_peak_rss"] = max(s["process_peak_rss"], process_peak)
+            s["peak_rss_increase"] = max(s["peak_rss_increase"], process_peak - peak)
+            s["rows_in"] += int(rec["rows_in"] or 0)
+            s["rows_out"] += int(rec["rows_out"] or 0)
+            s["bytes_written"] += self._file_size() - size
+
+    def as_dict(self) -> Dict[str, dict]:
+        return {k: dict(v) for k, v in self.stages.items()}
+
+    def to_json(self) -> str:
+        return json.dumps(self.as_dict())
+
+
 class StatsTool:
     """
     Toolset for calculating and nicely printing statistics
@@ -3,13 +3,431 @@
 """
 from __future__ import annotations
 
+import atexit
+import hashlib
+import io
+import json
+import os
+import pickle
+import shutil
+import tempfile
+import time
 import traceback
-from functools import partial
-from itertools import repeat
+from glob import glob
 from multiprocessing import get_context
-from typing import Any, List, Tuple
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+import numpy as np
+import pandas as pd
 
 from roveranalyzer.utils.logging import logger
+from roveranalyzer.utils.misc import StageTelemetry
+from roveranalyzer.utils.result_cache import normalize_arg
+
+
+def available_memory() -> int | None:
+    """Memory in bytes available for new processes without swapping or None if not
+    supported by the platform. Uses MemAvailable of /proc/meminfo which, other than
+    the free memory, includes reclaimable page cache."""
+    try:
+        with open("/proc/meminfo", "r") as fd:
+            for line in fd:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024  # kB
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def effective_pool_size(
+    pool_size: int | None = None,
+    task_memory: int | None = None,
+    num_tasks: int | None = None,
+) -> int:
+    """Number of worker processes to use.
+
+    Args:
+        pool_size (int | None, optional): Upper bound of processes. Defaults to os.cpu_count().
+        task_memory (int | None, optional): Estimated peak memory of one task in bytes. If
+            given only as many workers as fit into the available memory are used. Defaults to None.
+        num_tasks (int | None, optional): Do not use more workers than tasks. Defaults to None.
+
+    Returns:
+        int: number of processes (at least 1)
+    """
+    n = os.cpu_count() if pool_size is None else pool_size
+    if task_memory is not None and task_memory > 0:
+        mem = available_memory()
+        if mem is not None:
+            n = min(n, mem // task_memory)
+    if num_tasks is not None:
+        n = min(n, num_tasks)
+    return max(1, int(n))
+
+
+# warm pools reused across consecutive run_*_map calls (see get_pool)
+_POOLS: Dict[Tuple[str, int | None, int], Any] = {}
+
+
+def get_pool(
+    processes: int, pool_type: str = "spawn", maxtasksperchild: int | None = None
+):
+    """Return a warm pool with exactly `processes` workers. The pool is kept open
+    and reused by later calls with the same size, pool_type and maxtasksperchild. Use
+    close_pools to terminate all of them (done automatically at exit)."""
+    key = (pool_type, maxtasksperchild, processes)
+    if key not in _POOLS:
+        _POOLS[key] = get_context(pool_type).Pool(
+            processes=processes, maxtasksperchild=maxtasksperchild
+        )
+    return _POOLS[key]
+
+
+def close_pools():
+    """Close and join all warm pools created by get_pool."""
+    for pool in _POOLS.values():
+        pool.close()
+        pool.join()
+    _POOLS.clear()
+
+
+atexit.register(close_pools)
+
+
+# inputs already loaded in this process (see SharedInput.get)
+_SHARED_INPUTS: Dict[str, Any] = {}
+
+
+class SharedInput:
+    """Read-only numpy/pandas input published once as .npy files. Only this handle is
+    pickled and send to the workers. Workers memory map the arrays on first access and
+    reuse the loaded object for later tasks of the same run_*_map call.
+
+    Supported are np.ndarray, pd.Index, pd.MultiIndex, pd.Series and pd.DataFrame.
+    Numeric arrays, Index, Series and DataFrame columns are zero copy. A MultiIndex is
+    rebuilt from its level values (factorized into levels and codes), which copies the
+    data once per worker. Object arrays (e.g. strings) cannot be memory mapped and are
+    loaded as copy.
+    """
+
+    def __init__(self, obj, path: str) -> None:
+        self.path = path
+        self._count = 0
+        # content of obj, independent of the (temporary) path (see TaskCheckpoint)
+        self.digest = hashlib.sha1(repr(normalize_arg(obj)).encode()).hexdigest()
+        os.makedirs(self.path, exist_ok=True)
+        self.spec = self._encode(obj)
+        _SHARED_INPUTS[self.path] = obj
+
+    def __getstate__(self):
+        return dict(path=self.path, spec=self.spec, digest=self.digest)
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+
+    def _save(self, values) -> str:
+        values = np.asarray(values)
+        path = os.path.join(self.path, f"{self._count}.npy")
+        self._count += 1
+        np.save(path, values, allow_pickle=values.dtype == object)
+        return path
+
+    def _encode(self, obj) -> dict:
+        if isinstance(obj, pd.MultiIndex):
+            return dict(
+                kind="multiindex",
+                names=list(obj.names),
+                levels=[
+                    self._save(obj.get_level_values(i)) for i in range(obj.nlevels)
+                ],
+            )
+        if isinstance(obj, pd.Index):
+            return dict(kind="index", name=obj.name, values=self._save(obj))
+        if isinstance(obj, pd.Series):
+            return dict(
+                kind="series",
+                name=obj.name,
+                values=self._save(obj.to_numpy()),
+                index=self._encode(obj.index),
+            )
+        if isinstance(obj, pd.DataFrame):
+            return dict(
+                kind="frame",
+                values=[
+                    self._save(obj.iloc[:, i].to_numpy()) for i in range(obj.shape[1])
+                ],
+                columns=self._encode(obj.columns),
+                index=self._encode(obj.index),
+            )
+        if isinstance(obj, np.ndarray):
+            return dict(kind="ndarray", values=self._save(obj))
+        raise TypeError(f"cannot share object of type {type(obj)}")
+
+    @staticmethod
+    def _load(path: str) -> np.ndarray:
+        try:
+            return np.asarray(np.load(path, mmap_mode="r"))
+        except ValueError:
+            # object arrays cannot be memory mapped
+            return np.load(path, allow_pickle=True)
+
+    @classmethod
+    def _decode(cls, spec: dict):
+        kind = spec["kind"]
+        if kind == "multiindex":
+            return pd.MultiIndex.from_arrays(
+                [cls._load(p) for p in spec["levels"]], names=spec["names"]
+            )
+        if kind == "index":
+            return pd.Index(cls._load(spec["values"]), name=spec["name"], copy=False)
+        if kind == "series":
+            return pd.Series(
+                cls._load(spec["values"]),
+                index=cls._decode(spec["index"]),
+                name=spec["name"],
+                copy=False,
+            )
+        if kind == "frame":
+            df = pd.DataFrame(
+                {i: cls._load(p) for i, p in enumerate(spec["values"])},
+                index=cls._decode(spec["index"]),
+                copy=False,
+            )
+            df.columns = cls._decode(spec["columns"])
+            return df
+        return cls._load(spec["values"])
+
+    def get(self):
+        """Return the shared object. Loaded only once per process."""
+        if self.path not in _SHARED_INPUTS:
+            _SHARED_INPUTS[self.path] = self._decode(self.spec)
+        return _SHARED_INPUTS[self.path]
+
+
+def resolve_shared(val):
+    """Return shared object if val is a SharedInput, otherwise val itself. See
+    SharedInput for which objects are zero copy."""
+    return val.get() if isinstance(val, SharedInput) else val
+
+
+def _uses_shared_inputs(tasks: List[tuple]) -> bool:
+    for task in tasks:
+        args = task[3]
+        values = args.values() if isinstance(args, dict) else args
+        if any(isinstance(v, SharedInput) for v in values):
+            return True
+    return False
+
+
+def _clear_shared_inputs(barrier_dir: str, processes: int, timeout: float) -> int:
+    # Each worker waits until all workers of the pool executed this task (one marker
+    # file per worker) so that every worker receives exactly one of these tasks.
+    _SHARED_INPUTS.clear()
+    open(os.path.join(barrier_dir, str(os.getpid())), "w").close()
+    deadline = time.time() + timeout
+    while len(os.listdir(barrier_dir)) < processes and time.time() < deadline:
+        time.sleep(0.01)
+    return os.getpid()
+
+
+def release_shared_inputs(pool, processes: int, timeout: float = 10.0):
+    """Drop the shared inputs loaded by the workers of a warm pool."""
+    with tempfile.TemporaryDirectory(prefix="roveranalyzer_release_") as barrier_dir:
+        pool.starmap(
+            _clear_shared_inputs,
+            [(barrier_dir, processes, timeout)] * processes,
+            chunksize=1,
+        )
+
+
+class SharedInputs:
+    """Owner of SharedInput objects. All published inputs are removed on close.
+
+    Usage:
+        with SharedInputs() as shared:
+            idx = shared.publish(cell_slice)
+            run_kwargs_map(func, [dict(cell_slice=idx, ...) for ...])
+    Use resolve_shared(cell_slice) in func to access the object.
+    """
+
+    def __init__(self, base_dir: str | None = None) -> None:
+        self.path = tempfile.mkdtemp(prefix="roveranalyzer_shared_", dir=base_dir)
+        self.inputs: List[SharedInput] = []
+
+    def publish(self, obj) -> SharedInput:
+        ret = SharedInput(obj, os.path.join(self.path, str(len(self.inputs))))
+        self.inputs.append(ret)
+        return ret
+
+    def close(self):
+        for i in self.inputs:
+            _SHARED_INPUTS.pop(i.path, None)
+        self.inputs = []
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def __enter__(self) -> SharedInputs:
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def _string_itemsize(df: pd.DataFrame | pd.Series) -> dict:
+    """Length of the longest string of each (named) object column or index level."""
+    _df = df.to_frame() if isinstance(df, pd.Series) else df
+    items = [(n, _df.index.get_level_values(i)) for i, n in enumerate(_df.index.names)]
+    items.extend(_df.items())
+    ret = {}
+    for name, values in items:
+        if name is not None and values.dtype == object and len(values) > 0:
+            ret[name] = int(values.str.len().max())
+    return ret
+
+
+class ShardWriter:
+    """Picklable wrapper around `func` which writes the result of `func` to a
+    shard file (hdf, fixed format) and only returns the path of that file.
+
+    Use this with run_kwargs_map to avoid sending large results back to the parent
+    process. The shard path is passed as keyword argument 'shard_path', all other
+    keyword arguments are passed to `func`. The string lengths of the result are saved
+    as attribute 'min_itemsize' of the shard to merge shards without reading them twice.
+    """
+
+    def __init__(self, func: Callable[..., pd.DataFrame | pd.Series], key: str):
+        self.func = func
+        self.key = key
+
+    def __call__(self, shard_path: str, **kwargs) -> str:
+        df = self.func(**kwargs)
+        os.makedirs(os.path.dirname(shard_path), exist_ok=True)
+        with pd.HDFStore(shard_path, mode="w") as store:
+            store.put(self.key, df, format="fixed")
+            store.get_storer(self.key).attrs.min_itemsize = _string_itemsize(df)
+        return shard_path
+
+
+class ShardedFrame:
+    """Lazy view on the DataFrame (or Series) shards written by ShardWriter.
+
+    Shards are only read on access. Use iteration to process one shard at a time,
+    concat() to get the full frame in memory or to_hdf() to merge all shards into
+    one hdf table while only holding one shard in memory.
+
+    The post-processing options are applied to each shard during iteration and to the
+    full frame in concat(), i.e. concat() returns the same frame as concatenating the
+    in-memory results. A merged table keeps the order of the shards (sort_index is
+    only applied when reading).
+
+    Args:
+        paths (List[str]): shard files
+        key (str): hdf key of the shards
+        verify_integrity (bool, optional): Raise ValueError if shards have overlapping index values. Defaults to False.
+        sort_index (bool, optional): Sort the index. Defaults to False.
+        as_frame (bool, optional): Convert Series shards to DataFrames. Defaults to False.
+    """
+
+    def __init__(
+        self,
+        paths: List[str],
+        key: str,
+        verify_integrity: bool = False,
+        sort_index: bool = False,
+        as_frame: bool = False,
+    ):
+        self.paths: List[str] = list(paths)
+        self.key: str = key
+        self.verify_integrity: bool = verify_integrity
+        self.sort_index: bool = sort_index
+        self.as_frame: bool = as_frame
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def _options(self) -> dict:
+        return dict(
+            verify_integrity=self.verify_integrity,
+            sort_index=self.sort_index,
+            as_frame=self.as_frame,
+        )
+
+    def _post(self, df: pd.DataFrame | pd.Series) -> pd.DataFrame | pd.Series:
+        if self.as_frame and isinstance(df, pd.Series):
+            df = df.to_frame()
+        if self.sort_index:
+            df = df.sort_index()
+        return df
+
+    def __iter__(self) -> Iterator[pd.DataFrame | pd.Series]:
+        for path in self.paths:
+            yield self._post(pd.read_hdf(path, key=self.key))
+
+    def concat(self, **kwargs) -> pd.DataFrame | pd.Series:
+        """Concatenate all shards. Keyword arguments are passed to pd.concat"""
+        kwargs.setdefault("axis", 0)
+        kwargs.setdefault("verify_integrity", self.verify_integrity)
+        return self._post(pd.concat(list(self), **kwargs))
+
+    def _min_itemsize(self) -> dict:
+        # string columns in table format are fixed sized. Use the longest string
+        # of all shards so that appending later shards will not fail. Shards written
+        # by ShardWriter provide the lengths, only other files are read.
+        ret = {}
+        for path in self.paths:
+            with pd.HDFStore(path, mode="r") as store:
+                attrs = store.get_storer(self.key).attrs
+                if "min_itemsize" in attrs:
+                    itemsize = attrs.min_itemsize
+                else:
+                    itemsize = _string_itemsize(store.get(self.key))
+            for name, size in itemsize.items():
+                ret[name] = max(ret.get(name, 0), size)
+        return ret
+
+    def to_hdf(self, path: str, key: str | None = None, mode="a") -> ShardedFrame:
+        """Merge all shards into one hdf table by appending one shard at a time.
+
+        Returns:
+            ShardedFrame: View on the merged table.
+        """
+        key = self.key if key is None else key
+        min_itemsize = self._min_itemsize()
+        seen = None
+        with pd.HDFStore(path, mode=mode) as store:
+            if key in store:
+                store.remove(key)
+            for df in self:
+                if self.verify_integrity:
+                    # only the index of all shards is kept in memory
+                    overlap = df.index.has_duplicates or (
+                        seen is not None and df.index.isin(seen).any()
+                    )
+                    if overlap:
+                        if key in store:
+                            store.remove(key)
+                        raise ValueError(
+                            f"Indexes have overlapping values while merging '{key}'"
+                        )
+                    seen = df.index if seen is None else seen.append(df.index)
+                store.append(
+                    key,
+                    df,
+                    format="table",
+                    data_columns=list(min_itemsize.keys()),
+                    min_itemsize=min_itemsize if len(min_itemsize) > 0 else None,
+                    index=False,
+                )
+            store.create_table_index(key, optlevel=9, kind="full")
+        return ShardedFrame([path], key, **self._options())
+
+    def remove(self):
+        """Delete all shard files."""
+        for path in self.paths:
+            if os.path.exists(path):
+                os.remove(path)
 
 
 def kwargs_with_try(
@@ -38,6 +456,241 @@ def kwargs_with_try(
         return (False, f"Error in args: {kwargs} message: {e}\n{trace}")
 
 
+class _ArgsPickler(pickle.Pickler):
+    """Pickle SharedInput arguments by their content digest instead of the path"""
+
+    def persistent_id(self, obj):
+        if isinstance(obj, SharedInput):
+            return ("SharedInput", obj.digest)
+        return None
+
+
+class TaskCheckpoint:
+    """Pickled results of successful tasks. A re-invocation with the same function and
+    number of tasks loads these results and only executes the remaining tasks. Results
+    are keyed by task index and a hash of the function and task arguments, entries of
+    tasks with other arguments are ignored."""
+
+    def __init__(self, path: str, func, total: int) -> None:
+        self.path = path
+        self.func_name = ".".join(
+            [
+                getattr(func, "__module__", type(func).__module__),
+                getattr(func, "__qualname__", type(func).__qualname__),
+            ]
+        )
+        os.makedirs(self.path, exist_ok=True)
+        manifest = dict(func=self.func_name, total=total)
+        manifest_path = os.path.join(self.path, "manifest.json")
+        if os.path.exists(manifest_path):
+            with open(manifest_path, "r") as fd:
+                if json.load(fd) != manifest:
+                    logger.info(f"checkpoint {self.path} does not match. Remove old.")
+                    self.clear()
+        with open(manifest_path, "w") as fd:
+            json.dump(manifest, fd)
+
+    def _task_path(self, idx: int, args) -> str:
+        h = hashlib.sha1(self.func_name.encode())
+        buf = io.BytesIO()
+        _ArgsPickler(buf, protocol=4).dump(args)
+        h.update(buf.getvalue())
+        return os.path.join(self.path, f"task_{idx}_{h.hexdigest()}.pkl")
+
+    def load(self, idx: int, args) -> Tuple[bool, Any] | None:
+        path = self._task_path(idx, args)
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as fd:
+            return pickle.load(fd)
+
+    def save(self, idx: int, args, result: Tuple[bool, Any]):
+        with open(self._task_path(idx, args), "wb") as fd:
+            pickle.dump(result, fd)
+
+    def clear(self):
+        for f in glob(os.path.join(self.path, "task_*.pkl")):
+            os.remove(f)
+
+
+# set in workers of pools with task timeout (see _execute_tasks)
+_START_QUEUE = None
+
+
+def _init_worker(queue):
+    global _START_QUEUE
+    _START_QUEUE = queue
+
+
+def _indexed_with_try(task: tuple) -> Tuple[int, Tuple[bool, Any], dict]:
+    # keep task index to restore the order of unordered results
+    try_func, idx, func, args, append_args = task
+    if _START_QUEUE is not None:
+        _START_QUEUE.put((idx, time.time()))
+    start = time.perf_counter()
+    ret = try_func(func, args, append_args=append_args)
+    record = dict(
+        task=idx,
+        ok=ret[0],
+        duration=time.perf_counter() - start,
+        process_peak_rss=StageTelemetry.process_peak_rss(),
+        pid=os.getpid(),
+        error=None if ret[0] else str(ret[1]).split("\n")[0],
+    )
+    return idx, ret, record
+
+
+def _execute_tasks(
+    tasks: List[tuple],
+    processes: int,
+    pool_type: str,
+    maxtasksperchild: int | None,
+    reuse_pool: bool,
+    timeout: float | None,
+    poll_interval: float = 0.1,
+) -> Iterator[Tuple[int, Tuple[bool, Any], dict]]:
+    """Yield results of tasks as they finish. With a timeout a dedicated pool is used
+    in which the workers report the start time of each task. A task which exceeds the
+    timeout can only be stopped by terminating the pool, thus the pool is recreated and
+    all unfinished tasks are submitted again (each with the full timeout from its start).
+    """
+    if timeout is None:
+        pool = (
+            get_pool(processes, pool_type, maxtasksperchild)
+            if reuse_pool
+            else get_context(pool_type).Pool(
+                processes=processes, maxtasksperchild=maxtasksperchild
+            )
+        )
+        try:
+            yield from pool.imap_unordered(_indexed_with_try, tasks)
+        finally:
+            if not reuse_pool:
+                pool.terminate()
+                pool.join()
+            elif _uses_shared_inputs(tasks):
+                # do not keep inputs of this call in the idle workers
+                release_shared_inputs(pool, processes)
+        return
+
+    ctx = get_context(pool_type)
+    pending = {t[1]: t for t in tasks}
+    pool = None
+    try:
+        while len(pending) > 0:
+            # new queue per pool, a terminated worker may leave the old one unusable
+            queue = ctx.SimpleQueue()
+            pool = ctx.Pool(
+                processes=processes,
+                initializer=_init_worker,
+                initargs=(queue,),
+                maxtasksperchild=maxtasksperchild,
+            )
+            running = {
+                idx: pool.apply_async(_indexed_with_try, (t,))
+                for idx, t in pending.items()
+            }
+            started = {}
+            timed_out = False
+            while len(running) > 0 and not timed_out:
+                while not queue.empty():
+                    idx, start = queue.get()
+                    started[idx] = start
+                for idx, result in list(running.items()):
+                    if result.ready():
+                        del running[idx]
+                        del pending[idx]
+                        yield result.get()
+                    elif idx in started and time.time() - started[idx] > timeout:
+                        del running[idx]
+                        del pending[idx]
+                        timed_out = True
+                        msg = f"Task {idx} timed out after {timeout} seconds"
+                        logger.error(msg)
+                        yield idx, (False, msg), dict(
+                            task=idx, ok=False, duration=timeout, error=msg
+                        )
+                if not timed_out:
+                    time.sleep(poll_interval)
+            pool.terminate()
+            pool.join()
+            pool = None
+            if len(pending) > 0:
+                logger.info(f"restart pool for {len(pending)} unfinished tasks")
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+
+
+def _map_with_try(
+    try_func,
+    func,
+    args_iter,
+    pool_size: int,
+    pool_type: str,
+    append_args: bool,
+    task_memory: int | None,
+    maxtasksperchild: int | None,
+    progress: Callable[[int, int], None] | None,
+    reuse_pool: bool,
+    retries: int = 0,
+    timeout: float | None = None,
+    checkpoint: str | None = None,
+    task_metrics: List[dict] | None = None,
+    metrics_path: str | None = None,
+) -> List[Tuple[bool, Any]]:
+    """Execute try_func(func, args) for all args. Results are collected as they finish
+    and returned in the order of args_iter. Failed tasks are executed again up to
+    `retries` times."""
+    total = len(args_iter)
+    ret = [(False, "No results")] * total
+    records = []
+    ckpt = None if checkpoint is None else TaskCheckpoint(checkpoint, func, total)
+    todo = []
+    for idx in range(total):
+        result = None if ckpt is None else ckpt.load(idx, args_iter[idx])
+        if result is None:
+            todo.append(idx)
+        else:
+            ret[idx] = result
+            records.append(dict(task=idx, ok=True, attempt=0, checkpoint=True))
+    if len(todo) < total:
+        logger.info(f"loaded {total - len(todo)} of {total} results from checkpoint")
+
+    done = total - len(todo)
+    for attempt in range(retries + 1):
+        if len(todo) == 0:
+            break
+        if attempt > 0:
+            logger.info(f"retry {len(todo)} failed tasks (attempt {attempt})")
+        tasks = [(try_func, i, func, args_iter[i], append_args) for i in todo]
+        if total == 1 and timeout is None:
+            results = map(_indexed_with_try, tasks)
+        else:
+            processes = effective_pool_size(pool_size, task_memory, len(tasks))
+            logger.debug(f"execute {len(tasks)} tasks with {processes} processes")
+            results = _execute_tasks(
+                tasks, processes, pool_type, maxtasksperchild, reuse_pool, timeout
+            )
+        for idx, result, record in results:
+            ret[idx] = result
+            records.append(dict(record, attempt=attempt, checkpoint=False))
+            if result[0] and ckpt is not None:
+                ckpt.save(idx, args_iter[idx], result)
+            if result[0] or attempt == retries:
+                done += 1
+                if progress is not None:
+                    progress(done, total)
+        todo = [i for i in todo if not ret[i][0]]
+
+    if task_metrics is not None:
+        task_metrics.extend(records)
+    if metrics_path is not None:
+        pd.DataFrame.from_records(records).to_csv(metrics_path, index=False)
+    return ret
+
+
 def run_kwargs_map(
     func,
     kwargs_iter,
@@ -46,6 +699,15 @@ def run_kwargs_map(
     raise_on_error: bool = True,
     append_args: bool = False,
     filter_id: int | List[int] | None = None,
+    task_memory: int | None = None,
+    maxtasksperchild: int | None = None,
+    progress: Callable[[int, int], None] | None = None,
+    reuse_pool: bool = False,
+    retries: int = 0,
+    timeout: float | None = None,
+    checkpoint: str | None = None,
+    task_metrics: List[dict] | None = None,
+    metrics_path: str | None = None,
 ) -> List[Tuple[bool, Any]] | List[Any]:
     """Execute `func` in parallel
 
@@ -53,28 +715,50 @@ def run_kwargs_map(
         func (callable): function to be executed
         kwargs_iter (int): used keyword arguments
         pool_type: (str): Defaults to spawn
-        pool_size (int, optional): Number of processes. Defaults to 10.
+        pool_size (int, optional): Maximal number of processes. Defaults to 10.
         raise_on_error: (bool): Will raise Error after checking result. Defaults to True
         append_args: (bool): If True append kwargs to return value
         filter_id (int | List[int] | None, optional): Only run selection of runs given by kwargs_iter. Defaults to None.
+        task_memory (int | None, optional): Estimated memory (bytes) of one task. Limits the number
+            of processes to the available memory. Defaults to None.
+        maxtasksperchild (int | None, optional): Recycle worker after this many tasks. Defaults to None.
+        progress (Callable[[int, int], None] | None, optional): Called with (done, total) after each
+            finished task. Defaults to None.
+        reuse_pool (bool, optional): Use warm pool (see get_pool) instead of a new one. Defaults to False.
+        retries (int, optional): Execute failed tasks again up to this many times. Defaults to 0.
+        timeout (float | None, optional): Fail tasks running longer than timeout seconds. Defaults to None.
+        checkpoint (str | None, optional): Directory to save successful results. A re-invocation with the
+            same function and number of tasks only executes the missing tasks. Defaults to None.
+        task_metrics (List[dict] | None, optional): Append one record (task, attempt, ok, duration,
+            process_peak_rss (of the worker since its start), pid, error) per executed task to
+            this list. Defaults to None.
+        metrics_path (str | None, optional): Write task records as csv table. Defaults to None.
 
     Returns:
         List[Tuple[bool, Any]] | List[Any]: Either list of result codes and result or results only if raise_on_err is True.
 
     """
-    map = [(False, "No results")]
     if filter_id is not None:
         filter_id = [filter_id] if isinstance(filter_id, int) else filter_id
         kwargs_iter = [kwargs_iter[i] for i in list(filter_id)]
 
-    if len(kwargs_iter) == 1:
-        map = [kwargs_with_try(func, kwargs_iter[0], append_args=append_args)]
-    else:
-        with get_context(pool_type).Pool(processes=pool_size) as pool:
-            map = pool.starmap(
-                partial(kwargs_with_try, append_args=append_args),
-                zip(repeat(func), kwargs_iter),
-            )
+    map = _map_with_try(
+        kwargs_with_try,
+        func,
+        kwargs_iter,
+        pool_size=pool_size,
+        pool_type=pool_type,
+        append_args=append_args,
+        task_memory=task_memory,
+        maxtasksperchild=maxtasksperchild,
+        progress=progress,
+        reuse_pool=reuse_pool,
+        retries=retries,
+        timeout=timeout,
+        checkpoint=checkpoint,
+        task_metrics=task_metrics,
+        metrics_path=metrics_path,
+    )
 
     if raise_on_error:
         ret_data = []
@@ -127,6 +811,15 @@ def run_args_map(
     raise_on_error: bool = True,
     append_args: bool = False,
     filter_id: int | List[int] | None = None,
+    task_memory: int | None = None,
+    maxtasksperchild: int | None = None,
+    progress: Callable[[int, int], None] | None = None,
+    reuse_pool: bool = False,
+    retries: int = 0,
+    timeout: float | None = None,
+    checkpoint: str | None = None,
+    task_metrics: List[dict] | None = None,
+    metrics_path: str | None = None,
 ) -> List[Tuple(bool, Any)] | List[Any]:
     """Execute `func` in parallel with the possibility to debug single runs if
     necessary. To do this add the arg_iter index of the run(s) to debug in the
@@ -140,24 +833,41 @@ def run_args_map(
         raise_on_error: (bool): Will raise Error after checking result. Defaults to True
         append_args: (bool): If True append arguments to return value
         filter_id (int | List[int] | None, optional): Only run selection of runs given by kwargs_iter. Defaults to None.
+        task_memory (int | None, optional): See run_kwargs_map. Defaults to None.
+        maxtasksperchild (int | None, optional): See run_kwargs_map. Defaults to None.
+        progress (Callable[[int, int], None] | None, optional): See run_kwargs_map. Defaults to None.
+        reuse_pool (bool, optional): See run_kwargs_map. Defaults to False.
+        retries (int, optional): See run_kwargs_map. Defaults to 0.
+        timeout (float | None, optional): See run_kwargs_map. Defaults to None.
+        checkpoint (str | None, optional): See run_kwargs_map. Defaults to None.
+        task_metrics (List[dict] | None, optional): See run_kwargs_map. Defaults to None.
+        metrics_path (str | None, optional): See run_kwargs_map. Defaults to None.
 
     Returns:
         List[Tuple(bool, Any)] | List[Any]: Either list of result codes and result or results only if raise_on_err is True.
 
     """
-    map = [(False, "No results")]
     if filter_id is not None:
         filter_id = [filter_id] if isinstance(filter_id, int) else filter_id
         args_iter = [args_iter[i] for i in filter_id]
 
-    if len(args_iter) == 1:
-        map = [args_with_try(func, args_iter[0], append_args=append_args)]
-    else:
-        with get_context(pool_type).Pool(processes=pool_size) as pool:
-            map = pool.starmap(
-                partial(args_with_try, append_args=append_args),
-                zip(repeat(func), args_iter),
-            )
+    map = _map_with_try(
+        args_with_try,
+        func,
+        args_iter,
+        pool_size=pool_size,
+        pool_type=pool_type,
+        append_args=append_args,
+        task_memory=task_memory,
+        maxtasksperchild=maxtasksperchild,
+        progress=progress,
+        reuse_pool=reuse_pool,
+        retries=retries,
+        timeout=timeout,
+        checkpoint=checkpoint,
+        task_metrics=task_metrics,
+        metrics_path=metrics_path,
+    )
 
     if raise_on_error:
         ret_data = []
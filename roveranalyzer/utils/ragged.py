@@ -0,0 +1,129 @@
+""" Ragged arrays stored as one flat value array and row offsets.
+
+Used for the array columns (vectime, vecvalue, binedges, binvalues) of OMNeT++
+exports. All rows are parsed at once and row i is the view
+values[offsets[i]:offsets[i + 1]].
+"""
+from __future__ import annotations
+
+from typing import Iterable, Iterator, List
+
+import numpy as np
+import pandas as pd
+
+
+class RaggedArray:
+    """Rows of different length as flat values and offsets (len(offsets) == rows + 1).
+    Missing rows (None) have length 0 and are marked in the valid mask."""
+
+    def __init__(
+        self,
+        values: np.ndarray,
+        offsets: np.ndarray,
+        valid: np.ndarray | None = None,
+    ) -> None:
+        self.values = np.asarray(values)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        if len(self.offsets) == 0 or self.offsets[-1] != len(self.values):
+            raise ValueError("last offset must match the number of values")
+        self.valid = (
+            np.ones(len(self.offsets) - 1, dtype=bool)
+            if valid is None
+            else np.asarray(valid, dtype=bool)
+        )
+
+    @classmethod
+    def from_strings(cls, strings: Iterable, dtype=float) -> RaggedArray:
+        """Parse space separated numbers of all rows at once. Empty strings and NaN are missing rows."""
+        s = pd.Series(strings, dtype=object)
+        valid = (s.notna() & (s != "")).to_numpy()
+        cells = s[valid].astype(str).to_list()
+        counts = np.zeros(len(s), dtype=np.int64)
+        counts[valid] = [c.count(" ") + 1 for c in cells]
+        values = np.fromstring(" ".join(cells), sep=" ", dtype=dtype)
+        if len(values) != counts.sum():
+            # irregular separators, parse row by row
+            return cls.from_arrays(
+                [
+                    np.fromstring(c, sep=" ", dtype=dtype) if v else None
+                    for c, v in zip(s, valid)
+                ]
+            )
+        return cls(values, np.r_[0, np.cumsum(counts)], valid)
+
+    @classmethod
+    def from_arrays(cls, arrays: Iterable, dtype=None) -> RaggedArray:
+        """Create from a sequence of arrays (None for missing rows). If the arrays are
+        consecutive rows of one flat buffer (e.g. the cells created by to_list) the
+        values are a view of that buffer, otherwise the arrays are concatenated."""
+        arrays = list(arrays)
+        valid = np.array([a is not None for a in arrays], dtype=bool)
+        arrays = [np.empty(0) if a is None else np.asarray(a) for a in arrays]
+        offsets = np.r_[0, np.cumsum([len(a) for a in arrays], dtype=np.int64)]
+        if len(arrays) == 0:
+            return cls(np.empty(0, dtype=dtype or float), offsets, valid)
+        values = cls._buffer_view(arrays)
+        if values is None:
+            values = np.concatenate(arrays)
+        if dtype is not None:
+            values = values.astype(dtype, copy=False)
+        return cls(values, offsets, valid)
+
+    @staticmethod
+    def _buffer_view(arrays: List[np.ndarray]) -> np.ndarray | None:
+        """View of the common 1-d base of the arrays if they follow each other without
+        gaps, otherwise None."""
+        arrays = [a for a in arrays if len(a) > 0]
+        if len(arrays) == 0:
+            return None
+        base = arrays[0].base
+        if (
+            not isinstance(base, np.ndarray)
+            or base.ndim != 1
+            or not base.flags.c_contiguous
+        ):
+            return None
+        itemsize = base.dtype.itemsize
+        base_ptr = base.__array_interface__["data"][0]
+        start = end = None
+        for a in arrays:
+            if a.base is not base or a.dtype != base.dtype or a.strides != (itemsize,):
+                return None
+            pos = (a.__array_interface__["data"][0] - base_ptr) // itemsize
+            if end is not None and pos != end:
+                return None
+            start = pos if start is None else start
+            end = pos + len(a)
+        return base[start:end]
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    @property
+    def lengths(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    def __getitem__(self, i: int) -> np.ndarray | None:
+        if not self.valid[i]:
+            return None
+        return self.values[self.offsets[i] : self.offsets[i + 1]]
+
+    def __iter__(self) -> Iterator[np.ndarray | None]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def to_list(self) -> List[np.ndarray | None]:
+        """Views of all rows (None for missing rows)."""
+        bounds = self.offsets.tolist()
+        return [
+            self.values[start:end] if valid else None
+            for start, end, valid in zip(bounds[:-1], bounds[1:], self.valid.tolist())
+        ]
+
+    def row_index(self) -> np.ndarray:
+        """Row number of each value."""
+        return np.repeat(np.arange(len(self)), self.lengths)
+
+    def position(self) -> np.ndarray:
+        """Position of each value within its row."""
+        return np.arange(len(self.values)) - np.repeat(self.offsets[:-1], self.lengths)
@@ -0,0 +1,254 @@
+""" Content addressed result cache stored in one hdf file.
+
+The cache key of a result is derived from the function name and the normalized function
+arguments which only depend on the content of the arguments (e.g. hash of DataFrames,
+closure values of functions, size and modification time of input files). The cache is
+limited in size (least recently used results are removed first). Arguments without a
+stable content representation raise UncacheableArgument.
+
+Analysis specific types (e.g. RunMap) are supported by registering a normalizer with
+register_normalizer (see roveranalyzer.analysis.result_cache).
+"""
+from __future__ import annotations
+
+import enum
+import hashlib
+import inspect
+import os
+import time
+from functools import partial
+from glob import glob
+from typing import Any, Callable, Dict, Iterable, List
+
+import numpy as np
+import pandas as pd
+
+from roveranalyzer.utils.logging import logger
+
+
+class UncacheableArgument(TypeError):
+    """Argument without stable content representation."""
+
+
+class ResultCache:
+    """Shared result cache stored in one hdf file. Each result is saved (fixed format)
+    under its cache key. The table INDEX_KEY holds size and last access time of each
+    entry and is used for LRU eviction.
+
+    The size of the results is bounded by max_size. Hdf files do not shrink if data
+    is removed or replaced, thus the file is repacked if it is larger than
+    REPACK_FACTOR * max_size which bounds the size on disk.
+    """
+
+    INDEX_KEY = "cache_index"
+    # simulation files read by the analysis functions (e.g. data.h5, packet_loss.h5)
+    # used to detect changed simulations
+    INPUT_PATTERNS = ("*.vec", "*.vci", "*.sca", "*.csv", "*.h5")
+    # cache files which are not part of the input fingerprint
+    INPUT_EXCLUDE = ("result_cache.h5", "vector_cache.h5")
+    # default size limit 2 GiB.
+    MAX_SIZE = 2 * 1024**3
+    REPACK_FACTOR = 2
+
+    # opt-in: set ResultCache.enabled = True (or use_cache=True per call) to cache results
+    enabled: bool = False
+
+    def __init__(self, path: str, max_size: int | None = None) -> None:
+        self.path = path
+        self.max_size = self.MAX_SIZE if max_size is None else max_size
+
+    def _read_index(self, store: pd.HDFStore) -> pd.DataFrame:
+        if self.INDEX_KEY in store:
+            return store.get(self.INDEX_KEY)
+        return pd.DataFrame(
+            {
+                "func": pd.Series(dtype=str),
+                "size": pd.Series(dtype=np.int64),
+                "last_access": pd.Series(dtype=float),
+            },
+            index=pd.Index([], name="key", dtype=str),
+        )
+
+    def __contains__(self, key: str) -> bool:
+        if not os.path.exists(self.path):
+            return False
+        with pd.HDFStore(self.path, mode="r") as store:
+            return key in self._read_index(store).index
+
+    def get(self, key: str) -> pd.DataFrame | pd.Series | None:
+        """Return cached result or None if key is unknown. Updates access time."""
+        if not os.path.exists(self.path):
+            return None
+        with pd.HDFStore(self.path, mode="a") as store:
+            index = self._read_index(store)
+            if key not in index.index or f"/{key}" not in store.keys():
+                return None
+            ret = store.get(key)
+            index.loc[key, "last_access"] = time.time()
+            store.put(self.INDEX_KEY, index, format="table")
+        self._check_repack()
+        return ret
+
+    def put(self, key: str, func_name: str, result: pd.DataFrame | pd.Series):
+        """Save result under key and evict least recently used entries if the cache
+        is larger than max_size."""
+        size = int(result.memory_usage(deep=True, index=True).sum())
+        if size > self.max_size:
+            logger.info(f"result of {func_name} too large for cache ({size} bytes)")
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with pd.HDFStore(self.path, mode="a") as store:
+            index = self._read_index(store)
+            store.put(key, result, format="fixed")
+            index.loc[key] = [func_name, size, time.time()]
+            index = index.sort_values("last_access", ascending=False)
+            evict = index.index[index["size"].cumsum() > self.max_size]
+            for _key in evict:
+                logger.info(f"evict result {_key} ({index.loc[_key, 'func']})")
+                if f"/{_key}" in store.keys():
+                    store.remove(_key)
+            store.put(self.INDEX_KEY, index.drop(evict), format="table")
+        self._check_repack()
+
+    def _check_repack(self):
+        if os.path.getsize(self.path) > self.REPACK_FACTOR * self.max_size:
+            self.repack()
+
+    def repack(self):
+        """Rewrite the cache file to free the space of removed entries."""
+        if not os.path.exists(self.path):
+            return
+        tmp_path = f"{self.path}.repack"
+        with pd.HDFStore(self.path, mode="r") as src, pd.HDFStore(
+            tmp_path, mode="w"
+        ) as dst:
+            for key in src.keys():
+                fmt = "table" if key == f"/{self.INDEX_KEY}" else "fixed"
+                dst.put(key, src.get(key), format=fmt)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def file_fingerprint(
+    data_root: str,
+    patterns: Iterable[str],
+    exclude: Iterable[str] = ResultCache.INPUT_EXCLUDE,
+) -> List[tuple]:
+    """Name, size and modification time of all files in data_root matching the patterns
+    (except files named in exclude)."""
+    ret = []
+    for pattern in patterns:
+        for path in sorted(glob(os.path.join(data_root, pattern))):
+            if os.path.basename(path) in exclude:
+                continue
+            stat = os.stat(path)
+            ret.append((os.path.basename(path), stat.st_size, stat.st_mtime_ns))
+    return ret
+
+
+def _hash_pandas(obj: pd.Index | pd.DataFrame | pd.Series) -> str:
+    if isinstance(obj, pd.Index):
+        names = list(obj.names)
+        obj = obj.to_frame(index=False)
+    else:
+        names = [
+            list(obj.index.names),
+            list(obj.columns) if isinstance(obj, pd.DataFrame) else obj.name,
+        ]
+    h = hashlib.sha1(str(names).encode())
+    h.update(pd.util.hash_pandas_object(obj, index=True).values.tobytes())
+    return h.hexdigest()
+
+
+# type specific normalizers func(val, normalize) -> representation (see register_normalizer)
+_NORMALIZERS: Dict[type, Callable[[Any, Callable[[Any], Any]], Any]] = {}
+
+
+def register_normalizer(cls: type, func: Callable[[Any, Callable[[Any], Any]], Any]):
+    """Use func(val, normalize) to create the representation of instances of cls.
+    normalize must be used for nested values."""
+    _NORMALIZERS[cls] = func
+
+
+def normalize_arg(val: Any, _seen=()):
+    """Create a stable (repr-able) representation of a function argument which only
+    depends on the content of the argument.
+
+    Raises:
+        UncacheableArgument: if the argument (or a part of it) has no stable representation.
+    """
+    if id(val) in _seen:
+        raise UncacheableArgument(f"recursive argument {type(val).__qualname__}")
+    _n = lambda x: normalize_arg(x, _seen + (id(val),))  # noqa: E731
+    for cls, func in _NORMALIZERS.items():
+        if isinstance(val, cls):
+            return func(val, _n)
+    if val is None or isinstance(val, (bool, int, float, str, bytes)):
+        return val
+    if isinstance(val, enum.Enum):
+        return (type(val).__qualname__, val.name)
+    if isinstance(val, slice):
+        return ("slice", _n(val.start), _n(val.stop), _n(val.step))
+    if isinstance(val, (list, tuple)):
+        return [_n(v) for v in val]
+    if isinstance(val, (set, frozenset)):
+        return sorted([_n(v) for v in val], key=repr)
+    if isinstance(val, dict):
+        return sorted([(repr(_n(k)), _n(v)) for k, v in val.items()])
+    if isinstance(val, (pd.Index, pd.DataFrame, pd.Series)):
+        return (type(val).__name__, _hash_pandas(val))
+    if isinstance(val, np.ndarray) and val.dtype == object:
+        return (
+            "ndarray",
+            str(val.dtype),
+            val.shape,
+            hashlib.sha1(pd.util.hash_array(val.ravel()).tobytes()).hexdigest(),
+        )
+    if isinstance(val, np.ndarray):
+        return (
+            "ndarray",
+            str(val.dtype),
+            val.shape,
+            hashlib.sha1(np.ascontiguousarray(val)).hexdigest(),
+        )
+    if isinstance(val, np.generic):
+        return val.item()
+    if isinstance(val, partial):
+        return ("partial", _n(val.func), _n(val.args), _n(val.keywords))
+    if inspect.ismethod(val):
+        return ("method", _n(val.__func__), _n(val.__self__))
+    if inspect.isfunction(val):
+        code = val.__code__
+        try:
+            closure = [c.cell_contents for c in val.__closure__ or ()]
+        except ValueError:  # empty cell
+            raise UncacheableArgument(f"closure of {val.__qualname__} not bound")
+        return (
+            "func",
+            val.__module__,
+            val.__qualname__,
+            hashlib.sha1(code.co_code).hexdigest(),
+            repr(code.co_consts),
+            _n(closure),
+            _n(val.__defaults__),
+            _n(val.__kwdefaults__),
+        )
+    if inspect.isclass(val) or inspect.isbuiltin(val):
+        return ("type", getattr(val, "__module__", None), val.__qualname__)
+    if hasattr(val, "__dict__"):
+        # objects such as FrameConsumers
+        return (type(val).__module__, type(val).__qualname__, _n(vars(val)))
+    raise UncacheableArgument(
+        f"no stable representation for argument of type {type(val).__qualname__}"
+    )
+
+
+def cache_key(func_name: str, arguments: dict) -> str:
+    """Key of a function call based on the normalized arguments (see normalize_arg)."""
+    arguments = sorted([(k, normalize_arg(v)) for k, v in arguments.items()])
+    h = hashlib.sha1(func_name.encode())
+    h.update(repr(arguments).encode())
+    return f"r_{h.hexdigest()}"
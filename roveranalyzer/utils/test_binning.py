@@ -0,0 +1,69 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from roveranalyzer.utils.binning import TimeBins, bin_aggregate
+
+
+class TimeBinsTest(unittest.TestCase):
+    def setUp(self) -> None:
+        rnd = np.random.default_rng(7)
+        # random values, all bin edges and missing values
+        self.time = np.concatenate(
+            [rnd.uniform(-1.0, 2.0, 2000), np.arange(0.0, 0.8, 0.1), [np.nan]]
+        )
+        self.data = pd.Series(rnd.normal(size=len(self.time)), name="value")
+        self.data[::9] = np.nan
+
+    def test_codes_equal_cut(self):
+        for closed in ["left", "right"]:
+            interval = pd.interval_range(0.0, 0.7, freq=0.1, closed=closed)
+            bins = TimeBins.from_range(0.0, 0.7, 0.1, closed=closed)
+            self.assertEqual(len(bins), len(interval))
+            np.testing.assert_array_equal(
+                bins.codes(self.time), pd.cut(self.time, interval).codes
+            )
+
+    def test_from_breaks(self):
+        bins = TimeBins.from_breaks(np.arange(0.0, 0.8, 0.1), closed="right")
+        self.assertEqual(len(bins), 7)
+        for breaks in [[0.0, 1.0, 3.0], [2.0, 1.0, 0.0], [0.0, 0.0]]:
+            with self.assertRaises(ValueError):
+                TimeBins.from_breaks(breaks)
+
+    def test_aggregate_equal_groupby(self):
+        interval = pd.interval_range(0.0, 0.7, freq=0.1, closed="left")
+        bins = TimeBins.from_range(0.0, 0.7, 0.1)
+        grouped = self.data.groupby(pd.cut(self.time, interval))
+        for how in ["sum", "count", "mean", "std", "min", "max", "first", "median"]:
+            ret = bin_aggregate(self.data, self.time, bins, how=how, label="interval")
+            np.testing.assert_allclose(
+                ret.to_numpy(dtype=float),
+                getattr(grouped, how)().to_numpy(dtype=float),
+                err_msg=how,
+            )
+        ret = bin_aggregate(self.data, self.time, bins, how=[0.25, 0.75])
+        self.assertListEqual(list(ret.columns), ["25%", "75%"])
+        np.testing.assert_allclose(
+            ret["75%"].to_numpy(), grouped.quantile(0.75).to_numpy()
+        )
+
+    def test_aggregate_by(self):
+        df = pd.DataFrame(
+            {"app": ["b", "a", "a", "b"], "value": [1.0, 2.0, 3.0, 4.0]},
+            index=pd.Index([0.5, 0.5, 2.5, 5.0], name="time"),
+        )
+        ret = bin_aggregate(
+            df[["value"]],
+            df.index,
+            TimeBins.from_range(0.0, 3.0, 1.0),
+            by=[df["app"]],
+        )
+        # all bins for each key, values outside of the bins are ignored
+        self.assertListEqual(ret.index.names, ["app", "time"])
+        self.assertListEqual(ret["value"].tolist(), [2.0, 0.0, 3.0, 1.0, 0.0, 0.0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,337 @@
+import os
+import time
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+from fs.tempfs import TempFS
+
+from roveranalyzer.simulators.opp.provider.hdf.tests.utils import (
+    create_tmp_fs,
+    make_dirs,
+)
+from roveranalyzer.utils import parallel
+from roveranalyzer.utils.parallel import (
+    ShardedFrame,
+    ShardWriter,
+    SharedInputs,
+    available_memory,
+    close_pools,
+    effective_pool_size,
+    get_pool,
+    resolve_shared,
+    run_args_map,
+    run_kwargs_map,
+)
+
+
+def flaky_task(marker: str, fail: bool = True) -> int:
+    """Fails on first call if fail is set (marker file does not exist)."""
+    if fail and not os.path.exists(marker):
+        with open(marker, "w") as fd:
+            fd.write("failed")
+        raise RuntimeError("first call fails")
+    return os.getpid()
+
+
+def shared_sum(data, offset: float) -> float:
+    df = resolve_shared(data)
+    return (
+        float(df["a"].sum() + df.index.get_level_values("x").to_numpy().sum()) + offset
+    )
+
+
+def flaky_shared_task(data, marker: str, fail: bool = True) -> int:
+    resolve_shared(data)
+    return flaky_task(marker, fail)
+
+
+def shared_count() -> int:
+    return len(parallel._SHARED_INPUTS)
+
+
+def group_result(group_name: str, n: int = 3) -> pd.Series:
+    idx = pd.MultiIndex.from_product(
+        [[group_name], np.arange(n, dtype=float)], names=["sim", "simtime"]
+    )
+    return pd.Series(np.arange(n, dtype=float), index=idx, name="cell_mse")
+
+
+class ShardedFrameTest(unittest.TestCase):
+    fs: TempFS = create_tmp_fs("ShardedFrameTest")
+    test_out_dir: str = os.path.join(fs.root_path, "unittest")
+
+    @classmethod
+    def setUpClass(cls):
+        make_dirs(cls.test_out_dir)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.fs.close()
+
+    def test_shards_merge(self):
+        groups = ["a", "group_with_long_name"]
+        paths = run_kwargs_map(
+            ShardWriter(group_result, key="cell_mse"),
+            [
+                dict(
+                    shard_path=os.path.join(self.test_out_dir, "shards", f"{g}.h5"),
+                    group_name=g,
+                )
+                for g in groups
+            ],
+            pool_size=2,
+            pool_type="fork",
+        )
+        shards = ShardedFrame(paths, key="cell_mse")
+        self.assertEqual(len(shards), 2)
+        expected = pd.concat([group_result(g) for g in groups], axis=0)
+        pd.testing.assert_series_equal(shards.concat(), expected)
+        # post-processing equal to the in-memory result
+        post = ShardedFrame(
+            paths[::-1], key="cell_mse", verify_integrity=True, sort_index=True
+        )
+        pd.testing.assert_series_equal(post.concat(), expected.sort_index())
+        overlapping = ShardedFrame(paths * 2, key="cell_mse", verify_integrity=True)
+        with self.assertRaises(ValueError):
+            overlapping.concat()
+        with self.assertRaises(ValueError):
+            overlapping.to_hdf(os.path.join(self.test_out_dir, "overlap.h5"))
+
+        # string index levels of different length must be appendable
+        merged = shards.to_hdf(os.path.join(self.test_out_dir, "merged.h5"))
+        shards.remove()
+        self.assertFalse(any(os.path.exists(p) for p in paths))
+        pd.testing.assert_series_equal(merged.concat(), expected)
+
+
+class SharedInputsTest(unittest.TestCase):
+    def test_publish(self):
+        idx = pd.MultiIndex.from_product(
+            [np.arange(4, dtype=float), [1.0, 2.0]], names=["x", "y"]
+        )
+        df = pd.DataFrame(
+            {"a": np.arange(8, dtype=float), "lbl": list("abcdefgh")}, index=idx
+        )
+        with SharedInputs() as shared:
+            items = [shared.publish(o) for o in [df, idx, df["a"], df["a"].to_numpy()]]
+            for item in items:
+                # decode as a worker would do (process local object not known)
+                decoded = item._decode(item.spec)
+                if isinstance(decoded, np.ndarray):
+                    np.testing.assert_array_equal(decoded, df["a"].to_numpy())
+                elif isinstance(decoded, pd.Index):
+                    pd.testing.assert_index_equal(decoded, idx)
+                elif isinstance(decoded, pd.Series):
+                    pd.testing.assert_series_equal(decoded, df["a"])
+                else:
+                    pd.testing.assert_frame_equal(decoded, df)
+            ret = run_kwargs_map(
+                shared_sum,
+                [dict(data=items[0], offset=o) for o in [0.0, 1.0]],
+                pool_size=2,
+                pool_type="spawn",
+            )
+            self.assertListEqual(ret, [40.0, 41.0])
+            path = shared.path
+        self.assertFalse(os.path.exists(path))
+
+    def test_release_in_warm_pool(self):
+        close_pools()
+        df = pd.DataFrame(
+            {"a": np.arange(4, dtype=float)},
+            index=pd.Index(np.arange(4, dtype=float), name="x"),
+        )
+        with SharedInputs() as shared:
+            data = shared.publish(df)
+            ret = run_kwargs_map(
+                shared_sum,
+                [dict(data=data, offset=o) for o in [0.0, 1.0, 2.0]],
+                pool_size=2,
+                pool_type="fork",
+                reuse_pool=True,
+            )
+            self.assertListEqual(ret, [12.0, 13.0, 14.0])
+            counts = run_args_map(
+                shared_count, [()] * 4, pool_size=2, pool_type="fork", reuse_pool=True
+            )
+            self.assertListEqual(counts, [0] * 4)
+        close_pools()
+
+
+class AdaptivePoolTest(unittest.TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        close_pools()
+
+    def test_effective_pool_size(self):
+        self.assertEqual(effective_pool_size(8, num_tasks=3), 3)
+        self.assertEqual(effective_pool_size(8, task_memory=2**62), 1)
+        self.assertEqual(effective_pool_size(0), 1)
+
+    def test_available_memory(self):
+        meminfo = "MemTotal:   8192 kB\nMemFree:   1024 kB\nMemAvailable:   4096 kB\n"
+        with mock.patch("builtins.open", mock.mock_open(read_data=meminfo)):
+            self.assertEqual(available_memory(), 4096 * 1024)
+
+    def test_ordered_results_with_warm_pool(self):
+        progress = []
+        args = [(i, 3) for i in range(7)]
+        ret = run_args_map(
+            divmod,
+            args,
+            pool_size=2,
+            pool_type="fork",
+            progress=lambda done, total: progress.append((done, total)),
+            reuse_pool=True,
+        )
+        self.assertListEqual(ret, [divmod(*a) for a in args])
+        self.assertListEqual(progress, [(i, 7) for i in range(1, 8)])
+        pool = get_pool(2, "fork")
+        ret = run_args_map(
+            divmod, args[:2], pool_size=2, pool_type="fork", reuse_pool=True
+        )
+        self.assertListEqual(ret, [divmod(*a) for a in args[:2]])
+        self.assertIs(get_pool(2, "fork"), pool)
+        # smaller pools are not served by larger ones
+        self.assertEqual(get_pool(1, "fork")._processes, 1)
+
+
+class FaultTolerantMapTest(unittest.TestCase):
+    fs: TempFS = create_tmp_fs("FaultTolerantMapTest")
+    test_out_dir: str = os.path.join(fs.root_path, "unittest")
+
+    @classmethod
+    def setUpClass(cls):
+        make_dirs(cls.test_out_dir)
+
+    @classmethod
+    def tearDownClass(cls):
+        close_pools()
+        cls.fs.close()
+
+    def kwargs(self, name, n=3):
+        return [
+            dict(marker=os.path.join(self.test_out_dir, f"{name}_{i}"), fail=i == 1)
+            for i in range(n)
+        ]
+
+    def test_retries_and_metrics(self):
+        metrics = []
+        metrics_path = os.path.join(self.test_out_dir, "metrics.csv")
+        ret = run_kwargs_map(
+            flaky_task,
+            self.kwargs("retry"),
+            pool_size=2,
+            pool_type="fork",
+            retries=1,
+            task_metrics=metrics,
+            metrics_path=metrics_path,
+            reuse_pool=True,
+        )
+        self.assertEqual(len(ret), 3)
+        df = pd.read_csv(metrics_path)
+        self.assertEqual(df.shape[0], 4)
+        self.assertListEqual(df["attempt"].tolist(), [r["attempt"] for r in metrics])
+        failed = df[~df["ok"]]
+        self.assertListEqual(failed["task"].tolist(), [1])
+        self.assertTrue(failed["error"].str.contains("first call fails").all())
+        self.assertTrue((df["duration"] >= 0).all())
+
+    def test_checkpoint(self):
+        checkpoint = os.path.join(self.test_out_dir, "checkpoint")
+        kwargs = self.kwargs("ckpt")
+        with self.assertRaises(ValueError):
+            run_kwargs_map(
+                flaky_task, kwargs, pool_size=2, pool_type="fork", checkpoint=checkpoint
+            )
+        metrics = []
+        ret = run_kwargs_map(
+            flaky_task,
+            kwargs,
+            pool_size=2,
+            pool_type="fork",
+            checkpoint=checkpoint,
+            task_metrics=metrics,
+        )
+        self.assertEqual(len(ret), 3)
+        executed = [m["task"] for m in metrics if not m["checkpoint"]]
+        self.assertListEqual(executed, [1])
+        # same number of tasks but other arguments
+        kwargs[2]["fail"] = True
+        metrics = []
+        run_kwargs_map(
+            flaky_task,
+            kwargs,
+            pool_size=2,
+            pool_type="fork",
+            checkpoint=checkpoint,
+            task_metrics=metrics,
+            raise_on_error=False,
+        )
+        executed = [m["task"] for m in metrics if not m["checkpoint"]]
+        self.assertListEqual(executed, [2])
+
+    def test_checkpoint_shared_inputs(self):
+        checkpoint = os.path.join(self.test_out_dir, "checkpoint_shared")
+        kwargs = self.kwargs("ckpt_shared")
+
+        def run(values):
+            # new temporary directory for the shared inputs of each run
+            metrics = []
+            with SharedInputs() as shared:
+                data = shared.publish(pd.DataFrame({"a": values}))
+                run_kwargs_map(
+                    flaky_shared_task,
+                    [dict(data=data, **kw) for kw in kwargs],
+                    pool_size=2,
+                    pool_type="fork",
+                    checkpoint=checkpoint,
+                    task_metrics=metrics,
+                )
+            return [m["task"] for m in metrics if not m["checkpoint"]]
+
+        with self.assertRaises(ValueError):
+            run(np.arange(4.0))
+        self.assertListEqual(run(np.arange(4.0)), [1])
+        # other content of the shared input
+        self.assertListEqual(run(np.arange(5.0)), [0, 1, 2])
+
+    def test_timeout(self):
+        metrics = []
+        start = time.perf_counter()
+        ret = run_args_map(
+            time.sleep,
+            [(0.0,), (60.0,)],
+            pool_size=2,
+            pool_type="fork",
+            timeout=2.0,
+            raise_on_error=False,
+            task_metrics=metrics,
+        )
+        self.assertLess(time.perf_counter() - start, 30.0)
+        self.assertTrue(ret[0][0])
+        self.assertFalse(ret[1][0])
+        self.assertIn("timed out", ret[1][1])
+
+    def test_timeout_single_worker(self):
+        # queued tasks must not be blocked by a hung task
+        start = time.perf_counter()
+        ret = run_args_map(
+            time.sleep,
+            [(60.0,), (0.0,), (0.1,)],
+            pool_size=1,
+            pool_type="fork",
+            timeout=1.0,
+            raise_on_error=False,
+        )
+        self.assertLess(time.perf_counter() - start, 30.0)
+        self.assertFalse(ret[0][0])
+        self.assertIn("timed out", ret[0][1])
+        self.assertTrue(ret[1][0])
+        self.assertTrue(ret[2][0])
+
+
+if __name__ == "__main__":
+    unittest.main()
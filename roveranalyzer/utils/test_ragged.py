@@ -0,0 +1,44 @@
+import unittest
+
+import numpy as np
+
+from roveranalyzer.utils.ragged import RaggedArray
+
+
+class RaggedArrayTest(unittest.TestCase):
+    def test_from_strings(self):
+        r = RaggedArray.from_strings(["1 2 3", None, "", "4", "5.5 6e1"])
+        np.testing.assert_array_equal(r.values, [1, 2, 3, 4, 5.5, 60])
+        np.testing.assert_array_equal(r.offsets, [0, 3, 3, 3, 4, 6])
+        np.testing.assert_array_equal(r.lengths, [3, 0, 0, 1, 2])
+        self.assertIsNone(r[1])
+        self.assertIsNone(r[2])
+        np.testing.assert_array_equal(r[4], [5.5, 60])
+        np.testing.assert_array_equal(r.row_index(), [0, 0, 0, 3, 4, 4])
+        np.testing.assert_array_equal(r.position(), [0, 1, 2, 0, 0, 1])
+
+    def test_irregular_separator(self):
+        r = RaggedArray.from_strings(["1  2 ", "3"])
+        np.testing.assert_array_equal(r.values, [1, 2, 3])
+        np.testing.assert_array_equal(r.lengths, [2, 1])
+
+    def test_from_arrays(self):
+        r = RaggedArray.from_strings(["1 2 3", None, "4", "5 6"])
+        views = RaggedArray.from_arrays(r.to_list())
+        # cells of one buffer are not copied
+        self.assertTrue(np.shares_memory(views.values, r.values))
+        np.testing.assert_array_equal(views.values, r.values)
+        subset = RaggedArray.from_arrays(r.to_list()[2:], dtype=float)
+        self.assertTrue(np.shares_memory(subset.values, r.values))
+        np.testing.assert_array_equal(subset.values, [4, 5, 6])
+        np.testing.assert_array_equal(views.offsets, r.offsets)
+        np.testing.assert_array_equal(views.valid, r.valid)
+        other = RaggedArray.from_arrays(r.to_list()[::-1])
+        self.assertFalse(np.shares_memory(other.values, r.values))
+        np.testing.assert_array_equal(other.values, [5, 6, 4, 1, 2, 3])
+        self.assertIsNone(other[2])
+        self.assertEqual(len(RaggedArray.from_arrays([], dtype=float)), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import os
+import unittest
+from functools import partial
+
+import numpy as np
+import pandas as pd
+from fs.tempfs import TempFS
+
+from roveranalyzer.simulators.opp.provider.hdf.tests.utils import (
+    create_tmp_fs,
+    make_dirs,
+)
+from roveranalyzer.utils.result_cache import (
+    ResultCache,
+    UncacheableArgument,
+    normalize_arg,
+)
+
+
+def scale(df, factor=1.0):
+    return df * factor
+
+
+def make_scale(factor):
+    def _scale(df):
+        return df * factor
+
+    return _scale
+
+
+class ResultCacheTest(unittest.TestCase):
+    fs: TempFS = create_tmp_fs("UtilsResultCacheTest")
+    test_out_dir: str = os.path.join(fs.root_path, "unittest")
+
+    @classmethod
+    def setUpClass(cls):
+        make_dirs(cls.test_out_dir)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.fs.close()
+
+    def test_normalize_callables(self):
+        self.assertNotEqual(
+            normalize_arg(partial(scale, factor=2.0)),
+            normalize_arg(partial(scale, factor=3.0)),
+        )
+        self.assertEqual(
+            normalize_arg(partial(scale, factor=2.0)),
+            normalize_arg(partial(scale, factor=2.0)),
+        )
+        self.assertNotEqual(normalize_arg(make_scale(2)), normalize_arg(make_scale(3)))
+        self.assertEqual(normalize_arg(make_scale(2)), normalize_arg(make_scale(2)))
+        with self.assertRaises(UncacheableArgument):
+            normalize_arg(make_scale(iter([1])))
+
+    def test_normalize_object_array(self):
+        # content, not the object pointers, is hashed
+        a = np.array(["".join(["a", "b"]), "c"], dtype=object)
+        b = np.array(["ab", "c"], dtype=object)
+        self.assertEqual(normalize_arg(a), normalize_arg(b))
+        self.assertNotEqual(normalize_arg(a), normalize_arg(b[::-1].copy()))
+
+    def test_lru_eviction(self):
+        cache = ResultCache(os.path.join(self.test_out_dir, "lru.h5"), max_size=300)
+        df = pd.DataFrame({"val": np.arange(10, dtype=float)})  # 208 bytes
+        cache.put("r_a", "f", df)
+        cache.put("r_b", "f", df)
+        self.assertNotIn("r_a", cache)
+        self.assertIn("r_b", cache)
+        pd.testing.assert_frame_equal(cache.get("r_b"), df)
+
+    def test_repack(self):
+        path = os.path.join(self.test_out_dir, "repack.h5")
+        cache = ResultCache(path, max_size=200_000)
+        df = pd.DataFrame({"val": np.arange(2_000, dtype=float)})  # 16 kB
+        for i in range(40):
+            cache.put(f"r_{i}", "f", df)
+            cache.get(f"r_{i}")
+            self.assertLess(os.path.getsize(path), 3 * cache.max_size)
+        self.assertIn("r_39", cache)
+        self.assertNotIn("r_0", cache)
+
+
+if __name__ == "__main__":
+    unittest.main()